@@ -0,0 +1,45 @@
+"""Report the devices whose names are near-duplicates in Boavizta csv files.
+
+The report is a .csv file with one pair of names per row. Once reviewed (remove the rows of
+different devices), it can be given to merge_csv with --aliases, so that the devices of each pair
+are merged.
+"""
+import argparse
+import contextlib
+import csv
+import sys
+from typing import List, Optional
+
+from tools.merge_csv import load_csv
+from tools.parsers.lib import duplicates
+
+
+def main(string_args: Optional[List[str]] = None) -> None:
+    argparser = argparse.ArgumentParser(
+        description='Report the devices whose names are near-duplicates',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    argparser.add_argument('files', nargs='+', help='.csv files to search for duplicates')
+    argparser.add_argument('-t', '--threshold', default=.9, type=float, help='Minimal similarity of the trigrams of two names')
+    argparser.add_argument('--same-key-only', action='store_true', help='Only report names which differ in case, spacing, punctuation, inch marks or manufacturer prefix')
+    argparser.add_argument('-o', '--output', help='Output .csv report')
+    args = argparser.parse_args(string_args)
+
+    devices = [device for filename in args.files for device in load_csv(filename)]
+    pairs = duplicates.find_near_duplicates(devices, threshold=args.threshold)
+    if args.same_key_only:
+        pairs = [pair for pair in pairs if pair.same_key]
+
+    with contextlib.ExitStack() as stack:
+        if args.output and args.output!="-":
+            output = stack.enter_context(open(args.output, 'w', encoding='utf-8', newline=''))
+        else:
+            output = sys.stdout
+        writer = csv.writer(output)
+        writer.writerow(duplicates.DuplicatePair._fields)
+        for pair in pairs:
+            writer.writerow(pair._replace(score=round(pair.score, 3)))
+    print(f'{len(pairs)} pair(s) of near-duplicates among {len(devices)} devices.', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Build or refresh the SQLite index of a Boavizta csv file, and query it."""
+import argparse
+import os
+import sys
+from typing import List, Optional
+
+from tools.parsers.lib import data
+from tools.parsers.lib import store
+
+
+def main(string_args: Optional[List[str]] = None) -> None:
+    argparser = argparse.ArgumentParser(
+        description='Build or refresh the SQLite index of a Boavizta csv file, and query it',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    argparser.add_argument('file', help='.csv file to index')
+    argparser.add_argument('-d', '--database', help='SQLite file of the index (default: the .csv file with a .sqlite extension)')
+    argparser.add_argument('--manufacturer', help='Print the devices of this manufacturer')
+    argparser.add_argument('--name', help='Print the devices with this name')
+    argparser.add_argument('--category', help='Print the devices of this category')
+    argparser.add_argument('--subcategory', help='Print the devices of this subcategory')
+    argparser.add_argument('--source', help='Print the devices with a source of the same basename as this URL')
+    argparser.add_argument('--sources-hash', help='Print the devices with this sources_hash')
+    args = argparser.parse_args(string_args)
+
+    database = args.database or os.path.splitext(args.file)[0] + '.sqlite'
+    with store.DeviceStore(database) as device_store:
+        stats = device_store.refresh(args.file)
+        print(f'{database}: {stats.added} row(s) added, {stats.removed} removed, '
+              f'{stats.unchanged} unchanged.', file=sys.stderr)
+
+        filters = {
+            key: value for key, value in (
+                ('manufacturer', args.manufacturer),
+                ('name', args.name),
+                ('category', args.category),
+                ('subcategory', args.subcategory),
+                ('source_basename', args.source and store.source_basename(args.source)),
+                ('sources_hash', args.sources_hash),
+            ) if value}
+        if filters:
+            writer = data.DeviceCsvWriter(sys.stdout)
+            writer.writerows(device.reorder() for device in device_store.find(**filters))
+
+
+if __name__ == '__main__':
+    main()
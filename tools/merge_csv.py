@@ -1,41 +1,424 @@
 """Merge two csv file while reporting and dealing with conflicts."""
-import csv
 import argparse
+import concurrent.futures
+import contextlib
+import csv
+import heapq
+import itertools
+import json
+import operator
+import os
 import sys
 import re
-from typing import List, Optional, Dict, Set
+import tempfile
+import typing
+import zlib
+from typing import Any, Iterable, Iterator, List, Literal, NamedTuple, Optional, Dict, Set, TextIO, Tuple
+from tools.parsers.lib import conflicts as conflicts_lib
 from tools.parsers.lib import data
+from tools.parsers.lib import duplicates
+from tools.parsers.lib import extsort
+from tools.parsers.lib import hashing
+
+# Bump this when the merge changes: journals of other versions are ignored.
+_JOURNAL_VERSION = 2
+
+_LOCATIONS = {
+    'China': 'CN',
+    'Worldwide': 'WW',
+    'Germany': 'DE'
+}
+
+# FIXME: this could be done in CsvRowConverter?
+def clean_row(row: List[str], converter: data.CsvRowConverter) -> List[str]:
+    """Normalize the values of a row read by csv.reader: memory in GB without unit, location codes."""
+    memory = converter.position('memory')
+    if memory is not None and memory < len(row):
+        row[memory] = re.sub(r'(?i)GB', '', row[memory])
 
-# FIXME: this could be done in DeviceCarbonFootprint.from_text?
-def clean_device(data: Dict[str, str]) -> Dict[str, str]:
-    result = data
-
-    if 'memory' in result:
-        result['memory'] = re.sub(r'(?i)GB', '', result['memory'])
-    
-    locs = {
-        'China': 'CN',
-        'Worldwide': 'WW',
-        'Germany': 'DE'
-    }
     for l in ['use_location','assembly_location']:
-        if l in result and result[l] in locs.keys():
-            result[l] = locs[result[l]]
+        position = converter.position(l)
+        if position is not None and position < len(row) and row[position] in _LOCATIONS.keys():
+            row[position] = _LOCATIONS[row[position]]
 
-    return result
+    return row
+
+def iter_csv(filename: str) -> Iterator[data.CompactDeviceCarbonFootprint]:
+    with open(filename, 'rt', encoding='utf-8') as file:
+        converter, rows = data.read_csv(file)
+        for row in rows:
+            yield converter.to_compact_device(clean_row(row, converter))
+
+def load_csv(filename: str) -> List[data.CompactDeviceCarbonFootprint]:
+    return list(iter_csv(filename))
 
-def load_csv(filename: str):
+def load_aliases(filename: str) -> Dict[str, str]:
+    """Load a report of find_duplicates: map lowercased names to the name of their group."""
     with open(filename, 'rt', encoding='utf-8') as file:
-        csvreader = csv.DictReader(file)
-        return [data.DeviceCarbonFootprint.from_text(clean_device(row)) for row in csvreader]
+        return duplicates.alias_map((row['name'], row['duplicate_name']) for row in csv.DictReader(file))
 
-def get_key(device: dict, key_name: str) -> str:
-    assert key_name in device
+def get_key(device: data.AnyDeviceCarbonFootprint, key_name: str, aliases: Optional[Dict[str, str]] = None) -> str:
     if key_name == 'sources':
-        pdf_file = re.search(r'([^\/]*\.pdf)', device.get(key_name, ""))
+        pdf_file = data.source_file(str(device.get(key_name)))
         assert pdf_file is not None
-        return pdf_file[0]
-    return device.get(key_name, "").lower()
+        return pdf_file
+    key = str(device.get(key_name)).lower()
+    if aliases:
+        return aliases.get(key, key)
+    return key
+
+# Position of a device in the order of the merge: newest file first, and last rows first.
+Ordinal = Tuple[int, int]
+
+class Conflict(NamedTuple):
+    """A conflict left unresolved by the merge of a device into the devices of its key."""
+    key: str
+    # Index of the file of the merged (older) device.
+    file_index: int
+    manufacturer: str
+    name: str
+    field: str
+    kept_value: Any
+    other_value: Any
+
+def _conflicts(key: str, i: int, device: data.CompactDeviceCarbonFootprint, previous: data.CompactDeviceCarbonFootprint,
+               merged: data.CompactDeviceCarbonFootprint, fields: List[str]) -> List[Conflict]:
+    """The conflicts of the merge of device (from file i) into previous."""
+    result = []
+    for field in fields:
+        kept_value = merged.get(field)
+        other_value = previous.get(field) if kept_value == device.get(field) else device.get(field)
+        result.append(Conflict(
+            key, i, str(device.get('manufacturer')), str(device.get('name')), field, kept_value, other_value))
+    return result
+
+class MergeSummary:
+    """Statistics of a merge, printed as its summary report."""
+
+    def __init__(self, nb_files: int):
+        self.nb_singletons = [0]*nb_files
+        self.nb_duplicates = [0]*nb_files
+        self.nb_truly_clean_fusions = 0
+        self.nb_clean_fusions_with_conflicts = 0
+        self.nb_mixed_fusions = 0
+        self.nb_attributes_in_mixed_fusions = 0
+        self.conflict_count :Dict[str,int] = {}
+        # Ordinal of the first conflict on each field (and position of the field in the conflicts of
+        # that merge), to list them in the order of the merge.
+        self._first_conflict :Dict[str,Tuple[Ordinal,int]] = {}
+        # The unresolved conflicts, with the ordinal of their merge.
+        self.conflicts :List[Tuple[Ordinal,Conflict]] = []
+
+    def add_merge(self, key: str, i: int, origins: Set[int], report: List[Set[str]], conflicts: List[str],
+                  ordinal: Ordinal = (0, 0), verbose: int = 0) -> None:
+        """Record the merge of a device of file i into the devices of the same key from origins."""
+        # record stats on conflicts
+        for position, field in enumerate(conflicts):
+            if field in self.conflict_count:
+                self.conflict_count[field] += 1
+                self._first_conflict[field] = min(self._first_conflict[field], (ordinal, position))
+            else:
+                self.conflict_count[field] = 0
+                self._first_conflict[field] = (ordinal, position)
+        if i in origins:
+            self.nb_duplicates[i] += 1
+        else:
+            # we had a collision
+            if len(report[0])==0:
+                # in this case, the newer device has been left unchanged
+                if len(conflicts)==0:
+                    self.nb_truly_clean_fusions += 1
+                else:
+                    self.nb_clean_fusions_with_conflicts += 1
+            else:
+                # in this case some attributes have been gathered from the older device
+                self.nb_mixed_fusions += 1
+                self.nb_attributes_in_mixed_fusions += len(report[0])
+                if verbose>=1:
+                    print(key,": gather old attributes for",report[0])
+
+    def add_conflicts(self, ordinal: Ordinal, conflicts: List[Conflict]) -> None:
+        """Record the unresolved conflicts of a merge, for the conflict report."""
+        self.conflicts.extend((ordinal, conflict) for conflict in conflicts)
+
+    def add_key(self, origins: Set[int]) -> None:
+        """Record the files where the devices of a key were found, once all are merged."""
+        if len(origins)==1:
+            self.nb_singletons[next(iter(origins))] += 1
+
+    def update(self, other: 'MergeSummary') -> None:
+        """Add the statistics of a merge of other keys, e.g. of another partition."""
+        for i, (nb_singletons, nb_duplicates) in enumerate(zip(other.nb_singletons, other.nb_duplicates)):
+            self.nb_singletons[i] += nb_singletons
+            self.nb_duplicates[i] += nb_duplicates
+        self.nb_truly_clean_fusions += other.nb_truly_clean_fusions
+        self.nb_clean_fusions_with_conflicts += other.nb_clean_fusions_with_conflicts
+        self.nb_mixed_fusions += other.nb_mixed_fusions
+        self.nb_attributes_in_mixed_fusions += other.nb_attributes_in_mixed_fusions
+        for field, count in other.conflict_count.items():
+            if field in self.conflict_count:
+                # The count of a field is its number of conflicts minus one.
+                self.conflict_count[field] += count + 1
+                self._first_conflict[field] = min(self._first_conflict[field], other._first_conflict[field])
+            else:
+                self.conflict_count[field] = count
+                self._first_conflict[field] = other._first_conflict[field]
+        self.conflicts.extend(other.conflicts)
+
+    def write_conflicts(self, csv_file: TextIO, files: List[str]) -> None:
+        """Write the unresolved conflicts as a csv file, in the order of the merge."""
+        writer = csv.writer(csv_file)
+        writer.writerow(['key', 'file', 'manufacturer', 'name', 'field', 'kept_value', 'other_value'])
+        for unused_ordinal, conflict in sorted(self.conflicts, key=operator.itemgetter(0)):
+            writer.writerow([
+                conflict.key, files[conflict.file_index], conflict.manufacturer, conflict.name,
+                conflict.field, conflict.kept_value, conflict.other_value])
+
+    def print(self) -> None:
+        print("\n------------------------------------------------------------")
+        print(  "| Summary report                                           |")
+        print(  "------------------------------------------------------------")
+        print(  "Number of singletons: ", self.nb_singletons, sep='')
+        print(  "Number of self duplicates: ", self.nb_duplicates, sep='')
+        print(  "Number of truly clean fusions:            ", self.nb_truly_clean_fusions, sep='')
+        print(  "Number of clean fusions hiding conflicts: ", self.nb_clean_fusions_with_conflicts, sep='')
+        print(  "Number of mixed fusions:                  ", self.nb_mixed_fusions, sep='')
+        print(  "Number of attributes gathered from the oldest data: ", self.nb_attributes_in_mixed_fusions, sep='')
+        print(  "Details on conflicts:")
+        for k in sorted(self.conflict_count, key=self._first_conflict.__getitem__):
+            print("  ", k, "x", self.conflict_count[k])
+        print(  "------------------------------------------------------------")
+
+def merge_in_memory(files: List[str], key_name: str, summary: MergeSummary,
+                    conflict: Literal['keep2nd','interactive'] = 'keep2nd', verbose: int = 0,
+                    aliases: Optional[Dict[str, str]] = None, resolve: Optional[data.Resolve] = None
+                    ) -> Iterator[data.CompactDeviceCarbonFootprint]:
+    """Merge the devices of the files, keeping all the merged devices in memory."""
+    nb_files = len(files)
+    result :Dict[str,data.CompactDeviceCarbonFootprint] = {}
+    origins :Dict[str,Set[int]] = {}
+    for i in reversed(range(nb_files)):
+        devices = load_csv(files[i])
+        for row_index, device in enumerate(reversed(devices)):
+            key = get_key(device, key_name, aliases)
+            if key in result:
+                # merge the twos while giving priority to the one that is already present in result
+                device2 = result[key]
+                result[key],report,conflicts = data.CompactDeviceCarbonFootprint.merge(device, device2, conflict=conflict, verbose=verbose, resolve=resolve)
+                summary.add_merge(key, i, origins[key], report, conflicts, (nb_files-i, row_index), verbose)
+                summary.add_conflicts((nb_files-i, row_index), _conflicts(key, i, device, device2, result[key], conflicts))
+            else:
+                result[key] = device
+                origins[key] = set()
+            origins[key].add(i)
+    for key_origins in origins.values():
+        summary.add_key(key_origins)
+    return iter(result.values())
+
+# A merge of a device into the devices of its key: the fields taken from the older device, and the
+# unresolved conflicts.
+MergeEvent = Tuple[List[str], List[Conflict]]
+
+def _merge_group(key: str, group: Iterable[Tuple[int, int, Tuple[Any, ...]]], nb_files: int, summary: MergeSummary,
+                 conflict: Literal['keep2nd','interactive'], verbose: int, resolve: Optional[data.Resolve]
+                 ) -> Tuple[Ordinal, Tuple[Any, ...], List[MergeEvent]]:
+    """Merge the devices of a key, given as (file rank, row index, values) in the order of the merge."""
+    devices = iter(group)
+    file_rank, row_index, values = next(devices)
+    first_ordinal = (file_rank, row_index)
+    result = data.CompactDeviceCarbonFootprint(values)
+    origins = {nb_files-file_rank}
+    events :List[MergeEvent] = []
+    for file_rank, row_index, values in devices:
+        i = nb_files-file_rank
+        device = data.CompactDeviceCarbonFootprint(values)
+        previous = result
+        result,report,conflicts = data.CompactDeviceCarbonFootprint.merge(
+            device, previous, conflict=conflict, verbose=verbose, resolve=resolve)
+        summary.add_merge(key, i, origins, report, conflicts, (file_rank, row_index), verbose)
+        unresolved = _conflicts(key, i, device, previous, result, conflicts)
+        summary.add_conflicts((file_rank, row_index), unresolved)
+        origins.add(i)
+        events.append((sorted(report[0]), unresolved))
+    summary.add_key(origins)
+    return first_ordinal, result.values(), events
+
+def _merge_sorted_devices(
+        devices: Iterator[Tuple[str, int, int, Tuple[Any, ...]]], nb_files: int, summary: MergeSummary,
+        conflict: Literal['keep2nd','interactive'], verbose: int, resolve: Optional[data.Resolve]
+        ) -> Iterator[Tuple[Ordinal, Tuple[Any, ...]]]:
+    """Merge the devices of each key, sorted by key and then in the order of the merge."""
+    for key, group in itertools.groupby(devices, key=operator.itemgetter(0)):
+        first_ordinal, values, unused_events = _merge_group(
+            key, (device[1:] for device in group), nb_files, summary, conflict, verbose, resolve)
+        yield first_ordinal, values
+
+def _load_partitions(filename: str, file_rank: int, key_name: str, aliases: Optional[Dict[str, str]],
+                     nb_partitions: int) -> List[List[Tuple[str, int, int, Tuple[Any, ...]]]]:
+    """Load the devices of a file, split in partitions by a hash of their key."""
+    partitions :List[List[Tuple[str, int, int, Tuple[Any, ...]]]] = [[] for unused_partition in range(nb_partitions)]
+    for row_index, device in enumerate(reversed(load_csv(filename))):
+        key = get_key(device, key_name, aliases)
+        partitions[zlib.crc32(key.encode('utf-8')) % nb_partitions].append((key, file_rank, row_index, device.values()))
+    return partitions
+
+def _merge_partition(devices: List[Tuple[str, int, int, Tuple[Any, ...]]], nb_files: int,
+                     conflict: Literal['keep2nd','interactive'], verbose: int,
+                     resolver: Optional[conflicts_lib.ConflictResolver]
+                     ) -> Tuple[List[Tuple[Ordinal, Tuple[Any, ...]]], MergeSummary, Dict[str, Tuple[int, int, str]]]:
+    """Merge the devices of a partition: all the devices of its keys.
+
+    Also returns the hashes of the mirrored files computed by the resolver, to save them.
+    """
+    devices.sort(key=operator.itemgetter(0, 1, 2))
+    summary = MergeSummary(nb_files)
+    merged = sorted(_merge_sorted_devices(iter(devices), nb_files, summary, conflict, verbose, resolver), key=operator.itemgetter(0))
+    return merged, summary, resolver.mirror_hashes() if resolver else {}
+
+def merge_parallel(files: List[str], key_name: str, summary: MergeSummary,
+                   conflict: Literal['keep2nd','interactive'] = 'keep2nd', verbose: int = 0,
+                   aliases: Optional[Dict[str, str]] = None, jobs: Optional[int] = None,
+                   resolver: Optional[conflicts_lib.ConflictResolver] = None) -> Iterator[data.CompactDeviceCarbonFootprint]:
+    """Merge the devices of the files in a pool of processes.
+
+    The files are loaded in parallel and their devices are split in partitions by a hash of their
+    key, so that each partition can be merged on its own. The merged devices are output in the
+    same order as merge_in_memory would.
+    """
+    nb_files = len(files)
+    nb_partitions = jobs or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        loads = [
+            executor.submit(_load_partitions, files[i], nb_files-i, key_name, aliases, nb_partitions)
+            for i in reversed(range(nb_files))]
+        partitions :List[List[Tuple[str, int, int, Tuple[Any, ...]]]] = [[] for unused_partition in range(nb_partitions)]
+        for load in loads:
+            for partition, devices in zip(partitions, load.result()):
+                partition.extend(devices)
+        merges = [
+            executor.submit(_merge_partition, devices, nb_files, conflict, verbose, resolver)
+            for devices in partitions]
+        results = [merge.result() for merge in merges]
+    for unused_merged, partition_summary, mirror_hashes in results:
+        summary.update(partition_summary)
+        if resolver:
+            resolver.add_mirror_hashes(mirror_hashes)
+    for unused_ordinal, values in heapq.merge(*(merged for merged, unused_summary, unused_hashes in results), key=operator.itemgetter(0)):
+        yield data.CompactDeviceCarbonFootprint(values)
+
+def merge_streaming(files: List[str], key_name: str, summary: MergeSummary,
+                    conflict: Literal['keep2nd','interactive'] = 'keep2nd', verbose: int = 0,
+                    aliases: Optional[Dict[str, str]] = None, chunk_size: int = extsort.DEFAULT_CHUNK_SIZE,
+                    tmp_dir: Optional[str] = None, resolve: Optional[data.Resolve] = None
+                    ) -> Iterator[data.CompactDeviceCarbonFootprint]:
+    """Merge the devices of the files with external sorts, in a bounded amount of memory.
+
+    The devices are sorted by key and then in the order of the merge, merged key by key, and
+    sorted back in the order in which merge_in_memory would output them.
+    """
+    nb_files = len(files)
+
+    def keyed_devices() -> Iterator[Tuple[str, int, int, Tuple[Any, ...]]]:
+        for i in reversed(range(nb_files)):
+            # Rows are numbered from the end of the file, so that the last ones come first.
+            nb_rows = sum(1 for unused_device in iter_csv(files[i]))
+            for row_index, device in enumerate(iter_csv(files[i])):
+                yield get_key(device, key_name, aliases), nb_files-i, nb_rows-1-row_index, device.values()
+
+    by_key = extsort.external_sort(keyed_devices(), key=operator.itemgetter(0, 1, 2), chunk_size=chunk_size, directory=tmp_dir)
+    merged = _merge_sorted_devices(by_key, nb_files, summary, conflict, verbose, resolve)
+    for unused_ordinal, values in extsort.external_sort(merged, key=operator.itemgetter(0), chunk_size=chunk_size, directory=tmp_dir):
+        yield data.CompactDeviceCarbonFootprint(values)
+
+def _load_journal(filename: str, key_name: str, aliases: Optional[Dict[str, str]],
+                  rules: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Load the entries of a journal, if it was written by a merge with the same key and rules."""
+    try:
+        with open(filename, 'rt', encoding='utf-8') as file:
+            journal = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if journal.get('version') != _JOURNAL_VERSION or journal.get('key') != key_name or journal.get('aliases') != (aliases or {}) \
+            or journal.get('rules') != rules:
+        return {}
+    return typing.cast(Dict[str, Any], journal['entries'])
+
+def _row_key(row: List[str], converter: data.CsvRowConverter, key_name: str, aliases: Optional[Dict[str, str]]) -> str:
+    """Same as get_key, without converting the whole row for text keys."""
+    if data.DeviceCarbonFootprintData.__annotations__.get(key_name) == str:
+        position = converter.position(key_name)
+        value = row[position] if position is not None and position < len(row) else ''
+        device = data.DeviceCarbonFootprint(typing.cast(data.DeviceCarbonFootprintData, {key_name: value} if value else {}))
+    else:
+        device = converter.to_device(row)
+    return get_key(device, key_name, aliases)
+
+def merge_incremental(files: List[str], key_name: str, summary: MergeSummary, journal_filename: str,
+                      conflict: Literal['keep2nd','interactive'] = 'keep2nd', verbose: int = 0,
+                      aliases: Optional[Dict[str, str]] = None,
+                      resolver: Optional[conflicts_lib.ConflictResolver] = None) -> Iterator[data.CompactDeviceCarbonFootprint]:
+    """Merge the devices of the files, reusing the merges of a previous run recorded in a journal.
+
+    The journal records, for each key, the hash of its input rows, the merged device and what each
+    merge did (for the summary). Only the keys whose input rows changed are merged again; the
+    journal is then rewritten for the next run. Changes of the files of the resolver's mirror are
+    not tracked.
+    """
+    nb_files = len(files)
+    rules = resolver.rules if resolver else None
+    previous = _load_journal(journal_filename, key_name, aliases, rules)
+    # The rows of each key, in the order of the merge.
+    groups :Dict[str, List[Tuple[int, int, str, List[str], data.CsvRowConverter]]] = {}
+    for i in reversed(range(nb_files)):
+        with open(files[i], 'rt', encoding='utf-8') as file:
+            converter, rows = data.read_csv(file)
+            # Rows are only the same for the same columns.
+            headers = '\x1f'.join(converter.headers) + '\x1e'
+            for row_index, row in enumerate(reversed(list(rows))):
+                row = clean_row(row, converter)
+                row_hash = hashing.hash_row(row, prefix=headers)
+                groups.setdefault(_row_key(row, converter, key_name, aliases), []).append(
+                    (nb_files-i, row_index, row_hash, row, converter))
+
+    merged :List[Tuple[Ordinal, Tuple[Any, ...]]] = []
+    entries :Dict[str, Any] = {}
+    nb_reused = 0
+    for key, group in groups.items():
+        inputs :List[Tuple[int, str]] = [(nb_files-file_rank, row_hash) for file_rank, unused_index, row_hash, unused_row, unused_converter in group]
+        entry = previous.get(key)
+        # JSON gives the inputs back as lists.
+        if entry and [tuple(row_input) for row_input in entry['inputs']] == inputs:
+            # Same rows as in the previous run: replay its merges for the summary.
+            nb_reused += 1
+            values, events = tuple(entry['values']), entry['events']
+            origins = {inputs[0][0]}
+            for (i, unused_hash), (file_rank, row_index, *unused_device), (from_older, unresolved) in zip(inputs[1:], group[1:], events):
+                unresolved = [Conflict(*conflict) for conflict in unresolved]
+                summary.add_merge(key, i, origins, [set(from_older), set()], [conflict.field for conflict in unresolved], (file_rank, row_index))
+                summary.add_conflicts((file_rank, row_index), unresolved)
+                origins.add(i)
+            summary.add_key(origins)
+        else:
+            unused_ordinal, values, events = _merge_group(key, (
+                (file_rank, row_index, converter.to_compact_device(row).values())
+                for file_rank, row_index, unused_hash, row, converter in group
+            ), nb_files, summary, conflict, verbose, resolver)
+        merged.append(((group[0][0], group[0][1]), values))
+        entries[key] = {'inputs': inputs, 'values': list(values), 'events': events}
+
+    if nb_reused < len(groups) or len(previous) != len(groups):
+        directory = os.path.dirname(os.path.abspath(journal_filename))
+        # Write to a temporary file first, so that an interrupted run keeps the previous journal.
+        with tempfile.NamedTemporaryFile('wt', encoding='utf-8', dir=directory, delete=False) as journal_file:
+            # json.dumps uses the C encoder, json.dump does not.
+            journal_file.write(json.dumps({
+                'version': _JOURNAL_VERSION, 'key': key_name, 'aliases': aliases or {}, 'rules': rules,
+                'entries': entries}))
+        os.replace(journal_file.name, journal_filename)
+    print(f'{len(groups)-nb_reused} key(s) merged, {nb_reused} reused from the journal.', file=sys.stderr)
+
+    merged.sort(key=operator.itemgetter(0))
+    return (data.CompactDeviceCarbonFootprint(values) for unused_ordinal, values in merged)
 
 def main(string_args: Optional[List[str]] = None) -> None:
     argparser = argparse.ArgumentParser(
@@ -45,79 +428,56 @@ def main(string_args: Optional[List[str]] = None) -> None:
     argparser.add_argument('-v', '--verbose', default=0, type=int, help='Verbosity level (0=none, 1=print automatic conflict resolutions, 2=print pedantic warnings')
     argparser.add_argument('-i', '--interactive', action='store_true', help='Ask user how ot resolve conflicts')
     argparser.add_argument('-k', '--key', default='name', help='Name of the field used to find duplicates')
+    argparser.add_argument('--rules', help='JSON file of the policies resolving the conflicts of each field (see conflicts.py); the other conflicts are resolved as usual')
+    argparser.add_argument('--mirror', help='Folder of the mirrored sources .pdf files, for the mirror policy of --rules')
+    argparser.add_argument('--hash-cache', help='JSON file keeping the hashes of the mirrored files')
+    argparser.add_argument('--conflict-report', help='Output .csv file of the conflicts that were not resolved by --rules')
+    argparser.add_argument('--aliases', help='Report of find_duplicates: the names of each pair are considered the same (with the name key only)')
     argparser.add_argument('-o', '--output', help='Output .csv file')
+    argparser.add_argument('--output-fr', help='Output .csv file in the fr format')
+    argparser.add_argument('--streaming', action='store_true', help='Merge with external sorts, in a bounded amount of memory (messages of the merges are grouped by key)')
+    argparser.add_argument('--chunk-size', default=extsort.DEFAULT_CHUNK_SIZE, type=int, help='Number of devices sorted in memory at once with --streaming')
+    argparser.add_argument('-j', '--jobs', type=int, help='Load and merge in this number of processes (0 for the number of CPUs); not compatible with --interactive and --streaming')
+    argparser.add_argument('--journal', help='Journal of the previous merge: only the keys whose rows changed are merged again (updated after the merge)')
+    argparser.add_argument('--tmp-dir', help='Folder of the temporary files of --streaming (default: system temporary folder)')
     args = argparser.parse_args(string_args)
-    conflict = 'interactive' if args.interactive else 'keep2nd'
-    nb_files = len(args.files)
-    result :Dict[str,data.DeviceCarbonFootprint] = {}
-    origins :Dict[str,Set[int]] = {}
-    nb_truly_clean_fusions = 0
-    nb_clean_fusions_with_conflicts = 0
-    nb_mixed_fusions = 0
-    nb_attributes_in_mixed_fusions = 0
-    nb_duplicates = [0]*nb_files
-    conflict_count :Dict[str,int] = {}
-
-    for i in reversed(range(nb_files)):
-        devices = load_csv(args.files[i])
-        for device in reversed(devices):
-            key = get_key(device, args.key)
-            if key in result:
-                # merge the twos while giving priority to the one that is already present in result
-                device2 = result[key]
-                result[key],report,conflicts = data.DeviceCarbonFootprint.merge(device, device2, conflict=conflict, verbose=args.verbose)
-                # record stats on conflicts
-                for conflict in conflicts:
-                    if conflict in conflict_count:
-                        conflict_count[conflict] += 1
-                    else:
-                        conflict_count[conflict] = 0
-                if i in origins[key]:
-                    nb_duplicates[i] += 1
-                else:
-                    # we had a collision
-                    if len(report[0])==0:
-                        # in this case, device2 has been left unchanged
-                        if len(conflicts)==0:
-                            nb_truly_clean_fusions += 1
-                        else:
-                            nb_clean_fusions_with_conflicts += 1
-                    else:
-                        # in this case some attributes have been gathered from the older device
-                        nb_mixed_fusions += 1
-                        nb_attributes_in_mixed_fusions += len(report[0])
-                        if args.verbose>=1:
-                            print(key,": gather old attributes for",report[0])
-            else:
-                result[key] = device
-                origins[key] = set()
-            origins[key].add(i)
-    
-    content = data.DeviceCarbonFootprint.csv_headers()
-    for device in result.values():
-        content += device.reorder().as_csv_row()
-    if args.output and args.output!="-":
-        with open(args.output, 'w', encoding='utf-8') as output:
-            output.write(content)
+    if args.jobs is not None and args.interactive:
+        argparser.error('--jobs cannot be used with --interactive: conflicts are resolved in worker processes')
+    if args.jobs is not None and args.streaming:
+        argparser.error('--jobs cannot be used with --streaming')
+    if args.journal and (args.jobs is not None or args.streaming):
+        argparser.error('--journal cannot be used with --jobs or --streaming')
+    conflict: Literal['keep2nd','interactive'] = 'interactive' if args.interactive else 'keep2nd'
+    aliases = load_aliases(args.aliases) if args.aliases and args.key == 'name' else None
+    try:
+        resolver = conflicts_lib.ConflictResolver.from_file(args.rules, args.mirror, args.hash_cache) if args.rules else None
+    except ValueError as error:
+        argparser.error(f'invalid --rules: {error}')
+    summary = MergeSummary(len(args.files))
+    if args.journal:
+        result = merge_incremental(args.files, args.key, summary, args.journal, conflict, args.verbose, aliases, resolver)
+    elif args.jobs is not None:
+        result = merge_parallel(args.files, args.key, summary, conflict, args.verbose, aliases, args.jobs or None, resolver)
+    elif args.streaming:
+        result = merge_streaming(args.files, args.key, summary, conflict, args.verbose, aliases, args.chunk_size, args.tmp_dir, resolver)
     else:
-        sys.stdout.write(content)
-    
-    nb_singletons = [0]*nb_files
-    for i in range(nb_files):
-        nb_singletons[i] = sum(map(lambda x: len(x)==1 and i in x, origins.values()))
-    print("\n------------------------------------------------------------")
-    print(  "| Summary report                                           |")
-    print(  "------------------------------------------------------------")
-    print(  "Number of singletons: ", nb_singletons, sep='')
-    print(  "Number of self duplicates: ", nb_duplicates, sep='')
-    print(  "Number of truly clean fusions:            ", nb_truly_clean_fusions, sep='')
-    print(  "Number of clean fusions hiding conflicts: ", nb_clean_fusions_with_conflicts, sep='')
-    print(  "Number of mixed fusions:                  ", nb_mixed_fusions, sep='')
-    print(  "Number of attributes gathered from the oldest data: ", nb_attributes_in_mixed_fusions, sep='')
-    print(  "Details on conflicts:")
-    for k,n in conflict_count.items():
-        print("  ", k, "x", n)
-    print(  "------------------------------------------------------------")
+        result = merge_in_memory(args.files, args.key, summary, conflict, args.verbose, aliases, resolver)
+
+    with contextlib.ExitStack() as stack:
+        if args.output and args.output!="-":
+            output = stack.enter_context(open(args.output, 'w', encoding='utf-8'))
+        else:
+            output = sys.stdout
+        output_fr = stack.enter_context(open(args.output_fr, 'w', encoding='utf-8')) if args.output_fr else None
+        writer = data.DeviceCsvWriter(output, output_fr)
+        writer.writerows(device.reorder() for device in result)
+
+    if resolver:
+        resolver.save()
+    if args.conflict_report:
+        with open(args.conflict_report, 'wt', encoding='utf-8', newline='') as report_file:
+            summary.write_conflicts(report_file, args.files)
+    summary.print()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
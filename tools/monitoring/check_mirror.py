@@ -0,0 +1,65 @@
+"""Check a local mirror of the sources PDF files against the hashes of a Boavizta CSV file.
+
+The mirror is a folder containing the PDF files of the sources column, named as in their URLs.
+The files are hashed in parallel (see hashing.hash_files), and their hashes are kept in a cache
+file so that the files which did not change since the previous check are not read again.
+
+Run it with:
+
+```sh
+python -m tools.monitoring.check_mirror boavizta-data-us.csv path/to/mirror --hash-cache mirror.json
+```
+"""
+import argparse
+import csv
+import os
+from typing import Dict, List, Optional
+
+from tools.parsers.lib import data
+from tools.parsers.lib import hashing
+
+
+def main(string_args: Optional[List[str]] = None) -> None:
+    argparser = argparse.ArgumentParser(
+        description='Check a local mirror of the sources PDF files against their sources_hash',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    argparser.add_argument('file', help='.csv file with the sources and their hashes')
+    argparser.add_argument('folder', help='Folder of the mirrored .pdf files')
+    argparser.add_argument('--hash-cache', help='JSON file keeping the hashes of the mirrored files')
+    argparser.add_argument(
+        '-j', '--jobs', type=int, help='Number of files hashed in parallel (default: from CPU count)')
+    args = argparser.parse_args(string_args)
+
+    # The expected hashes of each mirrored file.
+    expected: Dict[str, List[str]] = {}
+    with open(args.file, 'rt', encoding='utf-8') as csv_file:
+        for row in csv.DictReader(csv_file):
+            pdf_file = data.source_file(row.get('sources') or '')
+            if pdf_file:
+                expected.setdefault(os.path.join(args.folder, pdf_file), []).append(
+                    row.get('sources_hash') or '')
+
+    cache = hashing.HashCache(args.hash_cache)
+    hashes = hashing.hash_files(expected, max_workers=args.jobs, cache=cache)
+    cache.save()
+
+    nb_missing = nb_changed = nb_unknown = 0
+    for path in sorted(expected):
+        md5 = hashes[path]
+        if isinstance(md5, OSError):
+            nb_missing += 1
+            print(f'{path}: missing ({md5.strerror})')
+            continue
+        for expected_md5 in sorted(set(expected[path])):
+            if not expected_md5:
+                nb_unknown += 1
+                print(f'{path}: no hash in the dataset, file hash is {md5}')
+            elif expected_md5 != md5:
+                nb_changed += 1
+                print(f'{path}: changed, expected {expected_md5} but got {md5}')
+    print(f'{len(expected)} file(s) checked: {nb_missing} missing, {nb_changed} changed, '
+          f'{nb_unknown} without hash.')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,64 @@
+import argparse
 import csv
-import logging
-from typing import Any, Optional
-import requests
+import os
+import shutil
 import sys
+import tempfile
+import typing
+from typing import Dict, Iterable, Iterator, List, Literal, Optional, Tuple
+
+import requests
+
 from tools.parsers.lib import data
-from typing import List, Optional, Dict, Set
-import argparse
+from tools.parsers.lib import hashing
 
 
+def fold_duplicates(devices: Iterable[Tuple[data.DeviceCarbonFootprint, bool]], key_name: str = 'name',
+                    conflict: Literal['keep2nd','interactive'] = 'keep2nd', verbose: int = 0
+                    ) -> List[data.DeviceCarbonFootprint]:
+    """Merge the devices with the same normalized key, given as (device, can be merged).
+
+    Any number of duplicates are merged, later devices having priority. The devices are returned
+    in the order of the first device of each key; devices that cannot be merged or without key are
+    kept as they are.
+    """
+    result: List[data.DeviceCarbonFootprint] = []
+    # Position in result of the merged device of each key.
+    index: Dict[str, int] = {}
+    for device, can_merge in devices:
+        key = data.normalize(str(device.get(key_name)))
+        if not can_merge or not key:
+            result.append(device)
+            continue
+        position = index.get(key)
+        if position is None:
+            index[key] = len(result)
+            result.append(device)
+            continue
+        merged, unused_report, unused_conflicts = data.DeviceCarbonFootprint.merge(
+            result[position], device, conflict=conflict, verbose=verbose)
+        merged.data['comment'] = str(device.get('comment')) + " merged"
+        result[position] = merged
+    return result
+
+def _check_sources(device: data.DeviceCarbonFootprint) -> bool:
+    """Check the hash of the sources of a device, noting changes in its comment.
+
+    Returns whether the sources could be reached.
+    """
+    pdf=requests.get(device.data['sources'], headers={"user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/50.0.2661.102 Safari/537.36"})
+    if not (( pdf.status_code == 200 ) and not ('error' in pdf.url) and not ('404' in pdf.url)):
+        device.data['comment']=device.data['comment'] + " Source is unreachable"
+        return False
+    tempmd5=hashing.hash_buffer(pdf.content)
+    if device.data.get('sources_hash'):
+        if not tempmd5 == device.data['sources_hash']:
+            device.data['comment']=device.data['comment'] + "File " + device.data['sources'] + " changed."
+    else:
+        device.data['sources_hash']=tempmd5
+        device.data['comment']=device.data['comment'] + " MD5 hash added"
+    return True
+
 def main(string_args: Optional[List[str]] = None) -> None:
     argparser = argparse.ArgumentParser(
             description='Cleanup a Boavizta csv file',
@@ -15,58 +66,36 @@ def main(string_args: Optional[List[str]] = None) -> None:
     argparser.add_argument('-f', '--file', help='.csv file to clean')
     argparser.add_argument('-v', '--verbose', default=0, type=int, help='Verbosity level (0=none, 1=print automatic conflict resolutions, 2=print pedantic warnings')
     argparser.add_argument('-i', '--interactive', action='store_true', help='Ask user how ot resolve conflicts')
+    argparser.add_argument('-k', '--key', default='name', help='Name of the field used to find duplicates (compared once normalized)')
     argparser.add_argument('-o', '--output', help='Output .csv file')
     args = argparser.parse_args(string_args)
-    conflict = 'interactive' if args.interactive else 'keep2nd'
-    content = data.DeviceCarbonFootprint.csv_headers()
-    with open(args.file, 'rt', encoding='utf-8') as existing_file:
-        csvfile = csv.DictReader(existing_file)
-        seen: List[data.DeviceCarbonFootprint] = []
-        for row in csvfile:
-            result=data.DeviceCarbonFootprint(row)
+    conflict: Literal['keep2nd','interactive'] = 'interactive' if args.interactive else 'keep2nd'
+
+    def checked_devices(rows: Iterable[Dict[str, str]]) -> Iterator[Tuple[data.DeviceCarbonFootprint, bool]]:
+        for row in rows:
+            result=data.DeviceCarbonFootprint(typing.cast(data.DeviceCarbonFootprintData, row))
             if not 'comment' in result.data:
                 result.data['comment']=""
-            if row.get('sources'):
-                pdf=requests.get(result.data['sources'], headers={"user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/50.0.2661.102 Safari/537.36"})
-                unreach=False
-                if ( pdf.status_code == 200 ) and not ('error' in pdf.url) and not ('404' in pdf.url):
-                    open('./tempfile.pdf', 'wb').write(pdf.content)
-                    if 'sources_hash' in result.data:
-                        if not result.data['sources_hash'] == "":
-                            tempmd5=data.md5_file('./tempfile.pdf')
-                            if not tempmd5 == result.data['sources_hash']:
-                                result.data['comment']=result.data['comment'] + "File " + result.data['sources'] + " changed."
-                        else:
-                            result.data['sources_hash']=data.md5_file('./tempfile.pdf')
-                            result.data['comment']=result.data['comment'] + " MD5 hash added"
-                    else:
-                        result.data['sources_hash']=data.md5_file('./tempfile.pdf')
-                        result.data['comment']=result.data['comment'] + " MD5 hash added"
-                else:
-                    result.data['comment']=result.data['comment'] + " Source is unreachable"
-                    unreach=True
-                notseen=True
-                if not unreach:
-                    for i in seen:
-                        if row.get('name') == i.data["name"]:
-                            notseen=False
-                            new_result,report = data.DeviceCarbonFootprint.merge(i, result, conflict=conflict, verbose=args.verbose)
-                            new_result.data['comment']= result.data['comment'] + " merged"
-                            seen.remove(i)
-                            content += new_result.reorder().as_csv_row()
-                            print(new_result.reorder().as_csv_row())
-                            # Ne gere pas le cas de plus de 2 doublons
-                if notseen:
-                    seen.append(result)
-                    print(result.reorder().as_csv_row())
-        
-        for device in seen:
-            content += device.reorder().as_csv_row()
-        if args.output and args.output!="-":
-            with open(args.output, 'w', encoding='utf-8') as output:
-                output.write(content)
-        else:
-            sys.stdout.write(content)
+            # Devices whose sources are unreachable are not merged.
+            can_merge = _check_sources(result) if row.get('sources') else True
+            print(result.reorder().as_csv_row())
+            yield result, can_merge
+
+    # Rows are written to a temporary file, then moved to the output (which can be the input file)
+    # or copied to stdout after the progress messages.
+    output_dir = os.path.dirname(os.path.abspath(args.output)) if args.output and args.output!="-" else None
+    with open(args.file, 'rt', encoding='utf-8') as existing_file, \
+            tempfile.NamedTemporaryFile('w+', encoding='utf-8', newline='', dir=output_dir, delete=False) as content:
+        writer = data.DeviceCsvWriter(content)
+        devices = fold_duplicates(checked_devices(csv.DictReader(existing_file)), args.key, conflict, args.verbose)
+        writer.writerows(device.reorder() for device in devices)
+        if not output_dir:
+            content.seek(0)
+            shutil.copyfileobj(content, sys.stdout)
+    if output_dir:
+        os.replace(content.name, args.output)
+    else:
+        os.remove(content.name)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
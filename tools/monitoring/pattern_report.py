@@ -0,0 +1,86 @@
+"""Report the cost and the hit rate of a parser's regex tables on a folder of PDFs.
+
+Each PDF of the folder is parsed while the statistics of the patterns are collected (see
+text.collect_stats). The report lists, for each pattern of the parser's tables (module-level
+constants ending with _PATTERNS), how many times it was searched, how often it matched, and its
+cumulative and worst search times: slow patterns show up before they stall a crawl, and patterns
+that never match are candidates for removal.
+
+Run it with:
+
+```sh
+python -m tools.monitoring.pattern_report dell_laptop path/to/dell/pdfs
+```
+"""
+import argparse
+import importlib
+import os
+import sys
+import typing
+from typing import Callable, Dict, Iterator, List, Optional, Pattern, Tuple
+
+from tools.parsers.lib import data
+from tools.parsers.lib import pdf
+from tools.parsers.lib import text
+
+
+def main(string_args: Optional[List[str]] = None) -> None:
+    argparser = argparse.ArgumentParser(
+        description='Report the cost and hit rate of the patterns of a parser',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    argparser.add_argument('parser', help='Name of the parser module, e.g. dell_laptop')
+    argparser.add_argument('folder', help='Folder of .pdf files to parse')
+    argparser.add_argument(
+        '-s', '--sort', default='total', choices=('total', 'worst', 'calls', 'hits'),
+        help='Order of the patterns in the report (decreasing)')
+    argparser.add_argument(
+        '-b', '--text-backend', default='pdfminer', choices=('pdfminer', 'fitz'),
+        help='Library used to extract the text of the PDFs')
+    args = argparser.parse_args(string_args)
+
+    module = importlib.import_module(f'tools.parsers.{args.parser}')
+    parse = typing.cast(
+        Callable[[pdf.PdfDocument, str], Iterator[data.DeviceCarbonFootprint]], getattr(module, 'parse'))
+    tables: Dict[Pattern[str], Tuple[str, int]] = {}
+    for table_name, patterns in text.list_pattern_tables(module):
+        for index, pattern in enumerate(patterns):
+            tables.setdefault(pattern, (table_name, index))
+
+    filenames = sorted(
+        filename for filename in os.listdir(args.folder) if filename.lower().endswith('.pdf'))
+    nb_errors = 0
+    with text.collect_stats() as stats:
+        for filename in filenames:
+            path = os.path.join(args.folder, filename)
+            try:
+                with pdf.PdfDocument.from_path(path, text_backend=args.text_backend) as document:
+                    for unused_device in parse(document, filename):
+                        pass
+            except Exception as error:
+                nb_errors += 1
+                print(f'Error while parsing {filename}: {error!r}', file=sys.stderr)
+
+    # Patterns of the tables that were never searched are reported too.
+    for pattern in tables:
+        stats.setdefault(pattern, text.PatternStats())
+    sort_keys = {
+        'total': lambda stat: stat.total_time,
+        'worst': lambda stat: stat.worst_time,
+        'calls': lambda stat: stat.calls,
+        'hits': lambda stat: stat.hit_rate,
+    }
+    sort_key = sort_keys[args.sort]
+    print(f'{"table":<28} {"#":>3} {"calls":>6} {"hit rate":>8} {"total ms":>9} '
+          f'{"worst ms":>9}  pattern')
+    for pattern, stat in sorted(stats.items(), key=lambda item: -sort_key(item[1])):
+        table_name, index = tables.get(pattern, ('-', -1))
+        print(f'{table_name:<28} {index if index >= 0 else "-":>3} {stat.calls:>6} '
+              f'{stat.hit_rate:>8.0%} {stat.total_time * 1000:>9.2f} '
+              f'{stat.worst_time * 1000:>9.2f}  {pattern.pattern}')
+    never_matched = sum(1 for stat in stats.values() if not stat.hits)
+    print(f'{len(filenames)} file(s) parsed ({nb_errors} error(s)), '
+          f'{never_matched} pattern(s) never matched.')
+
+
+if __name__ == '__main__':
+    main()
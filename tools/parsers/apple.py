@@ -6,7 +6,7 @@ See an example here https://www.hpe.com/psnow/doc/a50002756enw?jumpid=in_hpesite
 import logging
 import re
 import datetime
-from typing import BinaryIO, Iterator
+from typing import Iterator
 
 from tools.parsers.lib import data
 from tools.parsers.lib import loader
@@ -60,7 +60,7 @@ _CATEGORIES = {
     'iMac': ('Workplace', 'Desktop'),
 }
 
-def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootprint]:
+def parse(body: pdf.PdfDocument, pdf_filename: str) -> Iterator[data.DeviceCarbonFootprint]:
     result = data.DeviceCarbonFootprintData()
 
 
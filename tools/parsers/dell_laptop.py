@@ -5,7 +5,7 @@ See an example here https://i.dell.com/sites/csdocuments/CorpComm_Docs/en/carbon
 import logging
 import re
 import datetime
-from typing import BinaryIO, Iterator, Dict, Any
+from typing import Iterator, Dict, Any
 
 from tools.parsers.lib import data
 from tools.parsers.lib.image import crop, find_text_in_image, image_to_text
@@ -47,13 +47,16 @@ _MANUF_PERCENT_PATTERN = re.compile(r'.*nufac[a-z0-9]*[a-z][^0-9\.]([0-9]*\.*[0-
 _EOL_PERCENT_PATTERN = re.compile(r'.*EoL([0-9]*\.*[0-9]*)\%.*')
 _TRANSPORT_PERCENT_PATTERN = re.compile(r'.*port[A-Za-z]*[^0-9\.]?([0-9]*\.*[0-9]*)\%.*')
 
+# Images too small or too elongated to be a readable pie chart (logos, icons, banners).
+_MIN_PIECHART_SIZE = 100
+_MAX_PIECHART_ASPECT_RATIO = 3
 
-def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootprint]:
+
+def parse(body: pdf.PdfDocument, pdf_filename: str) -> Iterator[data.DeviceCarbonFootprint]:
     result = data.DeviceCarbonFootprintData()
     
-    # Parse text from PDF.
-    pdf_as_text = pdf.pdf2txt(body)
-    extracted = text.search_all_patterns(_DELL_LCA_PATTERNS, pdf_as_text)
+    # Parse text from PDF, only reading the first pages if they contain all the fields.
+    extracted = text.search_all_patterns_in_pages(_DELL_LCA_PATTERNS, pdf.iter_page_texts(body))
     if not extracted:
         logging.error('The file "%s" did not match the Dell pattern', pdf_filename)
         return
@@ -62,14 +65,14 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
     if 'name' in extracted:
         result['name'] = extracted['name'].strip().removeprefix('Dell ')
     else:
-        raise ValueError(pdf_as_text)
+        raise ValueError(pdf.pdf2txt(body))
     if 'footprint' in extracted:
         result['gwp_total'] = float(extracted['footprint'])
     else:
-        raise ValueError(pdf_as_text)
+        raise ValueError(pdf.pdf2txt(body))
     if result.get('gwp_total') and 'error' in extracted:
         result['gwp_error_ratio'] = round((float(extracted['error']) / result['gwp_total']), 3)
-    elif not "GaBi" in pdf_as_text:
+    elif not "GaBi" in (pdf_as_text := pdf.pdf2txt(body)):
         raise ValueError(pdf_as_text)
     if 'date' in extracted:
         result['report_date'] = extracted['date']
@@ -109,7 +112,9 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
         unpie = piechart_analyser.PiechartAnalyzer(debug=2)
 
         pie_data: Dict[str, Any] = {}
-        for image in pdf.list_images(body):
+        for image in pdf.list_images(
+                body, min_width=_MIN_PIECHART_SIZE, min_height=_MIN_PIECHART_SIZE,
+                max_aspect_ratio=_MAX_PIECHART_ASPECT_RATIO):
             unpie_output = unpie.analyze(image, ocrprofile='DELL')
             if unpie_output and len(unpie_output.keys()) > len(pie_data.keys()):
                 # print(unpie_output)
@@ -7,7 +7,6 @@ import logging
 import re
 import datetime
 from typing import BinaryIO, Iterator
-import os
 
 from tools.parsers.lib import data
 from tools.parsers.lib.image import crop, find_text_in_image, image_to_text
@@ -16,7 +15,6 @@ from tools.parsers.lib import pdf
 from tools.parsers.lib import text
 import argparse
 import requests
-import io
 from tools.parsers import dell_laptop
 
 
@@ -26,18 +24,15 @@ argparser.add_argument("-s", "--source", required=True, help="URL to .pdf to be
 args = vars(argparser.parse_args())
 pdf_path = args["source"]
 url = ""
-rm_tempfile = False
 if re.search('http(s)*\:\/\/*.', pdf_path):
-    open('./tempfile.pdf', 'wb').write(requests.get(pdf_path).content)
-    url=pdf_path
-    pdf_path = "./tempfile.pdf"
-    rm_tempfile = True
+    url = pdf_path
+    document = pdf.PdfDocument(requests.get(pdf_path).content)
+else:
+    document = pdf.PdfDocument.from_path(pdf_path)
 
-with open(pdf_path, 'rb') as fh:
-     for result in dell_laptop.parse(io.BytesIO(fh.read()), url):
-        result.data['sources_hash']=data.md5_file(pdf_path)
-        result.data['sources']=url
+with document:
+    for result in dell_laptop.parse(document, url):
+        result.data['sources_hash'] = document.md5()
+        result.data['sources'] = url
         print(result.as_csv_row())
-if rm_tempfile:
-    os.remove('./tempfile.pdf')
 quit()
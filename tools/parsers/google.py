@@ -5,7 +5,7 @@ See an example here https://www.gstatic.com/gumdrop/sustainability/pixel5-produc
 import logging
 import re
 import datetime
-from typing import BinaryIO, Iterator
+from typing import Iterator
 
 from tools.parsers.lib import data
 from tools.parsers.lib import loader
@@ -63,7 +63,7 @@ _CATEGORIES = {
 }
 
 
-def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootprint]:
+def parse(body: pdf.PdfDocument, pdf_filename: str) -> Iterator[data.DeviceCarbonFootprint]:
     result = data.DeviceCarbonFootprintData()
     result['manufacturer'] = 'Google'
 
@@ -107,33 +107,40 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
     result['added_date'] = now.strftime('%Y-%m-%d')
     result['add_method'] = "Google Auto Parser"
 
-    for block, page in pdf.search_text(body, 'Customer use'):
+    labels = pdf.search_texts(
+        body, ('Customer use', 'Production', 'Recycling', 'Distribution', 'Transportation'))
+    for block, page in labels['Customer use']:
         # Look for percentage below "Customer use".
-        use_text = page.get_textbox((block.x0, block.y0, block.x1, block.y1 * 2.1 - block.y0))
+        use_text = pdf.word_index(body, page.number).get_textbox(
+            (block.x0, block.y0, block.x1, block.y1 * 2.1 - block.y0))
         if (use_match := _USE_PERCENT_PATTERN.search(use_text)):
             result['gwp_use_ratio'] = round(float(use_match.group(1)) / 100,3)
             break
-    for block, page in pdf.search_text(body, 'Production'):
+    for block, page in labels['Production']:
         # Look for percentage below "Production".
-        prod_text = page.get_textbox((block.x0, block.y0, block.x1, block.y1 * 2.1 - block.y0))
+        prod_text = pdf.word_index(body, page.number).get_textbox(
+            (block.x0, block.y0, block.x1, block.y1 * 2.1 - block.y0))
         if (prod_match := _PRODUCTION_PERCENT_PATTERN.search(prod_text)):
             result['gwp_manufacturing_ratio'] = round(float(prod_match.group(1)) / 100,3)
             break
-    for block, page in pdf.search_text(body, 'Recycling'):
+    for block, page in labels['Recycling']:
         # Look for percentage below "EoL".
-        eol_text = page.get_textbox((block.x0, block.y0, block.x1, block.y1 * 2.1 - block.y0))
+        eol_text = pdf.word_index(body, page.number).get_textbox(
+            (block.x0, block.y0, block.x1, block.y1 * 2.1 - block.y0))
         if (eol_match := _EOL_PERCENT_PATTERN.search(eol_text)):
             result['gwp_eol_ratio'] = round(float(eol_match.group(1)) / 100,3)
             break
-    for block, page in pdf.search_text(body, 'Distribution'):
+    for block, page in labels['Distribution']:
         # Look for percentage below "Transport".
-        transport_text = page.get_textbox((block.x0, block.y0, block.x1, block.y1 * 2.1 - block.y0))
+        transport_text = pdf.word_index(body, page.number).get_textbox(
+            (block.x0, block.y0, block.x1, block.y1 * 2.1 - block.y0))
         if (transport_match := _TRANSPORT_PERCENT_PATTERN.search(transport_text)):
             result['gwp_transport_ratio'] = round(float(transport_match.group(2)) / 100,3)
             break
-    for block, page in pdf.search_text(body, 'Transportation'):
+    for block, page in labels['Transportation']:
         # Look for percentage below "Transport".
-        transport_text = page.get_textbox((block.x0, block.y0, block.x1, block.y1 * 2.1 - block.y0))
+        transport_text = pdf.word_index(body, page.number).get_textbox(
+            (block.x0, block.y0, block.x1, block.y1 * 2.1 - block.y0))
         if (transport_match := _TRANSPORT_PERCENT_PATTERN.search(transport_text)):
             result['gwp_transport_ratio'] = round(float(transport_match.group(2)) / 100,3)
             break
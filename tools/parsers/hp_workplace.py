@@ -6,7 +6,7 @@ See an example here https://h22235.www2.hp.com/hpinfo/globalcitizenship/environm
 import logging
 import re
 import datetime
-from typing import BinaryIO, Iterator, Dict, Any
+from typing import Iterator, Dict, Any
 import hashlib
 import math
 
@@ -75,7 +75,21 @@ _MANUF_LOCATION_PATTERNS = {
     re.compile(r'(?P<assembly_location>^[A-Za-z ]*)\s*(M|m)anufacturing location')
 }
 
-def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootprint]:
+# Labels to search in the layout for the fields that the patterns could not extract.
+_FALLBACK_LABELS = {
+    'weight': 'weight',
+    'screen_size': 'screen size',
+    'assembly_location': 'manufacturing location',
+    'lifetime': 'lifetime of pro',
+    'use_location': 'use location',
+    'energy_demand': 'energy demand',
+}
+
+# Images too small or too elongated to be a readable pie chart (logos, icons, banners).
+_MIN_PIECHART_SIZE = 100
+_MAX_PIECHART_ASPECT_RATIO = 3
+
+def parse(body: pdf.PdfDocument, pdf_filename: str) -> Iterator[data.DeviceCarbonFootprint]:
     result = data.DeviceCarbonFootprintData()
     result['comment'] = ''
 
@@ -109,11 +123,14 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
         result['gwp_total'] = float(extracted['footprint'])
     if 'date' in extracted:
         result['report_date'] = extracted['date']
+    # Search in one pass all the labels needed by the fallbacks.
+    labels = pdf.search_texts(
+        body, [label for group, label in _FALLBACK_LABELS.items() if group not in extracted])
     if 'weight' in extracted:
         result['weight'] = float(extracted['weight'].replace(' ',''))
     else:
-        for block, page in pdf.search_text(body, 'weight'):
-            temp_text = page.get_textbox((block.x0, block.y0 - 2, block.x1 + 150, block.y1 + 2))
+        for block, page in labels['weight']:
+            temp_text = pdf.word_index(body, page.number).right_of(block, 150, margin=2)
             extracted_weight = text.search_all_patterns(_WEIGHT_PATTERNS, temp_text)
             if 'weight' in extracted_weight:
                 result['weight']=extracted_weight['weight']
@@ -121,8 +138,8 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
     if 'screen_size' in extracted:
         result['screen_size'] = float(extracted['screen_size'])
     else:
-        for block, page in pdf.search_text(body, 'screen size'):
-            temp_text = page.get_textbox((block.x0, block.y0 - 2, block.x1 + 150, block.y1 + 2))
+        for block, page in labels['screen size']:
+            temp_text = pdf.word_index(body, page.number).right_of(block, 150, margin=2)
             extracted_temp = text.search_all_patterns(_SCREEN_PATTERNS, temp_text)
             if 'screen_size' in extracted_temp:
                 result['screen_size']=extracted_temp['screen_size']
@@ -130,8 +147,8 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
     if 'assembly_location' in extracted:
         result['assembly_location'] = extracted['assembly_location']
     else:
-        for block, page in pdf.search_text(body, 'manufacturing location'):
-            temp_text = page.get_textbox((block.x0, block.y0 - 2, block.x1 + 160, block.y1 + 2))
+        for block, page in labels['manufacturing location']:
+            temp_text = pdf.word_index(body, page.number).right_of(block, 160, margin=2)
             extracted_temp = text.search_all_patterns(_MANUF_LOCATION_PATTERNS, temp_text)
             if 'assembly_location' in extracted_temp:
                 result['assembly_location']=extracted_temp['assembly_location']
@@ -139,8 +156,8 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
     if 'lifetime' in extracted:
         result['lifetime'] = float(extracted['lifetime'])
     else:
-        for block, page in pdf.search_text(body, 'lifetime of pro'):
-            temp_text = page.get_textbox((block.x0, block.y0 - 2, block.x1 + 150, block.y1 + 2))
+        for block, page in labels['lifetime of pro']:
+            temp_text = pdf.word_index(body, page.number).right_of(block, 150, margin=2)
             extracted_temp = text.search_all_patterns(_LIFETIME_PATTERNS, temp_text)
             if 'lifetime' in extracted_temp:
                 result['lifetime']=float(extracted_temp['lifetime'])
@@ -148,8 +165,8 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
     if 'use_location' in extracted:
         result['use_location'] = extracted['use_location']
     else:
-        for block, page in pdf.search_text(body, 'use location'):
-            temp_text = page.get_textbox((block.x0, block.y0 - 2, block.x1 + 160, block.y1 + 2))
+        for block, page in labels['use location']:
+            temp_text = pdf.word_index(body, page.number).right_of(block, 160, margin=2)
             extracted_temp = text.search_all_patterns(_USE_LOCATION_PATTERNS, temp_text)
             if 'use_location' in extracted_temp:
                 result['use_location']=extracted_temp['use_location']
@@ -157,8 +174,8 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
     if 'energy_demand' in extracted:
         result['yearly_tec'] = float(extracted['energy_demand'].replace(' ',''))
     else:
-        for block, page in pdf.search_text(body, 'energy demand'):
-            temp_text = page.get_textbox((block.x0, block.y0 - 2, block.x1 + 150, block.y1 + 2))
+        for block, page in labels['energy demand']:
+            temp_text = pdf.word_index(body, page.number).right_of(block, 150, margin=2)
             extracted_temp = text.search_all_patterns(_ENERGY_PATTERNS, temp_text)
             if 'energy_demand' in extracted_temp:
                 result['yearly_tec']=float(extracted_temp['energy_demand'])
@@ -181,7 +198,9 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
         unpie = piechart_analyser.PiechartAnalyzer(debug=0)
 
         pie_data: Dict[str, Any] = {}
-        for image in pdf.list_images(body):
+        for image in pdf.list_images(
+                body, min_width=_MIN_PIECHART_SIZE, min_height=_MIN_PIECHART_SIZE,
+                max_aspect_ratio=_MAX_PIECHART_ASPECT_RATIO):
             md5 = hashlib.md5(image).hexdigest()
             if (md5 == 'aa44d95aad83a5871bd7974cafd63a06'):
                 continue
@@ -191,10 +210,10 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
                 if 'use' in pie_data:
                     break
         if not pie_data:
-            # try with full page rendering
-            image = pdf.pdf2img(body, 0)
-            rows, columns, depth = image.shape
-            bottom_half = image[int(rows/2):, :, :].copy()
+            # try with the rendering of the bottom half of the first page
+            page = pdf.page_rect(body, 0)
+            bottom_half = pdf.pdf2img(
+                body, 0, clip=(page.x0, (page.y0 + page.y1) / 2, page.x1, page.y1))
             pie_data = unpie.analyze(bottom_half, ocrprofile='HP')
         
         if pie_data:
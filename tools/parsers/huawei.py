@@ -6,7 +6,7 @@ See an example here https://download-c1.huawei.com/download/downloadCenter?downl
 import logging
 import re
 import datetime
-from typing import BinaryIO, Iterator
+from typing import Iterator
 
 from .lib import data
 from .lib import loader
@@ -29,7 +29,7 @@ _PRODUCT_PATTERN = re.compile(r'Product:\s*(?:Huawei\s*)?(\S.+\S)', re.I)
 _PRODUCT_TYPE_PATTERN = re.compile(r'Product type:\s*(\S.+\S)', re.I)
 
 
-def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootprint]:
+def parse(body: pdf.PdfDocument, pdf_filename: str) -> Iterator[data.DeviceCarbonFootprint]:
     result = data.DeviceCarbonFootprintData()
     result['manufacturer'] = 'Huawei'
 
@@ -41,15 +41,19 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
         return
 
     # Extract some text by line:
+    labels = pdf.search_texts(
+        body, [label for group, label in (('name', 'Product:'), ('type', 'Product type:'))
+               if group not in extracted])
     if 'name' not in extracted:
-        for rect, page in pdf.search_text(body, 'Product:'):
-            line = page.get_textbox((rect.x0, rect.y0 - 2, rect.x1 * 5 - rect.x0 * 4, rect.y1 + 2))
+        for rect, page in labels['Product:']:
+            line = pdf.word_index(body, page.number).right_of(
+                rect, (rect.x1 - rect.x0) * 4, margin=2)
             if (product_match := _PRODUCT_PATTERN.search(line)):
                 extracted['name'] = product_match.group(1)
                 break
     if 'type' not in extracted:
-        for rect, page in pdf.search_text(body, 'Product type:'):
-            line = page.get_textbox((rect.x0, rect.y0, rect.x1 * 5 - rect.x0 * 4, rect.y1))
+        for rect, page in labels['Product type:']:
+            line = pdf.word_index(body, page.number).right_of(rect, (rect.x1 - rect.x0) * 4)
             if (type_match := _PRODUCT_TYPE_PATTERN.search(line)):
                 extracted['type'] = type_match.group(1)
                 break
@@ -6,7 +6,7 @@ See an example here https://static.lenovo.com/ww/docs/regulatory/eco-declaration
 import logging
 import re
 import datetime
-from typing import BinaryIO, Iterator, Dict, Any
+from typing import Iterator, Dict, Any
 
 from tools.parsers.lib import data
 from tools.parsers.lib import loader
@@ -31,14 +31,17 @@ _LENOVO_LCA_PATTERNS = (
 
 _USE_PERCENT_PATTERN = re.compile(r'.*Use([0-9]*\.*[0-9]*)\%.*')
 
+# Images too small or too elongated to be a readable pie chart (logos, icons, banners).
+_MIN_PIECHART_SIZE = 100
+_MAX_PIECHART_ASPECT_RATIO = 3
 
-def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootprint]:
+
+def parse(body: pdf.PdfDocument, pdf_filename: str) -> Iterator[data.DeviceCarbonFootprint]:
     result = data.DeviceCarbonFootprintData()
     result['manufacturer'] = 'Lenovo'
 
-    # Parse text from PDF.
-    pdf_as_text = pdf.pdf2txt(body)
-    extracted = text.search_all_patterns(_LENOVO_LCA_PATTERNS, pdf_as_text)
+    # Parse text from PDF, only reading the first pages if they contain all the fields.
+    extracted = text.search_all_patterns_in_pages(_LENOVO_LCA_PATTERNS, pdf.iter_page_texts(body))
     if not extracted:
         logging.error('The file "%s" did not match the Lenovo pattern', pdf_filename)
         return
@@ -49,7 +52,7 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
     if 'footprint' in extracted:
         result['gwp_total'] = float(extracted['footprint'])
     else:
-        raise ValueError((repr(pdf_as_text), extracted))
+        raise ValueError((repr(pdf.pdf2txt(body)), extracted))
     if result.get('gwp_total') and 'error' in extracted:
         result['gwp_error_ratio'] = round((float(extracted['error']) / result['gwp_total']), 3)
     if 'date' in extracted:
@@ -82,7 +85,9 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
         unpie = piechart_analyser.PiechartAnalyzer(debug=0)
 
         pie_data: Dict[str, Any] = {}
-        for image in pdf.list_images(body):
+        for image in pdf.list_images(
+                body, min_width=_MIN_PIECHART_SIZE, min_height=_MIN_PIECHART_SIZE,
+                max_aspect_ratio=_MAX_PIECHART_ASPECT_RATIO):
             unpie_output = unpie.analyze(image, ocrprofile='Lenovo')
             if unpie_output and len(unpie_output.keys()) > len(pie_data.keys()):
                 # print(unpie_output)
@@ -90,10 +95,10 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
                 if 'use' in pie_data and 'prod' in pie_data:
                     break
         if not pie_data:
-            # try with full page rendering
-            image = pdf.pdf2img(body, 0)
-            rows, columns, depth = image.shape
-            crop = image[:int(rows/2), int(columns/2):, :].copy()
+            # try with the rendering of the top right quarter of the first page
+            page = pdf.page_rect(body, 0)
+            crop = pdf.pdf2img(
+                body, 0, clip=((page.x0 + page.x1) / 2, page.y0, page.x1, (page.y0 + page.y1) / 2))
             pie_data = unpie.analyze(crop, ocrprofile='Lenovo')
             print(pie_data)
         if pie_data:
@@ -0,0 +1,116 @@
+"""A local on-disk cache for artifacts extracted from PDF files.
+
+Artifacts are stored by entry: one folder per PDF content hash and extractor version, containing
+one file per artifact (JSON values or NumPy arrays). The least recently used entries are evicted
+once the cache grows over its maximum size.
+"""
+import json
+import os
+import shutil
+import tempfile
+import typing
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+if typing.TYPE_CHECKING:
+    from typing import IO
+
+# Default maximum size of a cache, in bytes.
+_DEFAULT_MAX_SIZE = 1 << 30
+
+
+class ArtifactCache:
+    """A size-bounded directory of cached artifacts, with LRU eviction."""
+
+    def __init__(self, directory: str, max_size: int = _DEFAULT_MAX_SIZE) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        # Total size of the cache, computed on the first write.
+        self._size: Optional[int] = None
+
+    def _entry_path(self, entry: str) -> str:
+        return os.path.join(self.directory, entry)
+
+    def _touch(self, entry: str) -> None:
+        try:
+            os.utime(self._entry_path(entry))
+        except FileNotFoundError:
+            pass
+
+    def get_json(self, entry: str, name: str) -> Any:
+        """Get a JSON artifact of an entry, or None if it is not cached."""
+        try:
+            with open(
+                    os.path.join(self._entry_path(entry), f'{name}.json'), 'rt',
+                    encoding='utf-8') as artifact_file:
+                value = json.load(artifact_file)
+        except (FileNotFoundError, ValueError):
+            return None
+        self._touch(entry)
+        return value
+
+    def set_json(self, entry: str, name: str, value: Any) -> None:
+        """Store a JSON artifact for an entry."""
+        self._write(
+            entry, f'{name}.json',
+            lambda artifact_file: artifact_file.write(json.dumps(value).encode('utf-8')))
+
+    def get_array(self, entry: str, name: str) -> Optional['np.ndarray[Any, Any]']:
+        """Get a NumPy array artifact of an entry, or None if it is not cached."""
+        try:
+            array = np.load(os.path.join(self._entry_path(entry), f'{name}.npy'))
+        except (FileNotFoundError, ValueError):
+            return None
+        self._touch(entry)
+        return typing.cast('np.ndarray[Any, Any]', array)
+
+    def set_array(self, entry: str, name: str, array: 'np.ndarray[Any, Any]') -> None:
+        """Store a NumPy array artifact for an entry."""
+        self._write(entry, f'{name}.npy', lambda artifact_file: np.save(artifact_file, array))
+
+    def _write(self, entry: str, filename: str, write: Callable[['IO[bytes]'], Any]) -> None:
+        entry_path = self._entry_path(entry)
+        os.makedirs(entry_path, exist_ok=True)
+        # Write to a temporary file first, so that readers never see a partial artifact.
+        with tempfile.NamedTemporaryFile(dir=entry_path, delete=False) as artifact_file:
+            write(artifact_file)
+        path = os.path.join(entry_path, filename)
+        try:
+            replaced_size = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced_size = 0
+        os.replace(artifact_file.name, path)
+        if self._size is None:
+            total = sum(size for unused_mtime, size, unused_entry in self._list_entries())
+        else:
+            total = self._size + os.path.getsize(path) - replaced_size
+        self._size = total
+        if total > self.max_size:
+            self._evict(keep=entry)
+
+    def _list_entries(self) -> List[Tuple[float, int, str]]:
+        """List the entries of the cache with their last access time and their size."""
+        entries = []
+        for entry in os.listdir(self.directory):
+            entry_path = self._entry_path(entry)
+            if not os.path.isdir(entry_path):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(entry_path, filename))
+                for filename in os.listdir(entry_path))
+            entries.append((os.path.getmtime(entry_path), size, entry))
+        return entries
+
+    def _evict(self, keep: str) -> None:
+        """Remove the least recently used entries until the cache fits in its maximum size."""
+        entries = sorted(self._list_entries())
+        total = sum(size for unused_mtime, size, unused_entry in entries)
+        for unused_mtime, size, entry in entries:
+            if total <= self.max_size:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(self._entry_path(entry), ignore_errors=True)
+            total -= size
+        self._size = total
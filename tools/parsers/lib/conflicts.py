@@ -0,0 +1,168 @@
+"""Resolve the conflicts of device merges with rules, instead of asking the user.
+
+The rules are a JSON object mapping fields to their policies, tried in order until one of them
+picks a value. The policies of "*" apply to the fields without their own rules:
+
+```json
+{
+  "gwp_total": ["mirror", {"policy": "max", "tolerance": 0.1}],
+  "lifetime": "newer",
+  "*": "non_manual"
+}
+```
+
+Policies:
+- newer, older: keep the value of the newer (resp. older) device.
+- non_manual: keep the value of the device whose add_method is not "Manual", if only one is.
+- max, min: keep the largest (resp. smallest) value, if the values differ by at most tolerance (a
+  share of the largest absolute value; any difference if it is not set).
+- mirror: keep the value of the device whose sources_hash is the hash of its source file in a local
+  mirror folder (named as in their URLs, as for check_mirror), if only one is.
+
+The conflicts that no policy resolves are left to the conflict option of the merge.
+"""
+import functools
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tools.parsers.lib import data
+from tools.parsers.lib import hashing
+
+# The device whose value a policy keeps: the first (older) or the second (newer) one of a merge.
+_OLDER = 0
+_NEWER = 1
+
+_Policy = Callable[[data.AnyDeviceCarbonFootprint, data.AnyDeviceCarbonFootprint, str], Optional[int]]
+
+
+def _pick_one(is_older: bool, is_newer: bool) -> Optional[int]:
+    """Pick the device for which a test is true, if it is only true for one of them."""
+    if is_older == is_newer:
+        return None
+    return _OLDER if is_older else _NEWER
+
+
+def _keep(choice: int, device1: data.AnyDeviceCarbonFootprint, device2: data.AnyDeviceCarbonFootprint,
+          field: str) -> Optional[int]:
+    return choice
+
+
+def _non_manual(device1: data.AnyDeviceCarbonFootprint, device2: data.AnyDeviceCarbonFootprint,
+                field: str) -> Optional[int]:
+    return _pick_one(
+        str(device1.get('add_method')).lower() != 'manual',
+        str(device2.get('add_method')).lower() != 'manual')
+
+
+def _extremum(is_max: bool, tolerance: Optional[float], device1: data.AnyDeviceCarbonFootprint,
+              device2: data.AnyDeviceCarbonFootprint, field: str) -> Optional[int]:
+    value1, value2 = device1.get(field), device2.get(field)
+    if isinstance(value1, str) or isinstance(value2, str):
+        return None
+    if tolerance is not None and abs(value1 - value2) > tolerance * max(abs(value1), abs(value2)):
+        return None
+    return _OLDER if (value1 > value2) == is_max else _NEWER
+
+
+class ConflictResolver:
+    """Rules compiled to pick the value of each conflicting field.
+
+    Call it with the two devices of a merge and a conflicting field: it returns 0 to keep the value
+    of the first device, 1 for the second one, or None if no rule applies (see data.Resolve).
+    """
+
+    def __init__(self, rules: Dict[str, Any], mirror: Optional[str] = None,
+                 hash_cache: Optional[str] = None) -> None:
+        self.rules = rules
+        self.mirror = mirror
+        self.hash_cache = hash_cache
+        self._cache = hashing.HashCache(hash_cache)
+        self._mirror_hashes: Dict[str, Optional[str]] = {}
+        fields = data.DeviceCarbonFootprintData.__annotations__
+        policies: Dict[str, List[_Policy]] = {}
+        for field, field_rules in rules.items():
+            if field != '*' and field not in fields:
+                raise ValueError(f'Rules for an unknown field: "{field}"')
+            if not isinstance(field_rules, list):
+                field_rules = [field_rules]
+            policies[field] = [self._compile(field, rule) for rule in field_rules]
+        default = policies.get('*', [])
+        self._policies = {field: policies.get(field, default) for field in fields}
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Compiled again when unpickled, e.g. in the worker processes of merge_csv --jobs.
+        return (ConflictResolver, (self.rules, self.mirror, self.hash_cache))
+
+    @classmethod
+    def from_file(cls, filename: str, mirror: Optional[str] = None,
+                  hash_cache: Optional[str] = None) -> 'ConflictResolver':
+        with open(filename, 'rt', encoding='utf-8') as rules_file:
+            rules = json.load(rules_file)
+        if not isinstance(rules, dict):
+            raise ValueError(f'The rules of {filename} should be a JSON object')
+        return cls(rules, mirror, hash_cache)
+
+    def _compile(self, field: str, rule: Any) -> _Policy:
+        if isinstance(rule, str):
+            rule = {'policy': rule}
+        if not isinstance(rule, dict) or 'policy' not in rule:
+            raise ValueError(f'Invalid rule for "{field}": {rule!r}')
+        options = dict(rule)
+        name = options.pop('policy')
+        policy: _Policy
+        if name in ('newer', 'older'):
+            policy = functools.partial(_keep, _NEWER if name == 'newer' else _OLDER)
+        elif name == 'non_manual':
+            policy = _non_manual
+        elif name in ('max', 'min'):
+            policy = functools.partial(_extremum, name == 'max', options.pop('tolerance', None))
+        elif name == 'mirror':
+            if not self.mirror:
+                raise ValueError(f'The mirror policy of "{field}" needs a mirror folder')
+            policy = self._matches_mirror
+        else:
+            raise ValueError(f'Unknown policy for "{field}": "{name}"')
+        if options:
+            raise ValueError(f'Unknown options of the {name} policy for "{field}": {", ".join(options)}')
+        return policy
+
+    def _mirror_hash(self, sources: str) -> Optional[str]:
+        pdf_file = data.source_file(sources)
+        if not pdf_file or not self.mirror:
+            return None
+        path = os.path.join(self.mirror, pdf_file)
+        if path not in self._mirror_hashes:
+            try:
+                self._mirror_hashes[path] = self._cache.hash_file(path)
+            except OSError:
+                self._mirror_hashes[path] = None
+        return self._mirror_hashes[path]
+
+    def _is_mirrored(self, device: data.AnyDeviceCarbonFootprint) -> bool:
+        sources_hash = device.get('sources_hash')
+        return bool(sources_hash) and sources_hash == self._mirror_hash(str(device.get('sources')))
+
+    def _matches_mirror(self, device1: data.AnyDeviceCarbonFootprint, device2: data.AnyDeviceCarbonFootprint,
+                        field: str) -> Optional[int]:
+        return _pick_one(self._is_mirrored(device1), self._is_mirrored(device2))
+
+    def __call__(self, device1: data.AnyDeviceCarbonFootprint, device2: data.AnyDeviceCarbonFootprint,
+                 field: str) -> Optional[int]:
+        for policy in self._policies[field]:
+            choice = policy(device1, device2, field)
+            if choice is not None:
+                return choice
+        return None
+
+    def mirror_hashes(self) -> Dict[str, Tuple[int, int, str]]:
+        """The hashes of the mirrored files computed by this resolver (see HashCache.updates)."""
+        return self._cache.updates()
+
+    def add_mirror_hashes(self, hashes: Dict[str, Tuple[int, int, str]]) -> None:
+        """Add the hashes computed by a copy of this resolver, e.g. in a worker process."""
+        self._cache.update(hashes)
+
+    def save(self) -> None:
+        """Save the hashes of the mirrored files, if the resolver has a hash cache file."""
+        self._cache.save()
@@ -1,10 +1,12 @@
 import csv
+import functools
 import io
-import hashlib
 import math
 import re
 from sre_compile import isstring
-from typing import Any, Dict, Iterable, Iterator, Literal, Union, TextIO, TypedDict, Tuple, List, Set, cast
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, Literal, NoReturn, Optional, Sequence, Union, TextIO, TypedDict, Tuple, List, Set, cast
+
+from tools.parsers.lib import hashing
 
 class DeviceCarbonFootprintData(TypedDict, total=False):
     """The carbon footprint data for one device model."""
@@ -42,30 +44,76 @@ class DeviceCarbonFootprintData(TypedDict, total=False):
     comment: str
     
 
-def md5_file(fname):
-    hash_md5 = hashlib.md5()
-    with open(fname, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+# The fields of a device, in the order of the CSV columns, and the position of each of them.
+_FIELDS: Tuple[str, ...] = tuple(DeviceCarbonFootprintData.__annotations__.keys())
+_FIELD_INDEX: Dict[str, int] = {key: index for index, key in enumerate(_FIELDS)}
+
+# Fields whose differences are not conflicts when merging devices.
+MERGE_IGNORED_FIELDS = ('added_date', 'add_method', 'comment')
+
+# Resolve the conflict of a field when merging two devices: return 0 to keep the value of the first
+# device, 1 for the second one, or None to leave the conflict (see conflicts.ConflictResolver).
+Resolve = Callable[['AnyDeviceCarbonFootprint', 'AnyDeviceCarbonFootprint', str], Optional[int]]
+
+def md5_file(fname: str) -> str:
+    return hashing.hash_file(fname)
+
+def md5(pdf: Union[BinaryIO, bytes]) -> str:
+    if isinstance(pdf, bytes):
+        return hashing.hash_buffer(pdf)
+    return hashing.hash_stream(pdf)
 
-def md5(pdf):
-    hash_md5 = hashlib.md5()
-    for chunk in iter(lambda: pdf.read(4096), b""):
-        hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+# The decimal points that tools/gen_fr.py turns into commas, in this order, to convert the us CSV
+# file to the fr one.
+_FR_DECIMAL_POINTS = (
+    re.compile(r'(.*[0-9]*)\.([0-9].*)'),
+    re.compile(r'(.*[0-9]*)\.([0-9].*(in|TB|GB))'),
+)
+
+def _format_fr_value(value: Any) -> str:
+    text = str(value)
+    if '.' not in text:
+        return text
+    for pattern in _FR_DECIMAL_POINTS:
+        text = pattern.sub(r'\1,\2', text)
+    return text
 
 def _format_csv_row(row: Iterable[Any], csv_format: Literal['us', 'fr']) -> str:
     output = io.StringIO()
     writer = csv.writer(output, delimiter=';' if csv_format == 'fr' else ',')
     writer.writerow([
-        str(value).replace('.', ',')
-        if csv_format == 'fr' and isinstance(value, float)
-        else str(value)
+        _format_fr_value(value) if csv_format == 'fr' else str(value)
         for value in row
     ])
     return output.getvalue()
 
+class DeviceCsvWriter:
+    """Write devices as CSV rows to open files, in the us format, the fr format or both at once.
+
+    Rows are the same as the ones rendered by as_csv_row: the fr ones are the us ones converted as
+    tools/gen_fr.py does.
+    """
+
+    def __init__(self, us_file: Optional[TextIO] = None, fr_file: Optional[TextIO] = None,
+                 headers: bool = True):
+        self._us_writer = csv.writer(us_file) if us_file else None
+        self._fr_writer = csv.writer(fr_file, delimiter=';') if fr_file else None
+        if headers:
+            for writer in (self._us_writer, self._fr_writer):
+                if writer:
+                    writer.writerow(_FIELDS)
+
+    def writerow(self, device: 'AnyDeviceCarbonFootprint') -> None:
+        values = device.values()
+        if self._us_writer:
+            self._us_writer.writerow([str(value) for value in values])
+        if self._fr_writer:
+            self._fr_writer.writerow([_format_fr_value(value) for value in values])
+
+    def writerows(self, devices: Iterable['AnyDeviceCarbonFootprint']) -> None:
+        for device in devices:
+            self.writerow(device)
+
 def is_empty(x):
   return isinstance(x,str) and x=='' or not isinstance(x,str) and (math.isnan(x) or x==0)
 
@@ -76,11 +124,26 @@ def are_equal(a: Union[float, str, int], b: Union[float, str, int]):
         return abs(a-b) <= 2e-3 * max(a,b)
     return False
 
+# Normalized forms are cached by raw value: the same strings come back in every row and every
+# snapshot of a dataset, and in each merge they are part of.
+_NORMALIZED_CACHE_SIZE = 1 << 16
+_MULTIPLE_SPACES = re.compile(r'\s\s+')
+_PDF_FILE = re.compile(r'([^\/]*\.pdf)')
+
+@functools.lru_cache(maxsize=_NORMALIZED_CACHE_SIZE)
+def normalize(value: str) -> str:
+    """Normalize a string for fuzzy comparisons."""
+    return _MULTIPLE_SPACES.sub(' ', value.replace('”','in')).strip().lower()
+
+@functools.lru_cache(maxsize=_NORMALIZED_CACHE_SIZE)
+def source_file(sources: str) -> Optional[str]:
+    """The name of the PDF file in a sources URL, if any."""
+    pdf_file = _PDF_FILE.search(sources)
+    return pdf_file[0] if pdf_file else None
+
 def are_close_enough(a: Union[float, str, int], b: Union[float, str, int]):
     if isinstance(a, str) and isinstance(b, str):
-        aval = re.sub(r'\s\s+', ' ', a.replace('”','in')).strip().lower()
-        bval = re.sub(r'\s\s+', ' ', b.replace('”','in')).strip().lower()
-        return aval==bval
+        return normalize(a)==normalize(b)
     elif (not isinstance(a, str)) and (not isinstance(b, str)):
         # tolerate a 5% relative error
         return abs(a-b) <= 0.05 * max(a,b)
@@ -134,6 +197,10 @@ class DeviceCarbonFootprint:
                 typed_data[key]=self.get(key)  # type: ignore [misc]
         return DeviceCarbonFootprint(typed_data)
 
+    def values(self) -> Tuple[Union[float, str, int], ...]:
+        """The values of all fields, in the order of the CSV columns."""
+        return tuple(self.get(key) for key in _FIELDS)
+
     def as_csv_row(self, csv_format: Literal['us', 'fr'] = 'us') -> str:
         """Render the CSV row corresponding to this device model."""
         return _format_csv_row(
@@ -142,71 +209,239 @@ class DeviceCarbonFootprint:
             csv_format=csv_format)
 
     @staticmethod
-    def merge(device1: 'DeviceCarbonFootprint', device2: 'DeviceCarbonFootprint',
-              conflict: Literal['keep2nd','interactive'] = 'keep2nd', verbose: int = 0
-              ) -> Tuple['DeviceCarbonFootprint',List[Set],List[str]]:
+    def merge(device1: 'AnyDeviceCarbonFootprint', device2: 'AnyDeviceCarbonFootprint',
+              conflict: Literal['keep2nd','interactive'] = 'keep2nd', verbose: int = 0,
+              resolve: Optional[Resolve] = None) -> Tuple['DeviceCarbonFootprint',List[Set],List[str]]:
         """Merge two carbon footprints that are expected to correspond to the same device"""
-        result: DeviceCarbonFootprintData = {}
-        ignore_keys = ['added_date', 'add_method','comment']
-        # gather attributes coming from device1 and device2
-        report: List[set] = [set(),set()]
-        conflicts = []
-        for key in DeviceCarbonFootprintData.__annotations__.keys():
-            v1 = device1.get(key)
-            v2 = device2.get(key)
-            if not is_empty(v1) and is_empty(v2):
-                result[key]=v1  # type: ignore [misc]
-                report[0].add(key)
-            elif is_empty(v1) and not is_empty(v2):
-                result[key]=v2  # type: ignore [misc]
-                report[1].add(key)
-            elif is_empty(v1) and is_empty(v2) or are_equal(v1,v2):
-                result[key]=v2  # type: ignore [misc]
-                report[1].add(key)
-            elif are_close_enough(v1,v2):
-                if verbose:
-                    print("WARNING, in merge,", key, ":", v1, "and", v2, "are considered close enough ->", v2)
-                result[key]=v2  # type: ignore [misc]
-                report[1].add(key)
-            elif key in ignore_keys:
-                if verbose>1:
-                    print("WARNING, in merge, ignore difference in field", key, ":", v1, "<->", v2)
-                result[key]=v2  # type: ignore [misc]
-                report[1].add(key)
-            elif key=='sources':
-                file1:str
-                file2:str
-                try:
-                    file1=re.search(r'([^\/]*\.pdf)', str(v1))[0]  # type: ignore [index]
-                    file2=re.search(r'([^\/]*\.pdf)', str(v2))[0]  # type: ignore [index]
-                except:
-                    file1,file2='1','2'
-                if verbose>1 or (verbose and file1!=file2):
-                    print("WARNING, in merge source urls are different:")
-                    print("  ignored: ", v1)
-                    print("  retained:", v2)
-                result[key]=v2  # type: ignore [misc]
-                report[1].add(key)
+        values, report, conflicts = _merge_values(device1, device2, conflict, verbose, resolve)
+        return DeviceCarbonFootprint(cast(DeviceCarbonFootprintData, dict(zip(_FIELDS, values)))), report, conflicts
+
+
+class CompactDeviceCarbonFootprint:
+    """A memory efficient version of DeviceCarbonFootprint, to hold many devices at once.
+
+    Values are stored in a tuple, in the order of the fields of DeviceCarbonFootprintData, with ''
+    for missing values. It has the same API as DeviceCarbonFootprint to read, render and merge
+    devices.
+    """
+
+    __slots__ = ('_values',)
+
+    def __init__(self, values: Iterable[Union[float, str, int]]):
+        self._values = tuple(values)
+        if len(self._values) != len(_FIELDS):
+            raise ValueError(f'CompactDeviceCarbonFootprint needs {len(_FIELDS)} values, got {len(self._values)}')
+
+    def __str__(self) -> str:
+        return str({key: value for key, value in zip(_FIELDS, self._values) if value != ''})
+
+    def __repr__(self) -> str:
+        return f'CompactDeviceCarbonFootprint({self._values})'
+
+    @classmethod
+    def from_device(cls, device: DeviceCarbonFootprint) -> 'CompactDeviceCarbonFootprint':
+        return CompactDeviceCarbonFootprint(device.get(key) for key in _FIELDS)
+
+    @classmethod
+    def from_text(cls, data: Dict[str, str]) -> 'CompactDeviceCarbonFootprint':
+        return cls.from_device(DeviceCarbonFootprint.from_text(data))
+
+    def to_device(self) -> DeviceCarbonFootprint:
+        return DeviceCarbonFootprint(cast(DeviceCarbonFootprintData, {
+            key: value for key, value in zip(_FIELDS, self._values) if value != ''}))
+
+    def get(self, key: str) -> Union[float, str, int]:
+        try:
+            return self._values[_FIELD_INDEX[key]]
+        except KeyError:
+            raise ValueError(f'DeviceCarbonFootprint has no such field "{key}') from None
+
+    csv_headers = staticmethod(DeviceCarbonFootprint.csv_headers)
+
+    def reorder(self) -> 'CompactDeviceCarbonFootprint':
+        return CompactDeviceCarbonFootprint(
+            value.replace(",","").replace("\"","").replace(";","").strip() if isinstance(value, str) else value
+            for value in self._values)
+
+    def values(self) -> Tuple[Union[float, str, int], ...]:
+        """The values of all fields, in the order of the CSV columns."""
+        return self._values
+
+    def as_csv_row(self, csv_format: Literal['us', 'fr'] = 'us') -> str:
+        """Render the CSV row corresponding to this device model."""
+        return _format_csv_row(self._values, csv_format=csv_format)
+
+    @staticmethod
+    def merge(device1: 'AnyDeviceCarbonFootprint', device2: 'AnyDeviceCarbonFootprint',
+              conflict: Literal['keep2nd','interactive'] = 'keep2nd', verbose: int = 0,
+              resolve: Optional[Resolve] = None) -> Tuple['CompactDeviceCarbonFootprint',List[Set],List[str]]:
+        """Merge two carbon footprints that are expected to correspond to the same device"""
+        values, report, conflicts = _merge_values(device1, device2, conflict, verbose, resolve)
+        return CompactDeviceCarbonFootprint(values), report, conflicts
+
+
+AnyDeviceCarbonFootprint = Union[DeviceCarbonFootprint, CompactDeviceCarbonFootprint]
+
+
+_INT_DECIMALS = re.compile(r'\.0*$')
+
+def _parse_int(value: str) -> int:
+    if '.' in value:
+        value = _INT_DECIMALS.sub('', value)
+    return int(value)
+
+def _parse_fr_float(value: str) -> float:
+    return float(value.replace(',', '.'))
+
+def _row_as_dict(headers: Sequence[str], row: Sequence[str]) -> Dict[Any, Any]:
+    """Build the dict that csv.DictReader would return for a row."""
+    row_dict: Dict[Any, Any] = dict(zip(headers, row))
+    if len(row) > len(headers):
+        row_dict[None] = list(row[len(headers):])
+    for key in headers[len(row):]:
+        row_dict[key] = None
+    return row_dict
+
+class CsvRowConverter:
+    """Convert rows of a CSV file, as read by csv.reader, to devices.
+
+    The conversion plan (which column holds each field, and how to parse it) is computed once
+    from the headers of the file, instead of once per row as DeviceCarbonFootprint.from_text does
+    with the rows of a csv.DictReader. The results and the error messages are the same.
+    """
+
+    def __init__(self, headers: Sequence[str], csv_format: Literal['us', 'fr'] = 'us'):
+        self.headers = list(headers)
+        # Like csv.DictReader, the last column with a given header wins.
+        self._positions = {header: index for index, header in enumerate(self.headers)}
+        self._plan: List[Tuple[str, int, int, Optional[Callable[[str], Any]]]] = []
+        for key, data_type in DeviceCarbonFootprintData.__annotations__.items():
+            if key not in self._positions:
+                continue
+            parse: Optional[Callable[[str], Any]]
+            if data_type == str:
+                parse = None
+            elif data_type == int:
+                parse = _parse_int
+            elif data_type == float and csv_format == 'fr':
+                parse = _parse_fr_float
             else:
-                conflicts.append(key)
+                parse = data_type
+            self._plan.append((key, _FIELD_INDEX[key], self._positions[key], parse))
+
+    def position(self, key: str) -> Optional[int]:
+        """The index of the column of a field, or None if the file does not have it."""
+        return self._positions.get(key)
+
+    def _raise_value_error(self, key: str, value: str, row: Sequence[str], error: ValueError) -> NoReturn:
+        data_type = DeviceCarbonFootprintData.__annotations__[key]
+        if data_type == int:
+            value = _INT_DECIMALS.sub('', value)
+        raise ValueError(f'Value error for converting "{key}": "{value}" as"{data_type}"\n{_row_as_dict(self.headers, row)}') from error
+
+    def to_device(self, row: Sequence[str]) -> DeviceCarbonFootprint:
+        typed_data: Dict[str, Union[float, str, int]] = {}
+        num_values = len(row)
+        key = value = ''
+        try:
+            for key, unused_index, position, parse in self._plan:
+                if position < num_values and (value := row[position]):
+                    typed_data[key] = parse(value) if parse else value
+        except ValueError as error:
+            self._raise_value_error(key, value, row, error)
+        return DeviceCarbonFootprint(cast(DeviceCarbonFootprintData, typed_data))
+
+    def to_compact_device(self, row: Sequence[str]) -> CompactDeviceCarbonFootprint:
+        values: List[Union[float, str, int]] = [''] * len(_FIELDS)
+        num_values = len(row)
+        key = value = ''
+        try:
+            for key, index, position, parse in self._plan:
+                if position < num_values and (value := row[position]):
+                    values[index] = parse(value) if parse else value
+        except ValueError as error:
+            self._raise_value_error(key, value, row, error)
+        return CompactDeviceCarbonFootprint(values)
 
-        if len(conflicts)>0:
-            k = 'n'
-            if conflict=='interactive' or verbose:
-                print("CONFLICT detected when merging", device1.get('manufacturer'), device1.get('name'), ":")
-                for key in conflicts:
-                    v1 = device1.get(key)
-                    v2 = device2.get(key)
-                    print(" | {0: >25} | {1: >30} -> {2: >30} |".format(key,v1,v2))
-                if conflict=='interactive':
-                    print("Press 'o' to keep the first column, or any other key to keep the second one...")
-                    k = input()
-            if k=='o':
-                for key in conflicts:
-                    result[key] = device1.get(key)  # type: ignore [misc]
-                    report[0].add(key)
+
+def read_csv(csv_file: TextIO, csv_format: Literal['us', 'fr'] = 'us') -> Tuple[CsvRowConverter, Iterator[List[str]]]:
+    """Read the headers of a CSV file: return the converter for its rows, and the non-empty rows."""
+    reader = csv.reader(csv_file, delimiter=';' if csv_format == 'fr' else ',')
+    converter = CsvRowConverter(next(reader, []), csv_format)
+    return converter, (row for row in reader if row)
+
+
+def _merge_values(device1: AnyDeviceCarbonFootprint, device2: AnyDeviceCarbonFootprint,
+                  conflict: Literal['keep2nd','interactive'], verbose: int, resolve: Optional[Resolve] = None
+                  ) -> Tuple[List[Union[float, str, int]],List[Set],List[str]]:
+    """Merge the values of two devices, in the order of the fields.
+
+    The conflicts that resolve does not settle are returned, and resolved as conflict says.
+    """
+    result: Dict[str, Union[float, str, int]] = {}
+    # gather attributes coming from device1 and device2
+    report: List[set] = [set(),set()]
+    conflicts = []
+    for key in _FIELDS:
+        v1 = device1.get(key)
+        v2 = device2.get(key)
+        if not is_empty(v1) and is_empty(v2):
+            result[key]=v1
+            report[0].add(key)
+        elif is_empty(v1) and not is_empty(v2):
+            result[key]=v2
+            report[1].add(key)
+        elif is_empty(v1) and is_empty(v2) or are_equal(v1,v2):
+            result[key]=v2
+            report[1].add(key)
+        elif are_close_enough(v1,v2):
+            if verbose:
+                print("WARNING, in merge,", key, ":", v1, "and", v2, "are considered close enough ->", v2)
+            result[key]=v2
+            report[1].add(key)
+        elif key in MERGE_IGNORED_FIELDS:
+            if verbose>1:
+                print("WARNING, in merge, ignore difference in field", key, ":", v1, "<->", v2)
+            result[key]=v2
+            report[1].add(key)
+        elif key=='sources':
+            file1 = source_file(str(v1))
+            file2 = source_file(str(v2))
+            if file1 is None or file2 is None:
+                file1,file2='1','2'
+            if verbose>1 or (verbose and file1!=file2):
+                print("WARNING, in merge source urls are different:")
+                print("  ignored: ", v1)
+                print("  retained:", v2)
+            result[key]=v2
+            report[1].add(key)
+        else:
+            choice = resolve(device1, device2, key) if resolve else None
+            if choice is None:
+                conflicts.append(key)
             else:
-                for key in conflicts:
-                    result[key] = device2.get(key)  # type: ignore [misc]
-                    report[1].add(key)
-        return DeviceCarbonFootprint(result), report, conflicts
+                result[key] = (v1, v2)[choice]
+                report[choice].add(key)
+                if verbose:
+                    print("WARNING, in merge,", key, ":", v1, "and", v2, "are resolved by the rules ->", result[key])
+
+    if len(conflicts)>0:
+        k = 'n'
+        if conflict=='interactive' or verbose:
+            print("CONFLICT detected when merging", device1.get('manufacturer'), device1.get('name'), ":")
+            for key in conflicts:
+                v1 = device1.get(key)
+                v2 = device2.get(key)
+                print(" | {0: >25} | {1: >30} -> {2: >30} |".format(key,v1,v2))
+            if conflict=='interactive':
+                print("Press 'o' to keep the first column, or any other key to keep the second one...")
+                k = input()
+        if k=='o':
+            for key in conflicts:
+                result[key] = device1.get(key)
+                report[0].add(key)
+        else:
+            for key in conflicts:
+                result[key] = device2.get(key)
+                report[1].add(key)
+    return [result[key] for key in _FIELDS], report, conflicts
@@ -0,0 +1,205 @@
+"""Find devices whose names are near-duplicates, without comparing every pair of devices.
+
+Names are reduced to a comparison key: normalized as in data.are_close_enough, without the
+manufacturer prefix and without spaces or punctuation. Each key is summarized by a MinHash
+signature of its character trigrams, and the signatures are cut in bands (locality-sensitive
+hashing): only the names of the same manufacturer sharing at least one band are compared, with the
+Jaccard similarity of their trigrams.
+
+All hashes are deterministic, so the same dataset always gives the same report.
+"""
+import re
+import zlib
+from typing import Any, Dict, Iterable, List, NamedTuple, Sequence, Set, Tuple
+
+import numpy as np
+
+from tools.parsers.lib import data
+
+_SEED = 20221018
+# Number of names hashed at once, to bound the memory of the (tokens x permutations) matrix.
+_CHUNK_SIZE = 4096
+# Number of candidate pairs whose similarity is estimated at once.
+_PAIRS_CHUNK_SIZE = 1 << 18
+# Buckets larger than this gather names sharing a common pattern rather than duplicates: they are
+# skipped, so that the number of compared pairs stays linear in the number of names.
+_MAX_BUCKET_SIZE = 100
+# How far under the threshold the MinHash estimate of a pair's similarity can be for the pair to be
+# scored: with 64 permutations, the estimate for a similarity of .9 has a standard deviation of .04.
+_ESTIMATE_MARGIN = .1
+_NOT_ALPHANUMERIC = re.compile(r'[^\w+]+|_')
+
+
+class DuplicatePair(NamedTuple):
+    """Two device names that are likely to describe the same device."""
+    manufacturer: str
+    name: str
+    duplicate_name: str
+    # Jaccard similarity of the trigrams of the names' keys.
+    score: float
+    # Whether the names have the same key: they only differ in case, spacing, punctuation, inch
+    # marks or the manufacturer prefix.
+    same_key: bool
+
+
+def name_key(name: str, manufacturer: str = '') -> str:
+    """The key used to compare device names."""
+    key = data.normalize(name)
+    prefix = data.normalize(manufacturer)
+    if prefix and key.startswith(prefix + ' '):
+        key = key[len(prefix) + 1:]
+    return _NOT_ALPHANUMERIC.sub('', key)
+
+
+def trigrams(key: str) -> Set[str]:
+    """The character trigrams of a key, including its start and end."""
+    padded = f'^{key}$'
+    return {padded[index:index + 3] for index in range(max(1, len(padded) - 2))}
+
+
+def _jaccard(set1: Set[str], set2: Set[str]) -> float:
+    return len(set1 & set2) / len(set1 | set2)
+
+
+def minhash_signatures(
+    token_sets: Sequence[Iterable[str]], num_permutations: int = 64,
+) -> 'np.ndarray[Any, Any]':
+    """The MinHash signatures of sets of tokens, one row per set."""
+    random = np.random.RandomState(_SEED)
+    # (a * hash + b) mod 2^64, with a odd, are the random permutations of the hashes: the
+    # overflows of the uint64 operations give the modulo.
+    a = random.randint(0, 1 << 64, size=num_permutations, dtype=np.uint64) | np.uint64(1)
+    b = random.randint(0, 1 << 64, size=num_permutations, dtype=np.uint64)
+    signatures = np.empty((len(token_sets), num_permutations), dtype=np.uint64)
+    for start in range(0, len(token_sets), _CHUNK_SIZE):
+        chunk = [
+            [zlib.crc32(token.encode('utf-8')) for token in tokens] or [0]
+            for tokens in token_sets[start:start + _CHUNK_SIZE]]
+        hashes = np.array([value for tokens in chunk for value in tokens], dtype=np.uint64)
+        offsets = np.cumsum([0] + [len(tokens) for tokens in chunk[:-1]])
+        permuted = hashes[:, np.newaxis] * a + b
+        signatures[start:start + len(chunk)] = np.minimum.reduceat(permuted, offsets, axis=0)
+    return signatures
+
+
+def _candidate_pairs(
+    signatures: 'np.ndarray[Any, Any]', blocks: 'np.ndarray[Any, Any]', num_bands: int,
+) -> Tuple['np.ndarray[Any, Any]', 'np.ndarray[Any, Any]']:
+    """The pairs of rows that have the same block and the same values in at least one band.
+
+    Returns the first and second rows of the pairs, first < second.
+    """
+    num_rows = signatures.shape[0]
+    band_size = signatures.shape[1] // num_bands
+    multipliers = np.uint64(0x9E3779B97F4A7C15) ** np.arange(band_size + 1, dtype=np.uint64)
+    # Pairs are coded as first * num_rows + second.
+    codes: List['np.ndarray[Any, Any]'] = []
+    with np.errstate(over='ignore'):
+        for band in range(num_bands):
+            columns = signatures[:, band * band_size:(band + 1) * band_size]
+            # One 64-bit hash per row for the band and the block (overflows wrap around).
+            bucket_hashes = columns @ multipliers[1:] + blocks.astype(np.uint64) * multipliers[0]
+            # The sort is stable: the rows of a bucket are in increasing order.
+            order = np.argsort(bucket_hashes, kind='stable')
+            sorted_hashes = bucket_hashes[order]
+            buckets = np.cumsum(np.r_[False, sorted_hashes[1:] != sorted_hashes[:-1]])
+            is_small = (np.bincount(buckets) <= _MAX_BUCKET_SIZE)[buckets]
+            # Rows of the same bucket at a given distance in the sorted rows, until a distance
+            # longer than all the buckets.
+            for distance in range(1, min(num_rows, _MAX_BUCKET_SIZE)):
+                same = (buckets[distance:] == buckets[:-distance]) & is_small[distance:]
+                if not same.any():
+                    break
+                codes.append(order[:-distance][same] * num_rows + order[distance:][same])
+    if not codes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    sorted_codes = np.sort(np.concatenate(codes))
+    unique_codes = sorted_codes[np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]]
+    return unique_codes // num_rows, unique_codes % num_rows
+
+
+def find_near_duplicates(
+    devices: Iterable[data.AnyDeviceCarbonFootprint], threshold: float = .9,
+    num_permutations: int = 64, num_bands: int = 16,
+) -> List[DuplicatePair]:
+    """Find the pairs of names of the same manufacturer whose keys are similar enough.
+
+    Names which only differ in case are the same name (as for merge_csv keys), and are not
+    reported. Pairs are sorted by manufacturer and by the order in which the names first appear.
+    """
+    if num_permutations % num_bands:
+        raise ValueError(f'{num_permutations} permutations cannot be cut in {num_bands} bands')
+    names: List[Tuple[str, str]] = []
+    seen: Set[Tuple[str, str]] = set()
+    for device in devices:
+        manufacturer = str(device.get('manufacturer'))
+        name = str(device.get('name'))
+        if not name:
+            continue
+        entry = (data.normalize(manufacturer), name.lower())
+        if entry not in seen:
+            seen.add(entry)
+            names.append((manufacturer, name))
+    if not names:
+        return []
+
+    token_sets = [trigrams(name_key(name, manufacturer)) for manufacturer, name in names]
+    block_ids: Dict[str, int] = {}
+    blocks = np.array([
+        block_ids.setdefault(data.normalize(manufacturer), len(block_ids))
+        for manufacturer, unused_name in names], dtype=np.int64)
+    signatures = minhash_signatures(token_sets, num_permutations)
+
+    firsts, seconds = _candidate_pairs(signatures, blocks, num_bands)
+    # Buckets of different blocks can collide.
+    same_block = blocks[firsts] == blocks[seconds]
+    firsts, seconds = firsts[same_block], seconds[same_block]
+    # The share of equal MinHash values estimates the similarity: only the pairs that are close to
+    # the threshold are scored exactly.
+    keep = np.zeros(len(firsts), dtype=bool)
+    for start in range(0, len(firsts), _PAIRS_CHUNK_SIZE):
+        chunk = slice(start, start + _PAIRS_CHUNK_SIZE)
+        estimates = (signatures[firsts[chunk]] == signatures[seconds[chunk]]).mean(axis=1)
+        keep[chunk] = estimates >= threshold - _ESTIMATE_MARGIN
+
+    pairs: List[Tuple[int, int, int, DuplicatePair]] = []
+    for first, second in zip(firsts[keep].tolist(), seconds[keep].tolist()):
+        score = _jaccard(token_sets[first], token_sets[second])
+        if score < threshold:
+            continue
+        manufacturer, name = names[first]
+        duplicate_name = names[second][1]
+        pairs.append((int(blocks[first]), first, second, DuplicatePair(
+            manufacturer, name, duplicate_name, score,
+            name_key(name, manufacturer) == name_key(duplicate_name, manufacturer))))
+    return [pair for unused_block, unused_first, unused_second, pair in sorted(pairs)]
+
+
+def alias_map(pairs: Iterable[Tuple[str, str]]) -> Dict[str, str]:
+    """Map lowercased names to a canonical name for each group of duplicates.
+
+    Pairs are (name, duplicate_name): groups are the connected names, and the canonical name of a
+    group is the first one seen in the pairs.
+    """
+    parents: Dict[str, str] = {}
+    order: Dict[str, int] = {}
+
+    def find(name: str) -> str:
+        root = name
+        while parents[root] != root:
+            root = parents[root]
+        while parents[name] != root:
+            parents[name], name = root, parents[name]
+        return root
+
+    for name, duplicate_name in pairs:
+        for value in (name.lower(), duplicate_name.lower()):
+            if value not in parents:
+                parents[value] = value
+                order[value] = len(order)
+        root1, root2 = find(name.lower()), find(duplicate_name.lower())
+        if root1 != root2:
+            if order[root2] < order[root1]:
+                root1, root2 = root2, root1
+            parents[root2] = root1
+    return {name: find(name) for name in parents if find(name) != name}
@@ -0,0 +1,60 @@
+"""Sort more records than fit in memory, by spilling sorted runs to disk.
+
+Records are read in chunks, each chunk is sorted in memory and written to a temporary file (a
+run), and the runs are then merged lazily with heapq.merge: only one chunk, plus one record per
+run, is in memory at a time. Records must be picklable.
+"""
+import heapq
+import itertools
+import pickle
+import tempfile
+from typing import IO, Any, Callable, Iterable, Iterator, List, Optional, TypeVar
+
+_T = TypeVar('_T')
+
+# Default number of records sorted in memory at once.
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+def _read_run(run_file: IO[bytes]) -> Iterator[Any]:
+    run_file.seek(0)
+    while True:
+        try:
+            # Each record is a separate pickle, with its own memo.
+            yield pickle.load(run_file)
+        except EOFError:
+            return
+
+
+def external_sort(
+    records: Iterable[_T], key: Callable[[_T], Any], chunk_size: int = DEFAULT_CHUNK_SIZE,
+    directory: Optional[str] = None,
+) -> Iterator[_T]:
+    """Sort records by key, spilling to temporary files in directory if they do not fit in a chunk.
+
+    The sort is stable. Temporary files are removed once the iterator is exhausted or closed.
+    """
+    iterator = iter(records)
+    chunk = sorted(itertools.islice(iterator, chunk_size), key=key)
+    if len(chunk) < chunk_size:
+        # Everything fits in memory.
+        yield from chunk
+        return
+
+    run_files: List[IO[bytes]] = []
+    try:
+        while chunk:
+            run_file = tempfile.TemporaryFile(dir=directory)
+            run_files.append(run_file)
+            pickler = pickle.Pickler(run_file, protocol=pickle.HIGHEST_PROTOCOL)
+            for record in chunk:
+                pickler.dump(record)
+                # The memo would keep every record of the run in memory.
+                pickler.clear_memo()
+            chunk = sorted(itertools.islice(iterator, chunk_size), key=key)
+        # heapq.merge takes the earliest run first for equal keys: the sort is stable.
+        yield from heapq.merge(*(_read_run(run_file) for run_file in run_files), key=key)
+    finally:
+        for run_file in run_files:
+            run_file.close()
+
@@ -0,0 +1,132 @@
+"""Content hashes of PDF files, as stored in the sources_hash column.
+
+Buffers are hashed in one call and files are mapped in memory: hashlib releases the GIL while it
+hashes large buffers, so hash_files can spread many files over a pool of threads. A HashCache
+persists the hashes of local files by (path, size, mtime), so that files which did not change are
+not read again.
+"""
+import concurrent.futures
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+from typing import BinaryIO, Dict, Iterable, Optional, Tuple, Union
+
+# Size of the chunks read from streams that cannot be mapped.
+_CHUNK_SIZE = 1 << 20
+
+
+def hash_buffer(buffer: Union[bytes, bytearray, memoryview, mmap.mmap]) -> str:
+    """The MD5 hash of a buffer, without copying it."""
+    return hashlib.md5(buffer).hexdigest()
+
+
+def hash_stream(stream: BinaryIO) -> str:
+    """The MD5 hash of the rest of a binary stream."""
+    hash_md5 = hashlib.md5()
+    for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b''):
+        hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """The MD5 hash of a file, mapped in memory instead of being read."""
+    with open(path, 'rb') as file:
+        if not os.fstat(file.fileno()).st_size:
+            # Empty files cannot be mapped.
+            return hash_buffer(b'')
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            return hash_buffer(content)
+
+
+def hash_row(row: Iterable[str], prefix: str = '') -> str:
+    """The MD5 hash of the values of a CSV row, after a prefix such as the headers of its file."""
+    return hash_buffer((prefix + '\x1f'.join(row)).encode('utf-8'))
+
+
+class HashCache:
+    """The hashes of local files, persisted in a JSON file and keyed by (path, size, mtime).
+
+    A file whose size or modification time changed is hashed again. The cache is safe to use from
+    several threads; call save to persist it.
+    """
+
+    def __init__(self, filename: Optional[str] = None) -> None:
+        self.filename = filename
+        self._entries: Dict[str, Tuple[int, int, str]] = {}
+        # The entries hashed since the cache was loaded.
+        self._updates: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+        self._is_dirty = False
+        if filename:
+            try:
+                with open(filename, 'rt', encoding='utf-8') as cache_file:
+                    self._entries = {
+                        path: (size, mtime, md5)
+                        for path, (size, mtime, md5) in json.load(cache_file).items()}
+            except (FileNotFoundError, ValueError):
+                pass
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def hash_file(self, path: str) -> str:
+        """The MD5 hash of a file, from the cache if the file did not change."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+            return entry[2]
+        md5 = hash_file(path)
+        with self._lock:
+            self._entries[path] = self._updates[path] = (stat.st_size, stat.st_mtime_ns, md5)
+            self._is_dirty = True
+        return md5
+
+    def updates(self) -> Dict[str, Tuple[int, int, str]]:
+        """The entries hashed since the cache was loaded, e.g. by a copy in another process."""
+        with self._lock:
+            return dict(self._updates)
+
+    def update(self, entries: Dict[str, Tuple[int, int, str]]) -> None:
+        """Add the updates of another cache of the same files."""
+        with self._lock:
+            for path, entry in entries.items():
+                if self._entries.get(path) != entry:
+                    self._entries[path] = self._updates[path] = entry
+                    self._is_dirty = True
+
+    def save(self) -> None:
+        """Write the cache to its file, if anything changed."""
+        if not self.filename or not self._is_dirty:
+            return
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        # Write to a temporary file first, so that readers never see a partial cache.
+        with tempfile.NamedTemporaryFile(
+                'wt', encoding='utf-8', dir=directory, delete=False) as cache_file:
+            with self._lock:
+                json.dump(self._entries, cache_file)
+                self._is_dirty = False
+        os.replace(cache_file.name, self.filename)
+
+
+def hash_files(
+    paths: Iterable[str], max_workers: Optional[int] = None, cache: Optional[HashCache] = None,
+) -> Dict[str, Union[str, OSError]]:
+    """Hash files in parallel.
+
+    Returns the hash of each path, or the error raised when reading it (e.g. a missing file).
+    """
+    hash_one = cache.hash_file if cache is not None else hash_file
+    results: Dict[str, Union[str, OSError]] = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(hash_one, path): path for path in paths}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except OSError as error:
+                results[futures[future]] = error
+    return results
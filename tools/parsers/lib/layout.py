@@ -0,0 +1,79 @@
+"""Helper modules to find text by its position in a page layout."""
+import collections
+import math
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+# A rectangle in page coordinates: x0, y0, x1, y1.
+Rect = Tuple[float, float, float, float]
+
+
+class Word(NamedTuple):
+    """A word of a page, with its position, as extracted by fitz."""
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    text: str
+    block_no: int
+    line_no: int
+    word_no: int
+
+
+class WordIndex:
+    """A spatial index of the words of a page.
+
+    Words are bucketed in a grid of square cells, so that finding the words in a region only looks
+    at the cells overlapping the region instead of at the whole page.
+    """
+
+    def __init__(self, words: Iterable[Sequence[object]], cell_size: float = 50) -> None:
+        self._words = [Word(*word) for word in words]  # type: ignore
+        self._cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], List[int]] = collections.defaultdict(list)
+        for index, word in enumerate(self._words):
+            x_center, y_center = (word.x0 + word.x1) / 2, (word.y0 + word.y1) / 2
+            self._cells[self._cell(x_center), self._cell(y_center)].append(index)
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def _cell(self, coordinate: float) -> int:
+        return math.floor(coordinate / self._cell_size)
+
+    def words_in(self, rect: Rect) -> List[Word]:
+        """List the words whose center is in a region, in reading order."""
+        x0, y0, x1, y1 = rect
+        if x1 <= x0 or y1 <= y0:
+            return []
+        indices: List[int] = []
+        for x_cell in range(self._cell(x0), self._cell(x1) + 1):
+            for y_cell in range(self._cell(y0), self._cell(y1) + 1):
+                indices.extend(self._cells.get((x_cell, y_cell), ()))
+        words = []
+        for index in sorted(indices):
+            word = self._words[index]
+            x_center, y_center = (word.x0 + word.x1) / 2, (word.y0 + word.y1) / 2
+            if x0 <= x_center <= x1 and y0 <= y_center <= y1:
+                words.append(word)
+        return words
+
+    def get_textbox(self, rect: Rect) -> str:
+        """Get the text in a region: words are separated by spaces and lines by newlines."""
+        lines: List[List[str]] = []
+        previous_line = None
+        for word in self.words_in(rect):
+            if (word.block_no, word.line_no) != previous_line:
+                lines.append([])
+                previous_line = (word.block_no, word.line_no)
+            lines[-1].append(word.text)
+        return '\n'.join(' '.join(line) for line in lines)
+
+    def right_of(self, label: Rect, distance: float, margin: float = 0) -> str:
+        """Get the text of a label and of what follows it on the right, up to a distance."""
+        x0, y0, x1, y1 = label
+        return self.get_textbox((x0, y0 - margin, x1 + distance, y1 + margin))
+
+    def below(self, label: Rect, distance: float, margin: float = 0) -> str:
+        """Get the text of a label and of what is below it, up to a distance."""
+        x0, y0, x1, y1 = label
+        return self.get_textbox((x0 - margin, y0, x1 + margin, y1 + distance))
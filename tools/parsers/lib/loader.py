@@ -1,16 +1,15 @@
 """Helper modules to load a parser easily."""
-import io
 import json
 import sys
-from typing import Callable, BinaryIO, Iterator
+from typing import Callable, Iterator
 
 from tools.parsers.lib.data import DeviceCarbonFootprint
+from tools.parsers.lib.pdf import PdfDocument
 
 
-def main(parse_func: Callable[[BinaryIO, str], Iterator[DeviceCarbonFootprint]]) -> None:
+def main(parse_func: Callable[[PdfDocument, str], Iterator[DeviceCarbonFootprint]]) -> None:
     """Load a parser from the command line."""
     filename = sys.argv[1]
-    with open(filename, 'rb') as file:
-        body = io.BytesIO(file.read())
-    for device in parse_func(body, filename):
-        print(json.dumps(device.data, indent=2))
+    with PdfDocument.from_path(filename) as body:
+        for device in parse_func(body, filename):
+            print(json.dumps(device.data, indent=2))
@@ -1,63 +1,427 @@
 """Common PDF tools to be used in our scrapers."""
 from io import BytesIO
+import mmap
+import os
 import typing
-from typing import BinaryIO, Iterator, Optional, Tuple
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Literal, Optional, Tuple, Union
 
 import fitz
 import numpy as np
+import pdfminer
 from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
 from pdfminer.converter import TextConverter
 from pdfminer.pdfpage import PDFPage
 
+from tools.parsers.lib import hashing
+from tools.parsers.lib.cache import ArtifactCache
+from tools.parsers.lib.layout import WordIndex
+
 if typing.TYPE_CHECKING:
-    from typing import Any
+    from types import TracebackType
+    from typing import Any, Type
 
+# Libraries that can be used to extract text from a PDF: pdfminer is the historical one, fitz
+# (PyMuPDF) is much faster but lays out some pages differently.
+TextBackend = Literal['pdfminer', 'fitz']
 
-def pdf2txt(pdf_file: BinaryIO, num_pages: Optional[int] = None) -> str:
-    """Read all text from a PDF."""
+# A rectangle in page coordinates: x0, y0, x1, y1.
+Rect = Union[fitz.Rect, Tuple[float, float, float, float]]
 
-    rsrcmgr = PDFResourceManager()
-    with BytesIO() as retstr:
-        with TextConverter(rsrcmgr, retstr) as device:
-            interpreter = PDFPageInterpreter(rsrcmgr, device)
-            for index_page, page in enumerate(PDFPage.get_pages(pdf_file, check_extractable=True)):
-                if num_pages and index_page >= num_pages:
-                    break
-                interpreter.process_page(page)
-        text = retstr.getvalue()
-        return text.decode('utf-8')
+# Resolution of rendered pages: 3 pixels per point.
+_DEFAULT_DPI = 216
 
+# Version of the extracted artifacts: bump it when the extraction changes, to invalidate caches.
+_EXTRACTOR_VERSION = f'1-fitz{fitz.VersionBind}-pdfminer{pdfminer.__version__}'
 
-def search_text(pdf_file: BinaryIO, needle: str) -> Iterator[Tuple[fitz.Rect, fitz.Page]]:
-    """Search for a text block in a PDF."""
-    with fitz.open('pdf', pdf_file) as pdf_doc:
-        for page in pdf_doc:
-            text_page = page.get_textpage()
+# The cache used by default by all documents, set with the BOAVIZTA_PDF_CACHE environment variable
+# (a folder) or with set_default_cache.
+_default_cache: Optional[ArtifactCache] = (
+    ArtifactCache(os.environ['BOAVIZTA_PDF_CACHE'])
+    if os.environ.get('BOAVIZTA_PDF_CACHE') else None)
+
+
+def set_default_cache(artifact_cache: Optional[ArtifactCache]) -> None:
+    """Set the cache of extracted artifacts used by documents, or None to disable it."""
+    global _default_cache
+    _default_cache = artifact_cache
+
+
+class PdfDocument:
+    """A PDF parsed once, serving its text, searches, images and renderings.
+
+    Both the fitz document and the pdfminer pages are opened lazily on first use and then kept
+    for the lifetime of the object, so that a parser can query the same file many times without
+    parsing it again.
+
+    The text_backend selects the library used by text() when none is given explicitly.
+
+    Use from_path to open a file on disk: it is memory-mapped instead of read, so that its
+    content is not copied in memory by the text extraction and the hashing.
+
+    Page texts, words and images are also stored in an artifact cache (by default the one set
+    with set_default_cache) and read from there for the next documents with the same content.
+    """
+
+    def __init__(
+        self, pdf_file: Union[BinaryIO, bytes, mmap.mmap], text_backend: TextBackend = 'pdfminer',
+        artifact_cache: Optional[ArtifactCache] = None,
+    ) -> None:
+        self._content = pdf_file if isinstance(pdf_file, (bytes, mmap.mmap)) else pdf_file.read()
+        # The file the content is mapped from, if any.
+        self._path: Optional[str] = None
+        # Whether the content is a mapping opened by from_path, to close with the document.
+        self._owns_content = False
+        self.text_backend = text_backend
+        self._cache = artifact_cache or _default_cache
+        self._md5: Optional[str] = None
+        self._fitz_doc: Optional[fitz.Document] = None
+        # Text extraction state for pdfminer: pages are interpreted one at a time, on demand.
+        self._pdfminer_pages: Optional[Iterator[PDFPage]] = None
+        self._pdfminer_num_pages = 0
+        self._pdfminer_output = BytesIO()
+        self._pdfminer_interpreter: Optional[PDFPageInterpreter] = None
+        self._pdfminer_device: Optional[TextConverter] = None
+        self._page_texts: Dict[TextBackend, List[str]] = {}
+        self._is_text_complete: Dict[TextBackend, bool] = {}
+        # The number of pages and completeness of the texts stored in the cache, to only write
+        # them again when they changed.
+        self._cached_texts: Dict[TextBackend, Tuple[int, bool]] = {}
+        # The fitz text pages, built once per page for searches.
+        self._text_pages: List[Tuple[fitz.Page, fitz.TextPage]] = []
+        # The spatial indices of the words, built once per page.
+        self._word_indices: Dict[int, WordIndex] = {}
+
+    @classmethod
+    def from_path(
+        cls, path: str, text_backend: TextBackend = 'pdfminer',
+        artifact_cache: Optional[ArtifactCache] = None,
+    ) -> 'PdfDocument':
+        """Open a PDF file from disk, mapping it in memory instead of reading it."""
+        with open(path, 'rb') as pdf_file:
+            if os.fstat(pdf_file.fileno()).st_size:
+                content: Union[bytes, mmap.mmap] = mmap.mmap(
+                    pdf_file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                # Empty files cannot be mapped.
+                content = b''
+        document = cls(content, text_backend, artifact_cache)
+        document._path = path
+        document._owns_content = isinstance(content, mmap.mmap)
+        return document
+
+    def __enter__(self) -> 'PdfDocument':
+        return self
+
+    def __exit__(
+        self, exc_type: Optional['Type[BaseException]'], exc: Optional[BaseException],
+        traceback: Optional['TracebackType'],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the underlying parsed documents."""
+        for backend in self._page_texts:
+            self._save_page_texts(backend)
+        self._text_pages = []
+        self._word_indices = {}
+        if self._fitz_doc is not None:
+            self._fitz_doc.close()
+            self._fitz_doc = None
+        if self._pdfminer_device is not None:
+            self._pdfminer_device.close()
+            self._pdfminer_device = None
+        self._pdfminer_pages = None
+        if self._owns_content and isinstance(self._content, mmap.mmap):
+            self._content.close()
+
+    def md5(self) -> str:
+        """The MD5 hash of the PDF content, as used in sources_hash."""
+        if self._md5 is None:
+            self._md5 = hashing.hash_buffer(self._content)
+        return self._md5
+
+    @property
+    def _cache_entry(self) -> str:
+        return f'{self.md5()}-{_EXTRACTOR_VERSION}'
+
+    @property
+    def fitz_doc(self) -> fitz.Document:
+        """The fitz (PyMuPDF) document."""
+        if self._fitz_doc is None:
+            if self._path is not None:
+                # fitz only accepts bytes streams: let it read the file itself rather than
+                # copying the mapped content.
+                self._fitz_doc = fitz.open(self._path, filetype='pdf')
+            else:
+                self._fitz_doc = fitz.open(stream=self._content, filetype='pdf')
+        return self._fitz_doc
+
+    def _get_page_texts(self, backend: TextBackend) -> List[str]:
+        if backend not in self._page_texts:
+            cached = self._cache.get_json(self._cache_entry, f'text-{backend}') \
+                if self._cache else None
+            self._page_texts[backend] = cached['pages'] if cached else []
+            self._is_text_complete[backend] = cached['complete'] if cached else False
+            self._cached_texts[backend] = (
+                len(self._page_texts[backend]), self._is_text_complete[backend])
+        return self._page_texts[backend]
+
+    def _save_page_texts(self, backend: TextBackend) -> None:
+        """Store the texts extracted so far in the cache, if they changed since the last time.
+
+        They are saved once the extraction is complete or stops, not after each page: the whole
+        list of pages is written each time.
+        """
+        state = (len(self._page_texts[backend]), self._is_text_complete[backend])
+        if not self._cache or self._cached_texts.get(backend) == state:
+            return
+        self._cache.set_json(self._cache_entry, f'text-{backend}', {
+            'pages': self._page_texts[backend],
+            'complete': self._is_text_complete[backend],
+        })
+        self._cached_texts[backend] = state
+
+    def _extract_next_page_text(self, backend: TextBackend) -> bool:
+        """Extract the text of the next page, return False if there is none."""
+        page_texts = self._get_page_texts(backend)
+        if self._is_text_complete[backend]:
+            return False
+        if backend == 'fitz':
+            page_text = self._extract_page_text_with_fitz(len(page_texts))
+        else:
+            page_text = self._extract_page_text_with_pdfminer(len(page_texts))
+        if page_text is None:
+            self._is_text_complete[backend] = True
+            self._save_page_texts(backend)
+        else:
+            page_texts.append(page_text)
+        return page_text is not None
+
+    def _extract_page_text_with_fitz(self, page_num: int) -> Optional[str]:
+        if page_num >= self.fitz_doc.page_count:
+            return None
+        # Mimic pdfminer's output: lines are not separated, and pages end with a form feed.
+        page_text = self.fitz_doc[page_num].get_text('text')
+        return typing.cast(str, page_text.replace('\n', '') + '\x0c')
+
+    def _extract_page_text_with_pdfminer(self, page_num: int) -> Optional[str]:
+        if self._pdfminer_pages is None:
+            rsrcmgr = PDFResourceManager()
+            self._pdfminer_device = TextConverter(rsrcmgr, self._pdfminer_output)
+            self._pdfminer_interpreter = PDFPageInterpreter(rsrcmgr, self._pdfminer_device)
+            # A mapped file is read in place; a BytesIO shares the buffer of its bytes.
+            content_file = self._content if isinstance(self._content, mmap.mmap) \
+                else BytesIO(self._content)
+            self._pdfminer_pages = PDFPage.get_pages(content_file, check_extractable=True)
+            self._pdfminer_num_pages = 0
+        assert self._pdfminer_interpreter is not None
+        try:
+            # Skip the pages whose text was read from the cache.
+            while self._pdfminer_num_pages < page_num:
+                next(self._pdfminer_pages)
+                self._pdfminer_num_pages += 1
+            page = next(self._pdfminer_pages)
+            self._pdfminer_num_pages += 1
+        except StopIteration:
+            return None
+        start = self._pdfminer_output.tell()
+        self._pdfminer_interpreter.process_page(page)
+        return self._pdfminer_output.getvalue()[start:].decode('utf-8')
+
+    def text(self, num_pages: Optional[int] = None, backend: Optional[TextBackend] = None) -> str:
+        """Read all text from the PDF, or only from its first pages."""
+        if not num_pages:
+            num_pages = None
+        backend = backend or self.text_backend
+        page_texts = self._get_page_texts(backend)
+        while num_pages is None or len(page_texts) < num_pages:
+            if not self._extract_next_page_text(backend):
+                break
+        self._save_page_texts(backend)
+        return ''.join(page_texts[:num_pages])
+
+    def iter_page_texts(self, backend: Optional[TextBackend] = None) -> Iterator[str]:
+        """Read the text of the PDF page by page, extracting each page only when needed."""
+        backend = backend or self.text_backend
+        page_texts = self._get_page_texts(backend)
+        index = 0
+        try:
+            while index < len(page_texts) or self._extract_next_page_text(backend):
+                yield page_texts[index]
+                index += 1
+        finally:
+            self._save_page_texts(backend)
+
+    def _iter_text_pages(self) -> Iterator[Tuple[fitz.Page, fitz.TextPage]]:
+        for page_num in range(self.fitz_doc.page_count):
+            if page_num == len(self._text_pages):
+                page = self.fitz_doc[page_num]
+                self._text_pages.append((page, page.get_textpage()))
+            yield self._text_pages[page_num]
+
+    def search_text(self, needle: str) -> Iterator[Tuple[fitz.Rect, fitz.Page]]:
+        """Search for a text block in the PDF."""
+        for page, text_page in self._iter_text_pages():
             for rect in text_page.search(needle, quads=False):
                 yield rect, page
 
+    def search_texts(
+        self, needles: Iterable[str],
+    ) -> Dict[str, List[Tuple[fitz.Rect, fitz.Page]]]:
+        """Search for several text blocks in the PDF in a single pass over its pages."""
+        hits: Dict[str, List[Tuple[fitz.Rect, fitz.Page]]] = {needle: [] for needle in needles}
+        if not hits:
+            return hits
+        for page, text_page in self._iter_text_pages():
+            for needle, needle_hits in hits.items():
+                needle_hits.extend((rect, page) for rect in text_page.search(needle, quads=False))
+        return hits
 
-def list_images(pdf_file: BinaryIO) -> Iterator['np.ndarray[Any, Any]']:
-    """List all images from a PDF."""
-    pdf_doc = fitz.open('pdf', pdf_file)
-    for page in pdf_doc:
-        for image in page.getImageList():
-            xref = image[0]
-            pix_image = fitz.Pixmap(pdf_doc, xref)
-            numpy_array = np.frombuffer(pix_image.samples, dtype=np.uint8)  # type: ignore
-            numpy_array = numpy_array.reshape(pix_image.h, pix_image.w, pix_image.n)
-            numpy_image = np.ascontiguousarray(numpy_array[..., [2, 1, 0]])  # rgb to bgr
-            yield numpy_image
-
-def pdf2img(pdf_file: BinaryIO, page_num: int = 0):
-    """Converts pdf page page_num to an image"""
-    with fitz.open('pdf', pdf_file) as pdf_doc:
-        page = pdf_doc[page_num]
-        rotate = int(0)
-        zoom = 3
-        mat = fitz.Matrix(zoom, zoom).preRotate(rotate)
-        pix = page.getPixmap(matrix=mat, alpha=False)
+    def word_index(self, page_num: int) -> WordIndex:
+        """The spatial index of the words of a page."""
+        if page_num not in self._word_indices:
+            words = self._cache.get_json(self._cache_entry, f'words-{page_num}') \
+                if self._cache else None
+            if words is None:
+                words = self.fitz_doc[page_num].get_text('words')
+                if self._cache:
+                    self._cache.set_json(self._cache_entry, f'words-{page_num}', words)
+            self._word_indices[page_num] = WordIndex(words)
+        return self._word_indices[page_num]
+
+    def _list_image_sizes(self) -> Dict[int, Tuple[int, int]]:
+        """List the width and height of each image, by xref in order of first appearance."""
+        cached = self._cache.get_json(self._cache_entry, 'images') if self._cache else None
+        if cached is not None:
+            return {xref: (width, height) for xref, width, height in cached}
+        sizes: Dict[int, Tuple[int, int]] = {}
+        for page in self.fitz_doc:
+            for image in page.get_images():
+                xref, unused_smask, width, height = image[:4]
+                sizes.setdefault(xref, (width, height))
+        if self._cache:
+            self._cache.set_json(self._cache_entry, 'images', [
+                (xref, width, height) for xref, (width, height) in sizes.items()])
+        return sizes
+
+    def _decode_image(self, xref: int) -> 'np.ndarray[Any, Any]':
+        if self._cache:
+            cached = self._cache.get_array(self._cache_entry, f'image-{xref}')
+            if cached is not None:
+                return cached
+        pix_image = fitz.Pixmap(self.fitz_doc, xref)
+        numpy_array = np.frombuffer(pix_image.samples, dtype=np.uint8)  # type: ignore
+        numpy_array = numpy_array.reshape(pix_image.h, pix_image.w, pix_image.n)
+        numpy_image = np.ascontiguousarray(numpy_array[..., [2, 1, 0]])  # rgb to bgr
+        if self._cache:
+            self._cache.set_array(self._cache_entry, f'image-{xref}', numpy_image)
+        return numpy_image
+
+    def list_images(
+        self, *, min_width: int = 0, min_height: int = 0,
+        max_aspect_ratio: Optional[float] = None, largest_first: bool = False,
+    ) -> Iterator['np.ndarray[Any, Any]']:
+        """List all images from the PDF.
+
+        Images used on several pages are only listed once. Images that are too small or too
+        elongated are skipped using their metadata, before being decoded.
+        """
+        xrefs = [
+            (xref, width * height)
+            for xref, (width, height) in self._list_image_sizes().items()
+            if width >= min_width and height >= min_height and (
+                max_aspect_ratio is None or
+                max(width, height) <= max_aspect_ratio * min(width, height))
+        ]
+        if largest_first:
+            xrefs.sort(key=lambda xref_and_area: xref_and_area[1], reverse=True)
+        for xref, unused_area in xrefs:
+            yield self._decode_image(xref)
+
+    def page_rect(self, page_num: int = 0) -> fitz.Rect:
+        """The rectangle of a page, in page coordinates."""
+        return self.fitz_doc[page_num].rect
+
+    def to_image(
+        self, page_num: int = 0, *, clip: Optional[Rect] = None, dpi: float = _DEFAULT_DPI,
+        grayscale: bool = False,
+    ) -> 'np.ndarray[Any, Any]':
+        """Converts page page_num to an image
+
+        Only the clip region (in page coordinates) is rendered if given. The image is in BGR,
+        or a single channel array if grayscale.
+        """
+        page = self.fitz_doc[page_num]
+        zoom = dpi / 72
+        mat = fitz.Matrix(zoom, zoom)
+        pix = page.get_pixmap(
+            matrix=mat, alpha=False, clip=clip,
+            colorspace=fitz.csGRAY if grayscale else fitz.csRGB)
         numpy_array = np.frombuffer(pix.samples, dtype=np.uint8)
+        if grayscale:
+            return numpy_array.reshape(pix.h, pix.w).copy()
         numpy_array = numpy_array.reshape(pix.h, pix.w, pix.n)
         numpy_image = np.ascontiguousarray(numpy_array[..., [2, 1, 0]])  # rgb to bgr
-        return numpy_image
\ No newline at end of file
+        return numpy_image
+
+
+# A PDF given either as an already parsed document or as a raw stream.
+PdfInput = Union[PdfDocument, BinaryIO]
+
+
+def _as_document(pdf_file: PdfInput) -> PdfDocument:
+    if isinstance(pdf_file, PdfDocument):
+        return pdf_file
+    return PdfDocument(pdf_file)
+
+
+def pdf2txt(
+    pdf_file: PdfInput, num_pages: Optional[int] = None, backend: Optional[TextBackend] = None,
+) -> str:
+    """Read all text from a PDF."""
+    return _as_document(pdf_file).text(num_pages, backend=backend)
+
+
+def iter_page_texts(pdf_file: PdfInput, backend: Optional[TextBackend] = None) -> Iterator[str]:
+    """Read the text of a PDF page by page."""
+    return _as_document(pdf_file).iter_page_texts(backend=backend)
+
+
+def search_text(pdf_file: PdfInput, needle: str) -> Iterator[Tuple[fitz.Rect, fitz.Page]]:
+    """Search for a text block in a PDF."""
+    return _as_document(pdf_file).search_text(needle)
+
+
+def search_texts(
+    pdf_file: PdfInput, needles: Iterable[str],
+) -> Dict[str, List[Tuple[fitz.Rect, fitz.Page]]]:
+    """Search for several text blocks in a PDF, return the hits for each of them."""
+    return _as_document(pdf_file).search_texts(needles)
+
+
+def word_index(pdf_file: PdfInput, page_num: int) -> WordIndex:
+    """The spatial index of the words of a PDF page."""
+    return _as_document(pdf_file).word_index(page_num)
+
+
+def list_images(
+    pdf_file: PdfInput, *, min_width: int = 0, min_height: int = 0,
+    max_aspect_ratio: Optional[float] = None, largest_first: bool = False,
+) -> Iterator['np.ndarray[Any, Any]']:
+    """List all images from a PDF."""
+    return _as_document(pdf_file).list_images(
+        min_width=min_width, min_height=min_height, max_aspect_ratio=max_aspect_ratio,
+        largest_first=largest_first)
+
+
+def page_rect(pdf_file: PdfInput, page_num: int = 0) -> fitz.Rect:
+    """The rectangle of a PDF page, in page coordinates."""
+    return _as_document(pdf_file).page_rect(page_num)
+
+
+def pdf2img(
+    pdf_file: PdfInput, page_num: int = 0, *, clip: Optional[Rect] = None,
+    dpi: float = _DEFAULT_DPI, grayscale: bool = False,
+) -> 'np.ndarray[Any, Any]':
+    """Converts pdf page page_num, or only a region of it, to an image"""
+    return _as_document(pdf_file).to_image(page_num, clip=clip, dpi=dpi, grayscale=grayscale)
@@ -0,0 +1,189 @@
+"""A local SQLite index of a Boavizta CSV file, for lookups without scanning the whole dataset.
+
+The devices table has one column per field of DeviceCarbonFootprintData (NULL when empty), plus
+the position of the row in the CSV file, the basename of its source and a hash of the row. It is
+indexed on the manufacturer, the name (case-insensitive), the category and subcategory, the source
+basename and sources_hash.
+
+Refreshing the store from its CSV file is incremental: rows are matched by their hash, so only
+the rows that were added, removed or modified since the last refresh are written.
+"""
+import os
+import sqlite3
+from typing import Any, Dict, Iterator, List, Literal, NamedTuple, Optional, Tuple, cast
+from urllib.parse import urlparse
+
+from tools.parsers.lib import data
+from tools.parsers.lib import hashing
+
+_FIELDS = tuple(data.DeviceCarbonFootprintData.__annotations__.keys())
+_SQL_TYPES = {str: 'TEXT', float: 'REAL', int: 'INTEGER'}
+
+# Bump this when the schema changes: stores with another version are rebuilt.
+_SCHEMA_VERSION = '1'
+
+_SCHEMA = [
+    'CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)',
+    'CREATE TABLE devices (position INTEGER NOT NULL, row_hash TEXT NOT NULL, '
+    'source_basename TEXT, ' + ', '.join(
+        f'{key} {_SQL_TYPES[data_type]}'
+        for key, data_type in data.DeviceCarbonFootprintData.__annotations__.items()) + ')',
+    'CREATE INDEX devices_position ON devices (position)',
+    'CREATE INDEX devices_row_hash ON devices (row_hash)',
+    'CREATE INDEX devices_manufacturer ON devices (manufacturer COLLATE NOCASE)',
+    'CREATE INDEX devices_name ON devices (name COLLATE NOCASE)',
+    'CREATE INDEX devices_category ON devices (category, subcategory)',
+    'CREATE INDEX devices_source_basename ON devices (source_basename)',
+    'CREATE INDEX devices_sources_hash ON devices (sources_hash)',
+]
+
+# Filters of DeviceStore.find, and the SQL condition for each of them.
+_FILTERS = {
+    'manufacturer': 'manufacturer = ? COLLATE NOCASE',
+    'name': 'name = ? COLLATE NOCASE',
+    'category': 'category = ?',
+    'subcategory': 'subcategory = ?',
+    'source_basename': 'source_basename = ?',
+    'sources_hash': 'sources_hash = ?',
+}
+
+
+def source_basename(sources: str) -> str:
+    """The basename of a source URL, as used to recognize already known sources."""
+    return os.path.basename(urlparse(sources).path)
+
+
+class RefreshStats(NamedTuple):
+    """What a refresh changed in a store."""
+    added: int
+    removed: int
+    unchanged: int
+
+
+class DeviceStore:
+    """A SQLite database indexing the devices of a CSV file."""
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self._connection = sqlite3.connect(filename)
+        if self._get_meta('schema_version') != _SCHEMA_VERSION:
+            self._create_schema()
+
+    def __enter__(self) -> 'DeviceStore':
+        return self
+
+    def __exit__(self, *unused_exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the database."""
+        self._connection.close()
+
+    def __len__(self) -> int:
+        return cast(int, self._connection.execute('SELECT COUNT(*) FROM devices').fetchone()[0])
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        try:
+            row = self._connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        except sqlite3.OperationalError:
+            # The store is new, or was created by an incompatible version.
+            return None
+        return cast(str, row[0]) if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, value))
+
+    def _create_schema(self) -> None:
+        with self._connection:
+            self._connection.execute('DROP TABLE IF EXISTS meta')
+            self._connection.execute('DROP TABLE IF EXISTS devices')
+            for statement in _SCHEMA:
+                self._connection.execute(statement)
+            self._set_meta('schema_version', _SCHEMA_VERSION)
+
+    def refresh(self, csv_filename: str, csv_format: Literal['us', 'fr'] = 'us') -> RefreshStats:
+        """Update the store from a CSV file, writing only the rows that changed.
+
+        Nothing is read if the file has the same size and modification time as at the last
+        refresh.
+        """
+        stat = os.stat(csv_filename)
+        signature = f'{os.path.abspath(csv_filename)}:{stat.st_size}:{stat.st_mtime_ns}:{csv_format}'
+        if self._get_meta('csv_signature') == signature:
+            return RefreshStats(0, 0, len(self))
+
+        with open(csv_filename, 'rt', encoding='utf-8') as csv_file:
+            converter, rows = data.read_csv(csv_file, csv_format)
+            if self._get_meta('csv_headers') != '\x1f'.join(converter.headers):
+                # Rows hashes are only comparable for the same columns.
+                self._create_schema()
+
+            # The rowid and position of the existing rows, by hash.
+            existing: Dict[str, List[Tuple[int, int]]] = {}
+            for rowid, old_position, row_hash in self._connection.execute(
+                    'SELECT rowid, position, row_hash FROM devices ORDER BY position DESC'):
+                existing.setdefault(row_hash, []).append((rowid, old_position))
+            new_rows: List[Tuple[Any, ...]] = []
+            moves: List[Tuple[int, int]] = []
+            num_unchanged = 0
+            for position, row in enumerate(rows):
+                row_hash = hashing.hash_row(row)
+                same_rows = existing.get(row_hash)
+                if same_rows:
+                    rowid, old_position = same_rows.pop()
+                    num_unchanged += 1
+                    if old_position != position:
+                        moves.append((position, rowid))
+                    continue
+                device = converter.to_device(row)
+                values = [device.data.get(key) for key in _FIELDS]  # type: ignore [misc]
+                sources = device.data.get('sources')
+                new_rows.append(
+                    (position, row_hash, source_basename(sources) if sources else None, *values))
+        removed = [(rowid,) for same_rows in existing.values() for rowid, unused_position in same_rows]
+
+        with self._connection:
+            self._connection.executemany('DELETE FROM devices WHERE rowid = ?', removed)
+            self._connection.executemany('UPDATE devices SET position = ? WHERE rowid = ?', moves)
+            self._connection.executemany(
+                f'INSERT INTO devices VALUES ({", ".join("?" * (len(_FIELDS) + 3))})', new_rows)
+            self._set_meta('csv_headers', '\x1f'.join(converter.headers))
+            self._set_meta('csv_signature', signature)
+        return RefreshStats(len(new_rows), len(removed), num_unchanged)
+
+    def _select(self, where: str, parameters: Tuple[Any, ...], limit: Optional[int] = None,
+                ) -> Iterator[data.DeviceCarbonFootprint]:
+        query = f'SELECT {", ".join(_FIELDS)} FROM devices {where} ORDER BY position'
+        if limit is not None:
+            query += f' LIMIT {int(limit)}'
+        for values in self._connection.execute(query, parameters):
+            yield data.DeviceCarbonFootprint(cast(data.DeviceCarbonFootprintData, {
+                key: value for key, value in zip(_FIELDS, values) if value is not None}))
+
+    def find(self, limit: Optional[int] = None, **filters: str) -> List[data.DeviceCarbonFootprint]:
+        """Find the devices matching all the filters, in the order of the CSV file.
+
+        Filters are field values: manufacturer and name are compared ignoring case; category,
+        subcategory, source_basename and sources_hash must be equal.
+        """
+        conditions = []
+        for key in filters:
+            if key not in _FILTERS:
+                raise ValueError(f'Cannot filter devices by "{key}"')
+            conditions.append(_FILTERS[key])
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        return list(self._select(where, tuple(filters.values()), limit))
+
+    def get_by_name(self, name: str) -> Optional[data.DeviceCarbonFootprint]:
+        """The first device with a given name (ignoring case), if any."""
+        devices = self.find(limit=1, name=name)
+        return devices[0] if devices else None
+
+    def has_source(self, sources: str) -> bool:
+        """Whether a device of the store has a source with the same basename as an URL."""
+        return self._connection.execute(
+            'SELECT 1 FROM devices WHERE source_basename = ? LIMIT 1',
+            (source_basename(sources),)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[data.DeviceCarbonFootprint]:
+        return self._select('', ())
@@ -0,0 +1,271 @@
+"""A columnar table of device carbon footprints, for operations on a whole dataset.
+
+Each field of DeviceCarbonFootprintData is stored as a NumPy column: float64 values (NaN when
+empty) for numeric fields, and codes into a list of categories for string fields ('' when empty).
+Filters, groupings and aggregations are then computed on whole columns instead of device by device.
+"""
+import io
+import math
+import typing
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Literal, Optional, TextIO, Tuple
+
+import numpy as np
+
+from tools.parsers.lib import data
+
+_FIELDS = tuple(data.DeviceCarbonFootprintData.__annotations__.keys())
+_NUMERIC_FIELDS = frozenset(
+    key for key, data_type in data.DeviceCarbonFootprintData.__annotations__.items()
+    if data_type in (float, int))
+_INT_FIELDS = frozenset(
+    key for key, data_type in data.DeviceCarbonFootprintData.__annotations__.items()
+    if data_type == int)
+
+Aggregate = Literal['mean', 'sum', 'count', 'min', 'max']
+# The ufuncs of the min and max aggregates, ignoring NaN.
+_EXTREMUM_UFUNCS: Dict[str, np.ufunc] = {'min': np.fmin, 'max': np.fmax}
+
+
+def _category_ids(
+    categories1: List[str], categories2: List[str], transform: Callable[[str], str],
+) -> Tuple['np.ndarray[Any, Any]', 'np.ndarray[Any, Any]']:
+    """Map the categories of two columns to ids, equal when their transformed values are equal."""
+    ids: Dict[str, int] = {}
+    return tuple(  # type: ignore
+        np.array(
+            [ids.setdefault(transform(category), len(ids)) for category in categories],
+            dtype=np.int64)
+        for categories in (categories1, categories2))
+
+
+class DeviceTable:
+    """A table of devices, stored by columns."""
+
+    def __init__(
+        self, columns: Dict[str, 'np.ndarray[Any, Any]'], categories: Dict[str, List[str]],
+    ) -> None:
+        self._columns = columns
+        self._categories = categories
+
+    @classmethod
+    def _from_values(cls, values: Dict[str, List[Any]]) -> 'DeviceTable':
+        columns: Dict[str, 'np.ndarray[Any, Any]'] = {}
+        categories: Dict[str, List[str]] = {}
+        for key in _FIELDS:
+            if key in _NUMERIC_FIELDS:
+                columns[key] = np.array(values[key], dtype=np.float64)
+            else:
+                unique, codes = np.unique(
+                    np.array(values[key] + [''], dtype=object), return_inverse=True)
+                categories[key] = [str(category) for category in unique]
+                # The '' added for an empty table to have a category is dropped.
+                columns[key] = codes[:-1].astype(np.int32)
+        return cls(columns, categories)
+
+    @classmethod
+    def from_csv(
+        cls, csv_file: TextIO, csv_format: Literal['us', 'fr'] = 'us',
+    ) -> 'DeviceTable':
+        """Load a table from a CSV file, as DeviceCarbonFootprint.from_text would read it."""
+        converter, rows = data.read_csv(csv_file, csv_format)
+        return cls.from_devices(converter.to_compact_device(row) for row in rows)
+
+    @classmethod
+    def from_devices(cls, devices: Iterable[data.AnyDeviceCarbonFootprint]) -> 'DeviceTable':
+        """Build a table from device records."""
+        values: Dict[str, List[Any]] = {key: [] for key in _FIELDS}
+        for device in devices:
+            for key in _FIELDS:
+                value = device.get(key)
+                if key in _NUMERIC_FIELDS:
+                    value = math.nan if value == '' else float(value)
+                values[key].append(value)
+        return cls._from_values(values)
+
+    def __len__(self) -> int:
+        return len(self._columns[_FIELDS[0]])
+
+    def numeric(self, key: str) -> 'np.ndarray[Any, Any]':
+        """The values of a numeric field, NaN when empty."""
+        if key not in _NUMERIC_FIELDS:
+            raise ValueError(f'"{key}" is not a numeric field')
+        return self._columns[key]
+
+    def codes(self, key: str) -> 'np.ndarray[Any, Any]':
+        """The category codes of a string field."""
+        if key not in self._categories:
+            raise ValueError(f'"{key}" is not a string field')
+        return self._columns[key]
+
+    def categories(self, key: str) -> List[str]:
+        """The categories of a string field: codes are indices in this list."""
+        if key not in self._categories:
+            raise ValueError(f'"{key}" is not a string field')
+        return self._categories[key]
+
+    def is_empty(self, key: str) -> 'np.ndarray[Any, Any]':
+        """A mask of the devices for which a field is empty."""
+        if key in _NUMERIC_FIELDS:
+            return typing.cast('np.ndarray[Any, Any]', np.isnan(self._columns[key]))
+        return self.equals(key, '')
+
+    def equals(self, key: str, value: Any) -> 'np.ndarray[Any, Any]':
+        """A mask of the devices for which a field has a given value."""
+        if key in _NUMERIC_FIELDS:
+            return typing.cast('np.ndarray[Any, Any]', self._columns[key] == value)
+        try:
+            code = self.categories(key).index(value)
+        except ValueError:
+            return np.zeros(len(self), dtype=bool)
+        return typing.cast('np.ndarray[Any, Any]', self._columns[key] == code)
+
+    def filter(self, mask: 'np.ndarray[Any, Any]') -> 'DeviceTable':
+        """Keep only the devices selected by a mask (or by an array of indices)."""
+        return DeviceTable(
+            {key: column[mask] for key, column in self._columns.items()}, self._categories)
+
+    def group_by(
+        self, key: str, value_key: str, aggregate: Aggregate = 'mean',
+    ) -> Dict[str, float]:
+        """Aggregate the non-empty values of a numeric field per category of a string field.
+
+        Groups with devices but no values get NaN (or 0 for sum and count).
+        """
+        codes = self.codes(key)
+        values = self.numeric(value_key)
+        num_categories = len(self.categories(key))
+        valid = ~np.isnan(values)
+        valid_codes = codes[valid]
+        if aggregate in ('mean', 'sum', 'count'):
+            counts = np.bincount(valid_codes, minlength=num_categories).astype(np.float64)
+            if aggregate == 'count':
+                result = counts
+            else:
+                sums = np.bincount(valid_codes, weights=values[valid], minlength=num_categories)
+                if aggregate == 'sum':
+                    result = sums
+                else:
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        result = sums / counts
+        elif aggregate in ('min', 'max'):
+            result = np.full(num_categories, np.nan)
+            _EXTREMUM_UFUNCS[aggregate].at(result, valid_codes, values[valid])
+        else:
+            raise ValueError(f'Unknown aggregate "{aggregate}"')
+        present = np.bincount(codes, minlength=num_categories) > 0
+        categories = self.categories(key)
+        return {
+            categories[code]: float(result[code]) for code in np.flatnonzero(present)}
+
+    def row_sum(self, keys: Iterable[str]) -> 'np.ndarray[Any, Any]':
+        """Sum numeric fields for each device, ignoring empty values (NaN if all are empty)."""
+        stacked = np.stack([self.numeric(key) for key in keys])
+        sums = np.nansum(stacked, axis=0)
+        sums[np.isnan(stacked).all(axis=0)] = np.nan
+        return typing.cast('np.ndarray[Any, Any]', sums)
+
+    def _python_columns(self) -> List[List[Any]]:
+        columns: List[List[Any]] = []
+        for key in _FIELDS:
+            column = self._columns[key]
+            if key in _INT_FIELDS:
+                columns.append(['' if math.isnan(value) else int(value) for value in column.tolist()])
+            elif key in _NUMERIC_FIELDS:
+                columns.append(['' if math.isnan(value) else value for value in column.tolist()])
+            else:
+                categories = self._categories[key]
+                columns.append([categories[code] for code in column.tolist()])
+        return columns
+
+    def __iter__(self) -> Iterator[data.CompactDeviceCarbonFootprint]:
+        for values in zip(*self._python_columns()):
+            yield data.CompactDeviceCarbonFootprint(values)
+
+    def device(self, index: int) -> data.CompactDeviceCarbonFootprint:
+        """Get one device of the table."""
+        return next(iter(self.filter(np.array([index]))))
+
+    def join(self, other: 'DeviceTable', key: str = 'name') -> Tuple[
+            'np.ndarray[Any, Any]', 'np.ndarray[Any, Any]']:
+        """Find the devices of two tables with the same value for a string field, ignoring case.
+
+        Returns the indices of the matching devices in each table, in the order of this table. If
+        several devices of a table have the same value, only the first one is matched.
+        """
+        ids1, ids2 = _category_ids(self.categories(key), other.categories(key), str.lower)
+        row_ids1 = ids1[self.codes(key)]
+        row_ids2 = ids2[other.codes(key)]
+        unique1, first1 = np.unique(row_ids1, return_index=True)
+        unique2, first2 = np.unique(row_ids2, return_index=True)
+        unused_common, common1, common2 = np.intersect1d(
+            unique1, unique2, assume_unique=True, return_indices=True)
+        indices1, indices2 = first1[common1], first2[common2]
+        order = np.argsort(indices1)
+        return indices1[order], indices2[order]
+
+    @staticmethod
+    def merge(table1: 'DeviceTable', table2: 'DeviceTable') -> Tuple[
+            'DeviceTable', 'np.ndarray[Any, Any]', 'np.ndarray[Any, Any]']:
+        """Merge two aligned tables: each device of table1 with the device of table2 at the same row.
+
+        This gives the same values as DeviceCarbonFootprint.merge on each pair of devices, with the
+        'keep2nd' conflict resolution, but compares whole columns at once. Besides the merged
+        table, it returns two boolean matrices with one row per device and one column per field:
+        the values taken from the first table, and the conflicts.
+        """
+        if len(table1) != len(table2):
+            raise ValueError(f'Cannot merge tables of {len(table1)} and {len(table2)} devices')
+        columns: Dict[str, 'np.ndarray[Any, Any]'] = {}
+        categories: Dict[str, List[str]] = {}
+        from_first = np.zeros((len(table1), len(_FIELDS)), dtype=bool)
+        conflicts = np.zeros((len(table1), len(_FIELDS)), dtype=bool)
+        for index, key in enumerate(_FIELDS):
+            if key in _NUMERIC_FIELDS:
+                values1, values2 = table1.numeric(key), table2.numeric(key)
+                empty1 = np.isnan(values1) | (values1 == 0)
+                empty2 = np.isnan(values2) | (values2 == 0)
+                with np.errstate(invalid='ignore'):
+                    difference = np.abs(values1 - values2)
+                    maximum = np.maximum(values1, values2)
+                    equal = difference <= 2e-3 * maximum
+                    close = difference <= 0.05 * maximum
+            else:
+                categories1, categories2 = table1.categories(key), table2.categories(key)
+                codes1, codes2 = table1.codes(key), table2.codes(key)
+                empty1 = codes1 == categories1.index('')
+                empty2 = codes2 == categories2.index('')
+                strip1, strip2 = _category_ids(categories1, categories2, str.strip)
+                equal = strip1[codes1] == strip2[codes2]
+                normalized1, normalized2 = _category_ids(categories1, categories2, data.normalize)
+                close = normalized1[codes1] == normalized2[codes2]
+            from_first[:, index] = ~empty1 & empty2
+            if key not in data.MERGE_IGNORED_FIELDS and key != 'sources':
+                conflicts[:, index] = ~empty1 & ~empty2 & ~equal & ~close
+            if key in _NUMERIC_FIELDS:
+                columns[key] = np.where(from_first[:, index], values1, values2)
+            else:
+                merged_categories = sorted(set(categories1) | set(categories2))
+                positions = {category: position for position, category in enumerate(merged_categories)}
+                remap1 = np.array([positions[category] for category in categories1], dtype=np.int32)
+                remap2 = np.array([positions[category] for category in categories2], dtype=np.int32)
+                columns[key] = np.where(from_first[:, index], remap1[codes1], remap2[codes2])
+                categories[key] = merged_categories
+        return DeviceTable(columns, categories), from_first, conflicts
+
+    def write_csv(
+        self, us_file: Optional[TextIO] = None, fr_file: Optional[TextIO] = None,
+        headers: bool = True,
+    ) -> None:
+        """Write the table to CSV files, in the us format, the fr format or both."""
+        data.DeviceCsvWriter(us_file, fr_file, headers=headers).writerows(self)
+
+    def to_csv(
+        self, csv_format: Literal['us', 'fr'] = 'us', headers: bool = True,
+    ) -> str:
+        """Render the table as CSV, exactly as the as_csv_row of its devices would."""
+        output = io.StringIO()
+        if csv_format == 'fr':
+            self.write_csv(fr_file=output, headers=headers)
+        else:
+            self.write_csv(output, headers=headers)
+        return output.getvalue()
@@ -1,15 +1,225 @@
 """Helper modules for text manipulation in parsers."""
-from typing import Dict, Iterable, Pattern
+import contextlib
+import functools
+import re
+import time
+import types
+from typing import Any, Dict, Iterable, Iterator, List, Match, Optional, Pattern, Set, Tuple
 
+try:
+    from re import _parser as sre_parse  # type: ignore
+except ImportError:  # Python < 3.11
+    import sre_parse  # type: ignore
 
-def search_all_patterns(patterns: Iterable[Pattern[str]], text: str) -> Dict[str, str]:
-    """Search a text for all patterns and extract the named groups."""
-    extracted: Dict[str, str] = {}
-    for pattern in patterns:
+# Maximum number of start positions tried before each occurrence of an anchor: patterns whose
+# anchor may be further from the start of the match are searched with the regular engine.
+_MAX_WINDOW = 64
+
+
+class PatternStats:
+    """Statistics about the searches of a pattern."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.hits = 0
+        # Cumulative and worst-case durations of the searches, in seconds.
+        self.total_time = 0.
+        self.worst_time = 0.
+
+    def record(self, duration: float, hit: bool) -> None:
+        """Record one search."""
+        self.calls += 1
+        self.hits += hit
+        self.total_time += duration
+        self.worst_time = max(self.worst_time, duration)
+
+    @property
+    def hit_rate(self) -> float:
+        """The ratio of searches that found a match."""
+        return self.hits / self.calls if self.calls else 0.
+
+
+# The statistics of the patterns searched, when they are being collected.
+_stats: Optional[Dict[Pattern[str], PatternStats]] = None
+
+
+@contextlib.contextmanager
+def collect_stats() -> Iterator[Dict[Pattern[str], PatternStats]]:
+    """Collect statistics about the patterns searched by search_all_patterns.
+
+    The statistics are off by default: within this context, each pattern search is timed and
+    recorded in the yielded dict.
+    """
+    global _stats
+    previous_stats = _stats
+    _stats = {}
+    try:
+        yield _stats
+    finally:
+        _stats = previous_stats
+
+
+def _flatten(items: Iterable[Tuple[Any, Any]]) -> Iterator[Tuple[Any, Any]]:
+    """Flatten the groups of a parsed regex, keeping the items that must match in sequence."""
+    for op, av in items:
+        if op is sre_parse.SUBPATTERN and not av[1] & re.IGNORECASE:
+            # av is (group, add_flags, del_flags, subpattern).
+            yield from _flatten(av[-1])
+        else:
+            yield op, av
+
+
+class _AnchoredPattern:
+    """A regex with the literal strings that any of its matches must contain.
+
+    The longest literal string whose distance to the start of the match is bounded is used as an
+    anchor: the regex is only tried at the few positions before each occurrence of the anchor.
+    """
+
+    def __init__(self, pattern: Pattern[str]) -> None:
+        self.pattern = pattern
+        self.literals: List[str] = []
+        self.anchor: Optional[str] = None
+        self.max_prefix_width = 0
+        if pattern.flags & re.IGNORECASE:
+            return
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+        prefix_width = 0
+        literal: List[str] = []
+        literal_prefix_width = 0
+        for op, av in list(_flatten(parsed.data)) + [(None, None)]:
+            if op is sre_parse.LITERAL:
+                if not literal:
+                    literal_prefix_width = prefix_width
+                literal.append(chr(av))
+                prefix_width += 1
+                continue
+            if literal:
+                self._add_literal(''.join(literal), literal_prefix_width)
+                literal = []
+            if op is not None:
+                prefix_width += sre_parse.SubPattern(parsed.state, [(op, av)]).getwidth()[1]
+
+    def _add_literal(self, literal: str, prefix_width: int) -> None:
+        self.literals.append(literal)
+        if prefix_width <= _MAX_WINDOW and len(literal) > len(self.anchor or ''):
+            self.anchor = literal
+            self.max_prefix_width = prefix_width
+
+    def search(self, text: str) -> Optional[Match[str]]:
+        """Scan through a text for the first match of the regex, as Pattern.search does."""
+        if not all(literal in text for literal in self.literals):
+            return None
+        if self.anchor is None:
+            return self.pattern.search(text)
+        # A match starting at a position contains an occurrence of the anchor at most
+        # max_prefix_width characters after it: only those positions are tried, in order.
+        next_start = 0
+        occurrence = text.find(self.anchor)
+        while occurrence >= 0:
+            for start in range(max(next_start, occurrence - self.max_prefix_width), occurrence + 1):
+                match = self.pattern.match(text, start)
+                if match:
+                    return match
+            next_start = occurrence + 1
+            occurrence = text.find(self.anchor, next_start)
+        return None
+
+
+class PatternSet:
+    """A compiled set of regexes to extract named groups from a text.
+
+    Each regex is only run around the occurrences of the literal strings it contains, so that
+    regexes that cannot match are not tried all along the text.
+    """
+
+    def __init__(self, patterns: Iterable[Pattern[str]]) -> None:
+        self._patterns = [_AnchoredPattern(pattern) for pattern in patterns]
+
+    def _search(self, pattern: _AnchoredPattern, text: str) -> Optional[Match[str]]:
+        if _stats is None:
+            return pattern.search(text)
+        start = time.perf_counter()
         match = pattern.search(text)
+        _stats.setdefault(pattern.pattern, PatternStats()).record(
+            time.perf_counter() - start, bool(match))
+        return match
+
+    def search_all(self, text: str) -> Dict[str, str]:
+        """Search a text for all patterns and extract the named groups.
+
+        Patterns are searched in order and the value extracted for a group by a pattern replaces
+        the ones extracted by the previous patterns.
+        """
+        return _extract_groups(self._search(pattern, text) for pattern in self._patterns)
+
+    def search_all_in_pages(self, pages: Iterable[str], required: Set[str]) -> Dict[str, str]:
+        """Search a text page by page for all patterns, until all required groups are extracted.
+
+        Each page is only searched for the patterns that did not match in the previous pages,
+        together with the previous page for the matches that span a page break: matches spanning
+        more than two pages are not found.
+        """
+        matches: List[Optional[Match[str]]] = [None] * len(self._patterns)
+        extracted: Dict[str, str] = {}
+        previous_page = ''
+        for page in pages:
+            window = previous_page + page
+            for index, pattern in enumerate(self._patterns):
+                if matches[index] is None:
+                    matches[index] = self._search(pattern, window)
+            extracted = _extract_groups(matches)
+            if required <= extracted.keys() or all(match is not None for match in matches):
+                break
+            previous_page = page
+        return extracted
+
+
+def _extract_groups(matches: Iterable[Optional[Match[str]]]) -> Dict[str, str]:
+    """Extract the named groups of matches: the later ones replace the values of the previous ones."""
+    extracted: Dict[str, str] = {}
+    for match in matches:
         if not match:
             continue
         for key, value in match.groupdict().items():
             if value:
                 extracted[key] = value
     return extracted
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_pattern_set(patterns: Tuple[Pattern[str], ...]) -> PatternSet:
+    return PatternSet(patterns)
+
+
+def search_all_patterns(patterns: Iterable[Pattern[str]], text: str) -> Dict[str, str]:
+    """Search a text for all patterns and extract the named groups."""
+    return _compile_pattern_set(tuple(patterns)).search_all(text)
+
+
+def search_all_patterns_in_pages(
+    patterns: Iterable[Pattern[str]], pages: Iterable[str],
+    required: Optional[Iterable[str]] = None,
+) -> Dict[str, str]:
+    """Search a text page by page for all patterns, until all required groups are extracted.
+
+    Pages are not read anymore as soon as each required named group (by default all the named
+    groups of the patterns) has a value, or each pattern has matched. The extracted groups are the
+    same as with search_all_patterns on the text of the pages read, except for matches spanning
+    more than two pages.
+    """
+    patterns = tuple(patterns)
+    if required is None:
+        required_groups = {group for pattern in patterns for group in pattern.groupindex}
+    else:
+        required_groups = set(required)
+    return _compile_pattern_set(patterns).search_all_in_pages(pages, required_groups)
+
+
+def list_pattern_tables(module: types.ModuleType) -> Iterator[Tuple[str, Tuple[Pattern[str], ...]]]:
+    """List the regex tables of a parser module: its constants whose name ends with _PATTERNS."""
+    for name, value in sorted(vars(module).items()):
+        if not name.endswith('_PATTERNS') or not isinstance(value, (tuple, list, set, frozenset)):
+            continue
+        if value and all(isinstance(pattern, re.Pattern) for pattern in value):
+            yield name, tuple(value)
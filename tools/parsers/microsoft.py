@@ -3,7 +3,7 @@
 import logging
 import re
 import datetime
-from typing import BinaryIO, Iterator
+from typing import Iterator
 
 from tools.parsers.lib import data
 from tools.parsers.lib import loader
@@ -62,7 +62,7 @@ _CATEGORIES = {
 _DATE_PATTERN = re.compile(r'([A-Z][a-z]+(?:\s+[0-9]?[0-9],)? [0-9]{4})\s*©\s*[0-9]{4}\s*Microsoft\s*Corporatio')
 _WEIGHT_PATTERN = re.compile(r'DEVICE\s*Weight.?\s*([0-9]*)\s*g')
 
-def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootprint]:
+def parse(body: pdf.PdfDocument, pdf_filename: str) -> Iterator[data.DeviceCarbonFootprint]:
     result = data.DeviceCarbonFootprintData()
     result['manufacturer'] = 'Microsoft'
 
@@ -84,16 +84,20 @@ def parse(body: BinaryIO, pdf_filename: str) -> Iterator[data.DeviceCarbonFootpr
             break
     if 'footprint' in extracted:
         result['gwp_total'] = float(extracted['footprint'])
+    labels = pdf.search_texts(
+        body, ('Microsoft Corporation. All rights reserved', 'Physical features'))
     if 'date' in extracted:
         result['report_date'] = extracted['date']
     else:
-        for block, page in pdf.search_text(body, 'Microsoft Corporation. All rights reserved'):
-            date_text = page.get_textbox((block.x0 - 30, block.y0 - 10, block.x1, block.y1 * 2.1 - block.y0))
+        for block, page in labels['Microsoft Corporation. All rights reserved']:
+            date_text = pdf.word_index(body, page.number).get_textbox(
+                (block.x0 - 30, block.y0 - 10, block.x1, block.y1 * 2.1 - block.y0))
             if (date_match := _DATE_PATTERN.search(date_text)):
                 result['report_date'] = date_match.group(1)
                 break
-    for block, page in pdf.search_text(body, 'Physical features'):
-        weight_text = page.get_textbox((block.x0, block.y0, block.x1 + 10, block.y1 - 30 ))
+    for block, page in labels['Physical features']:
+        weight_text = pdf.word_index(body, page.number).get_textbox(
+            (block.x0, block.y0, block.x1 + 10, block.y1 - 30))
         if (weight_match := _WEIGHT_PATTERN.search(weight_text)):
             result['weight'] = int(weight_match.group(1)) / 1000
             break
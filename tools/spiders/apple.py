@@ -10,7 +10,6 @@ Note that extracting the whole info is quite long, so be patient.
 """
 
 import csv
-import io
 import logging
 import time
 from os import link
@@ -18,7 +17,8 @@ from typing import Any, Iterator
 
 from tools.spiders.lib import spider
 from tools.parsers import apple
-from tools.parsers.lib import data
+from tools.parsers.lib import hashing
+from tools.parsers.lib import pdf
 
 import scrapy
 from scrapy import http
@@ -48,7 +48,7 @@ class AppleSpider(spider.BoaViztaSpider):
         self, response: http.Response, **unused_kwargs: Any,
     ) -> Iterator[Any]:
         """Parse a Apple Product Carbon footprint document."""
-        for device in apple.parse(io.BytesIO(response.body), response.url):
+        for device in apple.parse(pdf.PdfDocument(response.body), response.url):
             device.data['sources'] = response.url
-            device.data['sources_hash']=data.md5(io.BytesIO(response.body))
+            device.data['sources_hash']=hashing.hash_buffer(response.body)
             yield device.reorder().data
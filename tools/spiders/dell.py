@@ -13,14 +13,14 @@ This spider:
 Note that extracting the whole info is quite long, so be patient.
 """
 
-import io
 import re
 from os import link
 from typing import Any, Iterator
 
 from tools.spiders.lib import spider
 from tools.parsers import dell_laptop
-from tools.parsers.lib import data
+from tools.parsers.lib import hashing
+from tools.parsers.lib import pdf
 
 import scrapy
 from selenium import webdriver
@@ -70,10 +70,10 @@ class DellSpider(spider.BoaViztaSpider):
     def parse_carbon_footprint(
         self, response, subcategory, **unused_kwargs: Any,
     ) -> Iterator[Any]:
-        for device in dell_laptop.parse(io.BytesIO(response.body), response.url):
+        for device in dell_laptop.parse(pdf.PdfDocument(response.body), response.url):
             device.data['manufacturer'] = "Dell"
             device.data['sources'] = response.url
-            device.data['sources_hash'] = data.md5(io.BytesIO(response.body))
+            device.data['sources_hash'] = hashing.hash_buffer(response.body)
             device.data['subcategory'] = 'AllInOne' if _ALLINONE_PATTERN.search(device.data['name']) else subcategory
             device.data['category'] = 'Datacenter' if subcategory in ['Server','Storage'] else 'Workplace'
             yield device.reorder().data
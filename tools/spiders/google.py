@@ -13,10 +13,10 @@ This spider:
 Note that extracting the whole info is quite long, so be patient.
 """
 import html
-import io
 import re
 from typing import Any, Iterator
-from tools.parsers.lib import data
+from tools.parsers.lib import hashing
+from tools.parsers.lib import pdf
 
 import scrapy
 from scrapy import http
@@ -45,7 +45,7 @@ class GoogleSpider(spider.BoaViztaSpider):
         self, response: http.Response, **unused_kwargs: Any,
     ) -> Iterator[Any]:
         """Parse a Google Product Carbon footprint document."""
-        for device in google.parse(io.BytesIO(response.body), response.url):
+        for device in google.parse(pdf.PdfDocument(response.body), response.url):
             device.data['sources'] = response.url
-            device.data['sources_hash']=data.md5(io.BytesIO(response.body))
+            device.data['sources_hash']=hashing.hash_buffer(response.body)
             yield device.reorder().data
@@ -12,7 +12,6 @@ Note that extracting the whole info is quite long, so be patient.
 """
 
 import csv
-import io
 import logging
 import time
 from os import link
@@ -20,7 +19,8 @@ from typing import Any, Iterator
 
 from tools.spiders.lib import spider
 from tools.parsers import hpe
-from tools.parsers.lib import data
+from tools.parsers.lib import hashing
+from tools.parsers.lib import pdf
 
 import scrapy
 from selenium import webdriver
@@ -75,8 +75,8 @@ class DellSpider(spider.BoaViztaSpider):
     def parse_carbon_footprint(
         self, response, **unused_kwargs: Any,
     ) -> Iterator[Any]:
-        for device in hpe.parse(io.BytesIO(response.body), response.url):
+        for device in hpe.parse(pdf.PdfDocument(response.body), response.url):
             device.data['manufacturer'] = "HP"
             device.data['sources'] = response.url
-            device.data['sources_hash']=data.md5(io.BytesIO(response.body))
+            device.data['sources_hash']=hashing.hash_buffer(response.body)
             yield device.reorder().data
@@ -13,12 +13,12 @@ This spider:
 
 Note that extracting the whole info is quite long, so be patient.
 """
-import io
 import json
 import time
 from typing import Any, Iterator
 from urllib import parse
-from tools.parsers.lib import data
+from tools.parsers.lib import hashing
+from tools.parsers.lib import pdf
 
 import scrapy
 from scrapy import http
@@ -79,7 +79,7 @@ class HPSpider(spider.BoaViztaSpider):
         self, response: http.Response, **unused_kwargs: Any,
     ) -> Iterator[Any]:
         """Parse a Huwaei Product Carbon footprint document."""
-        for device in huawei.parse(io.BytesIO(response.body), response.url):
+        for device in huawei.parse(pdf.PdfDocument(response.body), response.url):
             device.data['sources'] = response.url
-            device.data['sources_hash']=data.md5(io.BytesIO(response.body))
+            device.data['sources_hash']=hashing.hash_buffer(response.body)
             yield device.data
@@ -13,10 +13,10 @@ This spider:
 Note that extracting the whole info is quite long, so be patient.
 """
 import html
-import io
 import re
 from typing import Any, Iterator
-from tools.parsers.lib import data
+from tools.parsers.lib import hashing
+from tools.parsers.lib import pdf
 
 import scrapy
 from scrapy import http
@@ -100,9 +100,9 @@ class LenovoSpider(spider.BoaViztaSpider):
     def parse_carbon_footprint(
         self, response: http.Response, tab_title: str, **unused_kwargs: Any,
     ) -> Iterator[Any]:
-        for device in lenovo.parse(io.BytesIO(response.body), response.url):
+        for device in lenovo.parse(pdf.PdfDocument(response.body), response.url):
             device.data['sources'] = response.url
-            device.data['sources_hash']=data.md5(io.BytesIO(response.body))
+            device.data['sources_hash']=hashing.hash_buffer(response.body)
             for keyword, category_and_sub in _CATEGORIES.items():
                 if keyword in tab_title:
                     device.data['category'], device.data['subcategory'] = category_and_sub
@@ -0,0 +1,71 @@
+"""Compare the fields extracted by the parsers' patterns with each text backend.
+
+This uses the testdata folder: for each parser, every regex table of its module (module-level
+constants ending with _PATTERNS) is run on the text extracted by pdfminer and by fitz, and any
+field that differs is reported.
+
+Run it with:
+
+```sh
+python -m tools.tests.compare_text_backends [parser_name ...]
+```
+"""
+import os
+import sys
+import types
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from tools import parsers
+from tools.parsers.lib import pdf
+from tools.parsers.lib import text
+
+_TESTDATA_FOLDER = os.path.join(os.path.dirname(__file__), 'testdata')
+
+
+def _compare_file(
+    module: types.ModuleType, filename: str,
+) -> Iterator[Tuple[str, str, Optional[str], Optional[str]]]:
+    with open(filename, 'rb') as input_file:
+        document = pdf.PdfDocument(input_file)
+    with document:
+        pdfminer_text = document.text(backend='pdfminer')
+        fitz_text = document.text(backend='fitz')
+    for table_name, patterns in text.list_pattern_tables(module):
+        pdfminer_fields = text.search_all_patterns(patterns, pdfminer_text)
+        fitz_fields = text.search_all_patterns(patterns, fitz_text)
+        for field in sorted(set(pdfminer_fields) | set(fitz_fields)):
+            pdfminer_value = pdfminer_fields.get(field)
+            fitz_value = fitz_fields.get(field)
+            if pdfminer_value != fitz_value:
+                yield table_name, field, pdfminer_value, fitz_value
+
+
+def main(string_args: Optional[List[str]] = None) -> int:
+    """Print the fields that differ between backends, return the number of differences."""
+    parser_names = string_args if string_args is not None else sys.argv[1:]
+    if not parser_names:
+        parser_names = sorted(os.listdir(_TESTDATA_FOLDER))
+    nb_differences = 0
+    nb_files = 0
+    for parser_name in parser_names:
+        module = getattr(parsers, parser_name)
+        folder = os.path.join(_TESTDATA_FOLDER, parser_name)
+        for filename in sorted(os.listdir(folder)):
+            if filename.endswith('_parsed.json'):
+                continue
+            nb_files += 1
+            differences: Dict[str, List[str]] = {}
+            for table_name, field, pdfminer_value, fitz_value in _compare_file(
+                    module, os.path.join(folder, filename)):
+                differences.setdefault(table_name, []).append(
+                    f'  {field}: pdfminer={pdfminer_value!r} fitz={fitz_value!r}')
+            for table_name, lines in differences.items():
+                print(f'{parser_name}/{filename} [{table_name}]')
+                print('\n'.join(lines))
+                nb_differences += len(lines)
+    print(f'{nb_differences} field(s) differ in {nb_files} file(s).')
+    return nb_differences
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,44 @@
+"""Tests for the cleanup of a Boavizta csv file."""
+import unittest
+
+from tools.monitoring import clean_database
+from tools.parsers.lib import data
+
+
+def _device(name: str, **values: str) -> data.DeviceCarbonFootprint:
+    return data.DeviceCarbonFootprint(dict({'manufacturer': 'Dell', 'name': name, 'comment': ''}, **values))  # type: ignore
+
+
+class FoldDuplicatesTest(unittest.TestCase):
+
+    def test_n_way(self) -> None:
+        devices = clean_database.fold_duplicates([
+            (_device('Latitude 5400', gwp_total='300', weight='1.5'), True),
+            (_device('OptiPlex 3000', gwp_total='200'), True),
+            (_device('latitude  5400', gwp_total='310', lifetime='4'), True),
+            (_device('Latitude 5400 ', gwp_total='320'), True),
+        ])
+        self.assertEqual(['Latitude 5400 ', 'OptiPlex 3000'], [device.get('name') for device in devices])
+        self.assertEqual(
+            ('320', '1.5', '4', ' merged'),
+            tuple(devices[0].get(field) for field in ('gwp_total', 'weight', 'lifetime', 'comment')))
+
+    def test_not_merged(self) -> None:
+        devices = clean_database.fold_duplicates([
+            (_device('Latitude 5400', gwp_total='300'), True),
+            (_device('Latitude 5400', gwp_total='310'), False),
+            (_device('', gwp_total='200'), True),
+            (_device('', gwp_total='210'), True),
+        ])
+        self.assertEqual(['300', '310', '200', '210'], [device.get('gwp_total') for device in devices])
+
+    def test_key(self) -> None:
+        devices = clean_database.fold_duplicates([
+            (_device('Latitude 5400', sources='https://dell.com/a.pdf'), True),
+            (_device('Latitude 5410', sources='https://dell.com/a.pdf'), True),
+        ], key_name='sources')
+        self.assertEqual(['Latitude 5410'], [device.get('name') for device in devices])
+
+
+if __name__ == '__main__':
+    unittest.main()
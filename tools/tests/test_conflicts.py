@@ -0,0 +1,74 @@
+"""Tests for the rules resolving the conflicts of merges."""
+import os
+import pickle
+import tempfile
+import unittest
+
+from tools.parsers.lib import conflicts
+from tools.parsers.lib import data
+from tools.parsers.lib import hashing
+
+
+def _device(**values: str) -> data.CompactDeviceCarbonFootprint:
+    return data.CompactDeviceCarbonFootprint.from_text(dict({'manufacturer': 'Dell', 'name': 'Latitude 5400'}, **values))
+
+
+class ConflictResolverTest(unittest.TestCase):
+
+    def test_policies(self) -> None:
+        resolver = conflicts.ConflictResolver({
+            'gwp_total': {'policy': 'max', 'tolerance': .1},
+            'weight': 'min',
+            'lifetime': 'older',
+            '*': ['non_manual', 'newer'],
+        })
+        older = _device(gwp_total='300', weight='1.5', lifetime='4', yearly_tec='20', add_method='Manual')
+        newer = _device(gwp_total='320', weight='1.6', lifetime='5', yearly_tec='25', add_method='Dell Auto Parser')
+        self.assertEqual(1, resolver(older, newer, 'gwp_total'))
+        self.assertEqual(0, resolver(older, newer, 'weight'))
+        self.assertEqual(0, resolver(older, newer, 'lifetime'))
+        self.assertEqual(1, resolver(older, newer, 'yearly_tec'))
+        self.assertIsNone(resolver(older, _device(gwp_total='400'), 'gwp_total'))
+        self.assertEqual(0, resolver(newer, older, 'yearly_tec'))
+        # non_manual does not apply, newer does.
+        self.assertEqual(1, resolver(newer, _device(yearly_tec='30'), 'yearly_tec'))
+
+    def test_merge(self) -> None:
+        resolver = conflicts.ConflictResolver({'gwp_total': 'max'})
+        older = _device(gwp_total='300', weight='1.5')
+        newer = _device(gwp_total='250', weight='1.6')
+        merged, report, unresolved = data.CompactDeviceCarbonFootprint.merge(older, newer, resolve=resolver)
+        self.assertEqual((300., 1.6), (merged.get('gwp_total'), merged.get('weight')))
+        self.assertIn('gwp_total', report[0])
+        self.assertEqual(['weight'], unresolved)
+
+    def test_mirror(self) -> None:
+        with tempfile.TemporaryDirectory() as mirror:
+            with open(os.path.join(mirror, 'latitude-5400.pdf'), 'wb') as pdf_file:
+                pdf_file.write(b'%PDF-1.4')
+            hash_cache = os.path.join(mirror, 'hashes.json')
+            resolver = conflicts.ConflictResolver({'gwp_total': 'mirror'}, mirror=mirror, hash_cache=hash_cache)
+            sources = 'https://www.dell.com/latitude-5400.pdf'
+            older = _device(gwp_total='300', sources=sources, sources_hash=hashing.hash_buffer(b'%PDF-1.4'))
+            newer = _device(gwp_total='320', sources=sources, sources_hash='abc')
+            self.assertEqual(0, resolver(older, newer, 'gwp_total'))
+            self.assertIsNone(resolver(newer, newer, 'gwp_total'))
+            copy = pickle.loads(pickle.dumps(resolver))
+            self.assertEqual(0, copy(older, newer, 'gwp_total'))
+
+            # The hashes computed by a copy are saved with the resolver.
+            resolver = conflicts.ConflictResolver({'gwp_total': 'mirror'}, mirror=mirror, hash_cache=hash_cache)
+            resolver.add_mirror_hashes(copy.mirror_hashes())
+            resolver.save()
+            self.assertEqual(1, len(hashing.HashCache(hash_cache)))
+
+    def test_invalid_rules(self) -> None:
+        for rules in (
+                {'gwp': 'newer'}, {'gwp_total': 'largest'}, {'gwp_total': {'tolerance': .1}},
+                {'gwp_total': {'policy': 'newer', 'tolerance': .1}}, {'gwp_total': 'mirror'}):
+            with self.assertRaises(ValueError, msg=rules):
+                conflicts.ConflictResolver(rules)
+
+
+if __name__ == '__main__':
+    unittest.main()
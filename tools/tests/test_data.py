@@ -0,0 +1,170 @@
+"""Tests for the device carbon footprint data."""
+import csv
+import io
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any
+import unittest
+
+from tools.parsers.lib import data
+
+_TOOLS_FOLDER = os.path.dirname(os.path.dirname(__file__))
+_ROW = {
+    'manufacturer': 'Dell',
+    'name': 'Latitude 5400',
+    'category': 'Workplace',
+    'subcategory': 'Laptop',
+    'gwp_total': '300',
+    'lifetime': '4',
+    'sources': 'https://www.dell.com/latitude-5400.pdf',
+    'number_cpu': '2.0',
+    'comment': 'Shipped with a "dock"',
+}
+
+
+class CompactDeviceCarbonFootprintTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.device = data.DeviceCarbonFootprint.from_text(_ROW)
+        self.compact = data.CompactDeviceCarbonFootprint.from_text(_ROW)
+
+    def test_get(self) -> None:
+        for key in data.DeviceCarbonFootprintData.__annotations__:
+            self.assertEqual(self.device.get(key), self.compact.get(key), msg=key)
+        self.assertEqual(2, self.compact.get('number_cpu'))
+        self.assertEqual('', self.compact.get('weight'))
+        with self.assertRaises(ValueError):
+            self.compact.get('unknown')
+
+    def test_csv(self) -> None:
+        self.assertEqual(self.device.as_csv_row(), self.compact.as_csv_row())
+        self.assertEqual(self.device.as_csv_row('fr'), self.compact.as_csv_row('fr'))
+        self.assertEqual(self.device.reorder().as_csv_row(), self.compact.reorder().as_csv_row())
+        self.assertEqual(
+            data.DeviceCarbonFootprint.csv_headers(),
+            data.CompactDeviceCarbonFootprint.csv_headers())
+
+    def test_round_trip(self) -> None:
+        self.assertEqual(self.device.data, self.compact.to_device().data)
+
+    def test_merge(self) -> None:
+        newer = dict(_ROW, gwp_total='320', weight='1.5', lifetime='', comment='')
+        merged, report, conflicts = data.DeviceCarbonFootprint.merge(
+            self.device, data.DeviceCarbonFootprint.from_text(newer))
+        compact_merged, compact_report, compact_conflicts = data.CompactDeviceCarbonFootprint.merge(
+            self.compact, data.CompactDeviceCarbonFootprint.from_text(newer))
+        self.assertEqual(merged.as_csv_row(), compact_merged.as_csv_row())
+        self.assertEqual(report, compact_report)
+        self.assertEqual(['gwp_total'], compact_conflicts)
+        self.assertEqual(conflicts, compact_conflicts)
+        self.assertEqual(320., compact_merged.get('gwp_total'))
+        self.assertEqual(4., compact_merged.get('lifetime'))
+
+
+class NormalizeTest(unittest.TestCase):
+
+    def test_normalize(self) -> None:
+        self.assertEqual('latitude 15in', data.normalize(' Latitude   15” '))
+        self.assertTrue(data.are_close_enough('Latitude  15”', 'latitude 15in'))
+
+    def test_source_file(self) -> None:
+        self.assertEqual('latitude-5400.pdf', data.source_file(_ROW['sources']))
+        self.assertIsNone(data.source_file('https://www.dell.com/latitude-5400'))
+
+
+class DeviceCsvWriterTest(unittest.TestCase):
+
+    def test_both_formats(self) -> None:
+        devices = [
+            data.DeviceCarbonFootprint.from_text(_ROW),
+            data.CompactDeviceCarbonFootprint.from_text(dict(_ROW, weight='1.25', name='A, B')),
+        ]
+        us_file = io.StringIO()
+        fr_file = io.StringIO()
+        data.DeviceCsvWriter(us_file, fr_file).writerows(devices)
+        for csv_format, output in (('us', us_file), ('fr', fr_file)):
+            self.assertEqual(
+                data.DeviceCarbonFootprint.csv_headers(csv_format) +
+                ''.join(device.as_csv_row(csv_format) for device in devices),
+                output.getvalue())
+
+    def test_value_types(self) -> None:
+        # Parsers can set values of another type than the field's, e.g. a float number_cpu.
+        device = data.DeviceCarbonFootprint({'name': 'ProLiant', 'number_cpu': 2.0, 'weight': 3})  # type: ignore
+        output = io.StringIO()
+        data.DeviceCsvWriter(fr_file=output, headers=False).writerow(device)
+        self.assertEqual(device.as_csv_row('fr'), output.getvalue())
+        self.assertIn(';2,0;', output.getvalue())
+
+    def test_same_as_gen_fr(self) -> None:
+        with open(os.path.join(_TOOLS_FOLDER, '..', 'boavizta-data-us.csv'), 'rt', encoding='utf-8') as csv_file:
+            converter, rows = data.read_csv(csv_file)
+            devices = [converter.to_device(row) for row in rows]
+        with tempfile.TemporaryDirectory() as directory:
+            us_filename = os.path.join(directory, 'us.csv')
+            fr_filename = os.path.join(directory, 'fr.csv')
+            with open(us_filename, 'wt', encoding='utf-8') as us_file, \
+                    open(fr_filename, 'wt', encoding='utf-8') as fr_file:
+                data.DeviceCsvWriter(us_file, fr_file).writerows(devices)
+            gen_fr_filename = os.path.join(directory, 'gen_fr.csv')
+            subprocess.run(
+                [sys.executable, os.path.join(_TOOLS_FOLDER, 'gen_fr.py'), '-s', us_filename, '-o', gen_fr_filename],
+                check=True)
+            with open(fr_filename, 'rb') as output, open(gen_fr_filename, 'rb') as expected:
+                self.assertEqual(expected.read(), output.read())
+
+    def test_no_headers(self) -> None:
+        output = io.StringIO()
+        writer = data.DeviceCsvWriter(fr_file=output, headers=False)
+        writer.writerow(data.DeviceCarbonFootprint.from_text(_ROW))
+        self.assertEqual(data.DeviceCarbonFootprint.from_text(_ROW).as_csv_row('fr'), output.getvalue())
+
+
+class CsvRowConverterTest(unittest.TestCase):
+
+    def _assert_same_as_dict_reader(self, content: str) -> None:
+        expected: Any
+        try:
+            expected = [
+                data.DeviceCarbonFootprint.from_text(row).data
+                for row in csv.DictReader(io.StringIO(content))]
+        except ValueError as error:
+            expected = str(error)
+        converter, rows = data.read_csv(io.StringIO(content))
+        try:
+            devices = [converter.to_device(row).data for row in rows]
+        except ValueError as error:
+            self.assertEqual(expected, str(error))
+        else:
+            self.assertEqual(expected, devices)
+
+    def test_same_as_from_text(self) -> None:
+        self._assert_same_as_dict_reader(
+            'name,number_cpu,gwp_total,name\nA,2.0,3,B\nC,4.00\n\nD,,,E,extra\n')
+        self._assert_same_as_dict_reader('name,height\nA,"3.0\n"\n')
+        self._assert_same_as_dict_reader('')
+
+    def test_error_message(self) -> None:
+        self._assert_same_as_dict_reader('name,number_cpu\nA,2.5\n')
+        self._assert_same_as_dict_reader('name,gwp_total,comment\nA,x\n')
+        self._assert_same_as_dict_reader('name,height\nA,x.00,more\n')
+
+    def test_compact_device(self) -> None:
+        converter, rows = data.read_csv(io.StringIO('name,weight,number_cpu\nA,1.5,2.0\n'))
+        row = next(rows)
+        self.assertEqual(
+            converter.to_device(row).as_csv_row(), converter.to_compact_device(row).as_csv_row())
+
+    def test_fr_format(self) -> None:
+        converter, rows = data.read_csv(io.StringIO('name;weight;number_cpu\nA;1,5;2\n'), 'fr')
+        device = converter.to_device(next(rows))
+        self.assertEqual({'name': 'A', 'weight': 1.5, 'number_cpu': 2}, device.data)
+        self.assertEqual(2, converter.position('number_cpu'))
+        self.assertIsNone(converter.position('comment'))
+
+
+if __name__ == '__main__':
+    unittest.main()
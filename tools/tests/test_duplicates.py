@@ -0,0 +1,71 @@
+"""Tests for the near-duplicate device names finder."""
+import unittest
+
+from tools.parsers.lib import data
+from tools.parsers.lib import duplicates
+
+
+def _devices(*names: str, manufacturer: str = 'Dell') -> list:
+    return [
+        data.CompactDeviceCarbonFootprint.from_text({'manufacturer': manufacturer, 'name': name})
+        for name in names]
+
+
+class NameKeyTest(unittest.TestCase):
+
+    def test_name_key(self) -> None:
+        self.assertEqual('latitude5400', duplicates.name_key('Dell  Latitude 5400', 'Dell'))
+        self.assertEqual('latitude5400', duplicates.name_key('Latitude-5400', 'Dell'))
+        self.assertEqual('delllatitude', duplicates.name_key('DellLatitude', 'Dell'))
+        self.assertEqual('monitor27in', duplicates.name_key('Monitor 27”'))
+        self.assertEqual('surfacepro7+', duplicates.name_key('Surface Pro 7+'))
+
+
+class FindNearDuplicatesTest(unittest.TestCase):
+
+    def test_variants(self) -> None:
+        devices = _devices(
+            'Latitude 5400', 'Dell Latitude  5400', 'LATITUDE 5400', 'Latitude 5410',
+            'OptiPlex 3000 Tower', 'OptiPlex 3000 Tower+', 'Optiplex-3000 Tower')
+        devices += _devices('Latitude-5400', manufacturer='HP')
+        pairs = duplicates.find_near_duplicates(devices)
+        self.assertEqual([
+            ('Latitude 5400', 'Dell Latitude  5400', True),
+            ('OptiPlex 3000 Tower', 'Optiplex-3000 Tower', True),
+        ], [(pair.name, pair.duplicate_name, pair.same_key) for pair in pairs])
+        self.assertEqual(1., pairs[0].score)
+
+    def test_threshold(self) -> None:
+        devices = _devices('OptiPlex 3000 Tower', 'OptiPlex 3000 Tower+')
+        self.assertEqual([], duplicates.find_near_duplicates(devices))
+        pairs = duplicates.find_near_duplicates(devices, threshold=.8)
+        self.assertEqual([('OptiPlex 3000 Tower', 'OptiPlex 3000 Tower+', False)], [
+            (pair.name, pair.duplicate_name, pair.same_key) for pair in pairs])
+
+    def test_same_as_all_pairs(self) -> None:
+        names = [
+            f'{family} {letter}{number}{suffix}'
+            for family in ('Latitude', 'Precision', 'OptiPlex')
+            for letter in 'ES' for number in range(5400, 5420, 3) for suffix in ('', ' 2-in-1')]
+        names += [f'Dell {name}' for name in names[::7]]
+        token_sets = [duplicates.trigrams(duplicates.name_key(name, 'Dell')) for name in names]
+        expected = {
+            (names[first], names[second])
+            for first in range(len(names)) for second in range(first + 1, len(names))
+            if len(token_sets[first] & token_sets[second]) >=
+            .9 * len(token_sets[first] | token_sets[second])}
+        pairs = duplicates.find_near_duplicates(_devices(*names))
+        self.assertEqual(expected, {(pair.name, pair.duplicate_name) for pair in pairs})
+        self.assertEqual(pairs, duplicates.find_near_duplicates(_devices(*names)))
+
+
+class AliasMapTest(unittest.TestCase):
+
+    def test_groups(self) -> None:
+        self.assertEqual(
+            {'b': 'a', 'c': 'a', 'e': 'd'},
+            duplicates.alias_map([('A', 'B'), ('D', 'E'), ('C', 'B'), ('b', 'a')]))
+
+
+if __name__ == '__main__':
+    unittest.main()
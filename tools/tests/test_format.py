@@ -5,6 +5,7 @@ import os
 import unittest
 
 from tools.parsers.lib import data
+from tools.parsers.lib import table
 
 _DATA_FOLDER = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 _DATA_FILE = os.path.join(_DATA_FOLDER, 'boavizta-data-us.csv')
@@ -24,10 +25,19 @@ class FormatsTest(unittest.TestCase):
             self.data_content.endswith('\n'), msg='Data file needs to end with a trailing newline')
 
     def test_read_format(self) -> None:
-        reader = csv.DictReader(io.StringIO(self.data_content))
-        for row in reader:
-            print(row)
+        converter, rows = data.read_csv(io.StringIO(self.data_content))
+        for row in rows:
+            converter.to_device(row)
+
+    def test_table_round_trip(self) -> None:
+        devices = [
             data.DeviceCarbonFootprint.from_text(row)
+            for row in csv.DictReader(io.StringIO(self.data_content))]
+        device_table = table.DeviceTable.from_csv(io.StringIO(self.data_content))
+        self.assertEqual(
+            data.DeviceCarbonFootprint.csv_headers() +
+            ''.join(device.as_csv_row() for device in devices),
+            device_table.to_csv())
 
     # TODO(pascal): Check that fr and us formats are in sync.
 
@@ -0,0 +1,87 @@
+"""Tests for the content hashes of PDF files."""
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from tools.parsers.lib import data
+from tools.parsers.lib import hashing
+
+
+class HashingTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory = temp_dir.name
+        self.paths = []
+        for index, size in enumerate((0, 10, 3_000_000)):
+            path = os.path.join(self.directory, f'file{index}.pdf')
+            with open(path, 'wb') as file:
+                file.write(bytes(range(256)) * (size // 256) + b'x' * (size % 256))
+            self.paths.append(path)
+
+    def _expected(self, path: str) -> str:
+        with open(path, 'rb') as file:
+            return hashlib.md5(file.read()).hexdigest()
+
+    def test_same_as_md5(self) -> None:
+        for path in self.paths:
+            with open(path, 'rb') as file:
+                content = file.read()
+            self.assertEqual(self._expected(path), hashing.hash_file(path))
+            self.assertEqual(self._expected(path), hashing.hash_buffer(content))
+            self.assertEqual(self._expected(path), data.md5(io.BytesIO(content)))
+            self.assertEqual(self._expected(path), data.md5_file(path))
+
+    def test_hash_row(self) -> None:
+        # The store and the merge journals already hold hashes of this form.
+        self.assertEqual(hashlib.md5('Dell\x1fLatitude 5400'.encode('utf-8')).hexdigest(),
+                         hashing.hash_row(['Dell', 'Latitude 5400']))
+        self.assertEqual(hashlib.md5('name\x1eé\x1f'.encode('utf-8')).hexdigest(),
+                         hashing.hash_row(['é', ''], prefix='name\x1e'))
+
+    def test_hash_files(self) -> None:
+        missing = os.path.join(self.directory, 'missing.pdf')
+        hashes = hashing.hash_files(self.paths + [missing], max_workers=2)
+        self.assertEqual({path: self._expected(path) for path in self.paths}, {
+            path: md5 for path, md5 in hashes.items() if path != missing})
+        self.assertIsInstance(hashes[missing], FileNotFoundError)
+
+    def test_cache(self) -> None:
+        cache_file = os.path.join(self.directory, 'hashes.json')
+        cache = hashing.HashCache(cache_file)
+        hashing.hash_files(self.paths, cache=cache)
+        cache.save()
+
+        # Unchanged files are not read again, even with a new cache loaded from disk.
+        cache = hashing.HashCache(cache_file)
+        self.assertEqual(len(self.paths), len(cache))
+        with mock.patch.object(hashing, 'hash_file', side_effect=AssertionError):
+            self.assertEqual(self._expected(self.paths[1]), cache.hash_file(self.paths[1]))
+
+        with open(self.paths[1], 'ab') as file:
+            file.write(b'changed')
+        self.assertEqual(self._expected(self.paths[1]), cache.hash_file(self.paths[1]))
+
+    def test_update(self) -> None:
+        cache_file = os.path.join(self.directory, 'hashes.json')
+        cache = hashing.HashCache(cache_file)
+        cache.hash_file(self.paths[0])
+        cache.save()
+        # Another copy of the cache, e.g. in a worker process.
+        other = hashing.HashCache(cache_file)
+        other.hash_file(self.paths[0])
+        other.hash_file(self.paths[1])
+        self.assertEqual([os.path.abspath(self.paths[1])], list(other.updates()))
+
+        cache.update(other.updates())
+        cache.save()
+        self.assertEqual(2, len(hashing.HashCache(cache_file)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+"""Tests for the merge of Boavizta csv files."""
+import contextlib
+import io
+import os
+import random
+import tempfile
+from typing import Tuple
+import unittest
+
+from tools import merge_csv
+from tools.parsers.lib import extsort
+
+_HEADERS = 'manufacturer,name,gwp_total,weight,comment\n'
+
+
+class ExternalSortTest(unittest.TestCase):
+
+    def test_stable(self) -> None:
+        random.seed(0)
+        records = [(random.randint(0, 20), index, ('', 'US' if index % 3 else '')) for index in range(500)]
+        for chunk_size in (7, 500, 1000):
+            self.assertEqual(
+                sorted(records, key=lambda record: record[0]),
+                list(extsort.external_sort(records, key=lambda record: record[0], chunk_size=chunk_size)))
+
+
+class MergeTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory = temp_dir.name
+        self.files = []
+        for index, rows in enumerate((
+            'Dell,Latitude 5400,300,1.5,old\nDell,OptiPlex 3000,200,,\nHP,ZBook,400,,\n',
+            'Dell,Latitude 5400,320,,new\nDell,latitude 5400,,1.6,\nHP,EliteBook,250,2,\nHP,ZBook,401,3,\n',
+            'HP,EliteBook,260,2.1,\nDell,Precision 3560,350,,\n',
+        )):
+            filename = os.path.join(self.directory, f'{index}.csv')
+            with open(filename, 'wt', encoding='utf-8') as csv_file:
+                csv_file.write(_HEADERS + rows)
+            self.files.append(filename)
+
+    def _merge(self, *args: str) -> Tuple[str, str]:
+        output = os.path.join(self.directory, 'output.csv')
+        report = io.StringIO()
+        with contextlib.redirect_stdout(report):
+            merge_csv.main(self.files + ['-o', output] + list(args))
+        with open(output, 'rt', encoding='utf-8') as output_file:
+            return output_file.read(), report.getvalue()
+
+    def test_merge(self) -> None:
+        output, report = self._merge()
+        self.assertEqual(
+            ['Precision 3560', 'EliteBook', 'ZBook', 'latitude 5400', 'OptiPlex 3000'],
+            [line.split(',')[1] for line in output.splitlines()[1:]])
+        # The newest files have priority.
+        self.assertIn('HP,EliteBook,,,260.0,', output)
+        self.assertIn('Dell,latitude 5400,,,320.0,', output)
+        self.assertIn('Number of singletons: [1, 0, 1]', report)
+        self.assertIn('Number of self duplicates: [0, 1, 0]', report)
+
+    def test_streaming(self) -> None:
+        expected = self._merge()
+        for chunk_size in ('2', '100'):
+            self.assertEqual(expected, self._merge('--streaming', '--chunk-size', chunk_size))
+        self.assertEqual(self._merge('-k', 'manufacturer'), self._merge(
+            '-k', 'manufacturer', '--streaming', '--chunk-size', '3'))
+
+    def test_parallel(self) -> None:
+        self.assertEqual(self._merge(), self._merge('--jobs', '2'))
+        self.assertEqual(self._merge('-k', 'manufacturer'), self._merge('-k', 'manufacturer', '-j', '3'))
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            self._merge('--jobs', '2', '--interactive')
+
+    def test_rules(self) -> None:
+        rules = os.path.join(self.directory, 'rules.json')
+        with open(rules, 'wt', encoding='utf-8') as rules_file:
+            rules_file.write('{"gwp_total": {"policy": "min", "tolerance": 0.1}}')
+        conflict_report = os.path.join(self.directory, 'conflicts.csv')
+        output, report = self._merge('--rules', rules, '--conflict-report', conflict_report)
+        # The older gwp_total is kept.
+        self.assertIn('Dell,latitude 5400,,,300.0,', output)
+        with open(conflict_report, 'rt', encoding='utf-8') as report_file:
+            self.assertEqual([
+                'key,file,manufacturer,name,field,kept_value,other_value',
+                f'latitude 5400,{self.files[0]},Dell,Latitude 5400,weight,1.6,1.5',
+            ], report_file.read().splitlines())
+        self.assertEqual(
+            (output, report), self._merge('--rules', rules, '-j', '2', '--conflict-report', conflict_report))
+
+    def test_journal(self) -> None:
+        journal = os.path.join(self.directory, 'journal.json')
+        expected = self._merge()
+        with contextlib.redirect_stderr(io.StringIO()) as log:
+            self.assertEqual(expected, self._merge('--journal', journal))
+            self.assertEqual(expected, self._merge('--journal', journal))
+        self.assertIn('0 key(s) merged, 5 reused from the journal.', log.getvalue())
+
+        with open(self.files[1], 'at', encoding='utf-8') as csv_file:
+            csv_file.write('Dell,OptiPlex 3000,,5,\n')
+        expected = self._merge()
+        with contextlib.redirect_stderr(io.StringIO()) as log:
+            self.assertEqual(expected, self._merge('--journal', journal))
+        self.assertIn('1 key(s) merged, 4 reused from the journal.', log.getvalue())
+
+        # A journal of another key is not used.
+        with contextlib.redirect_stderr(io.StringIO()) as log:
+            self.assertEqual(self._merge('-k', 'manufacturer'), self._merge('-k', 'manufacturer', '--journal', journal))
+        self.assertIn('2 key(s) merged, 0 reused from the journal.', log.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
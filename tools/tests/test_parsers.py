@@ -4,13 +4,13 @@ This test uses the testdata folder:
  - any subfolder contains tests for the parser with the corresponding name
  - in each subfolder, each test file is located next to a _parsed.json file with the expectation.
 """
-import io
 import json
 import os
 from typing import Any
 import unittest
 
 from tools import parsers
+from tools.parsers.lib import pdf
 
 _TESTDATA_FOLDER = os.path.join(os.path.dirname(__file__), 'testdata')
 
@@ -73,8 +73,10 @@ class ParsersTest(unittest.TestCase):
                     with self.subTest(file=filename):
                         input_filename = os.path.join(_TESTDATA_FOLDER, parser_name, filename)
                         with open(input_filename, 'rb') as input_file:
-                            input_body = io.BytesIO(input_file.read())
-                        result = [device.data for device in parser(input_body, input_filename)]
+                            input_body = pdf.PdfDocument(input_file)
+                        with input_body:
+                            result = [
+                                device.data for device in parser(input_body, input_filename)]
                         for device_data in result:
                             device_data.pop('added_date', None)
                         expected = self._load_expectation(parser_name, filename)
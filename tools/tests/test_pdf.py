@@ -0,0 +1,212 @@
+"""Tests for the PDF helpers used by parsers."""
+import io
+import mmap
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from tools.parsers.lib import cache
+from tools.parsers.lib import layout
+from tools.parsers.lib import pdf
+
+_TESTDATA_FOLDER = os.path.join(os.path.dirname(__file__), 'testdata')
+_HP_FILE = os.path.join(
+    _TESTDATA_FOLDER, 'hp_workplace', 'productcarbonfootprint_notebo_2020116223055953.pdf')
+_DELL_FILE = os.path.join(_TESTDATA_FOLDER, 'dell_laptop', 'carbon-footprint-wyse-3030.pdf')
+
+
+class PdfDocumentTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        with open(_HP_FILE, 'rb') as pdf_file:
+            self.document = pdf.PdfDocument(pdf_file)
+        self.addCleanup(self.document.close)
+
+    def test_text_by_page(self) -> None:
+        pages = list(self.document.iter_page_texts())
+        self.assertEqual(2, len(pages))
+        self.assertEqual(pages[0], self.document.text(num_pages=1))
+        self.assertEqual(''.join(pages), self.document.text())
+
+    def test_search_texts(self) -> None:
+        needles = ('weight', 'screen size', 'use location', 'not in the document')
+        hits = self.document.search_texts(needles)
+        self.assertEqual(set(needles), set(hits))
+        self.assertFalse(hits['not in the document'])
+        for needle in needles:
+            self.assertEqual(
+                [(tuple(rect), page.number) for rect, page in self.document.search_text(needle)],
+                [(tuple(rect), page.number) for rect, page in hits[needle]])
+        self.assertTrue(hits['weight'])
+
+    def test_word_index(self) -> None:
+        hits = self.document.search_texts(['Use location'])['Use location']
+        self.assertTrue(hits)
+        rect, page = hits[0]
+        words = self.document.word_index(page.number)
+        self.assertIs(words, self.document.word_index(page.number))
+        self.assertIn('Use location', words.right_of(rect, 150, margin=2))
+
+    def test_to_image(self) -> None:
+        page = self.document.page_rect(0)
+        image = self.document.to_image(0)
+        self.assertEqual((round(page.height * 3), round(page.width * 3), 3), image.shape)
+        bottom_half = self.document.to_image(
+            0, clip=(page.x0, page.height / 2, page.x1, page.y1), dpi=72)
+        self.assertEqual((round(page.height / 2), round(page.width), 3), bottom_half.shape)
+        grayscale = self.document.to_image(0, dpi=72, grayscale=True)
+        self.assertEqual((round(page.height), round(page.width)), grayscale.shape)
+
+    def test_from_path(self) -> None:
+        with pdf.PdfDocument.from_path(_HP_FILE) as mapped:
+            self.assertEqual(self.document.md5(), mapped.md5())
+            self.assertEqual(self.document.text(), mapped.text())
+            self.assertEqual(self.document.text(backend='fitz'), mapped.text(backend='fitz'))
+            self.assertEqual(self.document.to_image(0).shape, mapped.to_image(0).shape)
+
+    def test_mmap_of_caller(self) -> None:
+        with open(_HP_FILE, 'rb') as pdf_file:
+            content = mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.addCleanup(content.close)
+        with pdf.PdfDocument(content) as document:
+            self.assertEqual(self.document.md5(), document.md5())
+        # The mapping is still open.
+        self.assertEqual(b'%PDF', content[:4])
+
+
+class ListImagesTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        with open(_DELL_FILE, 'rb') as pdf_file:
+            self.document = pdf.PdfDocument(pdf_file)
+        self.addCleanup(self.document.close)
+
+    def test_each_image_once(self) -> None:
+        images = [image.tobytes() for image in self.document.list_images()]
+        self.assertTrue(images)
+        self.assertEqual(len(images), len(set(images)))
+
+    def test_filters(self) -> None:
+        all_shapes = [image.shape for image in self.document.list_images()]
+        shapes = [
+            image.shape
+            for image in self.document.list_images(
+                min_width=200, min_height=200, max_aspect_ratio=1.5)]
+        self.assertEqual(
+            [
+                (height, width, depth) for height, width, depth in all_shapes
+                if min(height, width) >= 200 and max(height, width) <= 1.5 * min(height, width)
+            ],
+            shapes)
+        self.assertLess(len(shapes), len(all_shapes))
+
+    def test_largest_first(self) -> None:
+        areas = [
+            image.shape[0] * image.shape[1]
+            for image in self.document.list_images(largest_first=True)]
+        self.assertEqual(sorted(areas, reverse=True), areas)
+
+
+class ArtifactCacheTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory = temp_dir.name
+
+    def test_document_artifacts(self) -> None:
+        artifact_cache = cache.ArtifactCache(self.directory)
+        with open(_DELL_FILE, 'rb') as pdf_file:
+            with pdf.PdfDocument(pdf_file, artifact_cache=artifact_cache) as document:
+                text = document.text()
+                words = document.word_index(0).get_textbox((0, 0, 1000, 1000))
+                images = [image.tobytes() for image in document.list_images(min_width=200)]
+
+        # A second document with the same content does not need to parse the PDF anymore.
+        with open(_DELL_FILE, 'rb') as pdf_file:
+            document = pdf.PdfDocument(pdf_file, artifact_cache=artifact_cache)
+        with document, mock.patch.object(pdf.fitz, 'open', side_effect=AssertionError), \
+                mock.patch.object(pdf.PDFPage, 'get_pages', side_effect=AssertionError):
+            self.assertEqual(text, document.text())
+            self.assertEqual(words, document.word_index(0).get_textbox((0, 0, 1000, 1000)))
+            self.assertEqual(
+                images, [image.tobytes() for image in document.list_images(min_width=200)])
+
+    def test_partial_text(self) -> None:
+        artifact_cache = cache.ArtifactCache(self.directory)
+        with open(_DELL_FILE, 'rb') as pdf_file:
+            content = pdf_file.read()
+        with open(_DELL_FILE, 'rb') as pdf_file:
+            with pdf.PdfDocument(pdf_file, artifact_cache=artifact_cache) as document:
+                first_page = document.text(num_pages=1)
+        with open(_DELL_FILE, 'rb') as pdf_file:
+            with pdf.PdfDocument(pdf_file, artifact_cache=artifact_cache) as document:
+                self.assertEqual(first_page, document.text(num_pages=1))
+                text = document.text()
+        with pdf.PdfDocument(io.BytesIO(content)) as document:
+            self.assertEqual(text, document.text())
+
+    def test_text_written_once(self) -> None:
+        artifact_cache = cache.ArtifactCache(self.directory)
+        with open(_DELL_FILE, 'rb') as pdf_file:
+            with pdf.PdfDocument(pdf_file, artifact_cache=artifact_cache) as document, \
+                    mock.patch.object(artifact_cache, 'set_json', wraps=artifact_cache.set_json) as set_json:
+                pages = list(document.iter_page_texts())
+                document.text()
+        self.assertGreater(len(pages), 1)
+        set_json.assert_called_once()
+
+    def test_overwrite_size(self) -> None:
+        artifact_cache = cache.ArtifactCache(self.directory, max_size=25_000)
+        for unused_index in range(5):
+            artifact_cache.set_array('a', 'image', np.zeros(10_000, dtype=np.uint8))
+        artifact_cache.set_array('b', 'image', np.zeros(10_000, dtype=np.uint8))
+        with mock.patch.object(artifact_cache, '_evict', side_effect=AssertionError):
+            artifact_cache.set_array('b', 'image', np.zeros(10_000, dtype=np.uint8))
+
+    def test_lru_eviction(self) -> None:
+        artifact_cache = cache.ArtifactCache(self.directory, max_size=25_000)
+        for entry in ('a', 'b', 'c'):
+            artifact_cache.set_array(entry, 'image', np.zeros(10_000, dtype=np.uint8))
+            time.sleep(.01)
+            # Reading "a" makes it more recent than "b".
+            artifact_cache.get_array('a', 'image')
+        self.assertIsNotNone(artifact_cache.get_array('a', 'image'))
+        self.assertIsNone(artifact_cache.get_array('b', 'image'))
+        self.assertIsNotNone(artifact_cache.get_array('c', 'image'))
+
+
+class WordIndexTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.words = layout.WordIndex([
+            (10, 10, 50, 20, 'Product', 0, 0, 0),
+            (55, 10, 90, 20, 'weight', 0, 0, 1),
+            (200, 10, 230, 20, '1.85', 0, 0, 2),
+            (10, 30, 50, 40, 'Screen', 1, 0, 0),
+            (400, 300, 450, 310, 'Footer', 2, 0, 0),
+        ], cell_size=20)
+
+    def test_right_of(self) -> None:
+        self.assertEqual('Product weight 1.85', self.words.right_of((10, 10, 90, 20), 150))
+        self.assertEqual('Product weight', self.words.right_of((10, 10, 90, 20), 50))
+
+    def test_below(self) -> None:
+        self.assertEqual('Product\nScreen', self.words.below((10, 10, 50, 20), 30))
+
+    def test_whole_words_only(self) -> None:
+        # The center of "1.85" is outside the box: the word is not cut.
+        self.assertEqual('', self.words.get_textbox((190, 0, 210, 30)))
+        self.assertEqual([], self.words.words_in((50, 50, 10, 10)))
+
+
+if __name__ == '__main__':
+    unittest.main()
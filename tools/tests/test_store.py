@@ -0,0 +1,74 @@
+"""Tests for the SQLite index of a CSV file."""
+import os
+import tempfile
+import unittest
+
+from tools.parsers.lib import data
+from tools.parsers.lib import store
+
+_CSV = '''manufacturer,name,category,subcategory,gwp_total,lifetime,sources,sources_hash
+Dell,Latitude 5400,Workplace,Laptop,300,4,https://www.dell.com/latitude-5400.pdf,abc
+Dell,OptiPlex 3000,Workplace,Desktop,,,https://www.dell.com/optiplex-3000.pdf?x=1,
+HP,EliteBook 840,Workplace,Laptop,250.5,,,
+'''
+
+
+class DeviceStoreTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.csv_filename = os.path.join(temp_dir.name, 'data.csv')
+        self._write_csv(_CSV)
+        self.store = store.DeviceStore(os.path.join(temp_dir.name, 'data.sqlite'))
+        self.addCleanup(self.store.close)
+
+    def _write_csv(self, content: str) -> None:
+        with open(self.csv_filename, 'wt', encoding='utf-8') as csv_file:
+            csv_file.write(content)
+
+    def test_same_as_csv(self) -> None:
+        self.assertEqual((3, 0, 0), self.store.refresh(self.csv_filename))
+        with open(self.csv_filename, 'rt', encoding='utf-8') as csv_file:
+            converter, rows = data.read_csv(csv_file)
+            expected = [converter.to_device(row).data for row in rows]
+        self.assertEqual(expected, [device.data for device in self.store])
+        self.assertEqual(4, self.store.find(name='latitude 5400')[0].data['lifetime'])
+
+    def test_find(self) -> None:
+        self.store.refresh(self.csv_filename)
+        self.assertEqual(
+            ['Latitude 5400', 'OptiPlex 3000'],
+            [device.data['name'] for device in self.store.find(manufacturer='dell')])
+        self.assertEqual(
+            ['Latitude 5400', 'EliteBook 840'],
+            [device.data['name'] for device in self.store.find(subcategory='Laptop')])
+        self.assertEqual([], self.store.find(manufacturer='HP', subcategory='Desktop'))
+        self.assertEqual('abc', self.store.get_by_name('LATITUDE 5400').data['sources_hash'])
+        self.assertIsNone(self.store.get_by_name('Latitude'))
+        self.assertTrue(self.store.has_source('https://example.com/optiplex-3000.pdf'))
+        self.assertFalse(self.store.has_source('https://www.dell.com/latitude-5500.pdf'))
+        with self.assertRaises(ValueError):
+            self.store.find(gwp_total='300')
+
+    def test_incremental_refresh(self) -> None:
+        self.store.refresh(self.csv_filename)
+        lines = _CSV.splitlines(keepends=True)
+        self._write_csv(lines[0] + lines[3] + lines[1] + 'HP,ZBook,Workplace,Laptop\n')
+        self.assertEqual((1, 1, 2), self.store.refresh(self.csv_filename))
+        self.assertEqual(
+            ['EliteBook 840', 'Latitude 5400', 'ZBook'],
+            [device.data['name'] for device in self.store])
+        self.assertEqual((0, 0, 3), self.store.refresh(self.csv_filename))
+
+    def test_other_columns(self) -> None:
+        self.store.refresh(self.csv_filename)
+        self._write_csv('name,manufacturer\nLatitude 5400,Dell\n')
+        self.assertEqual((1, 0, 0), self.store.refresh(self.csv_filename))
+        self.assertEqual([{'name': 'Latitude 5400', 'manufacturer': 'Dell'}], [
+            device.data for device in self.store])
+
+
+if __name__ == '__main__':
+    unittest.main()
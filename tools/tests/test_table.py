@@ -0,0 +1,123 @@
+"""Tests for the columnar table of devices."""
+import csv
+import io
+import math
+import unittest
+
+import numpy as np
+
+from tools.parsers.lib import data
+from tools.parsers.lib import table
+
+_CSV = '''manufacturer,name,subcategory,gwp_total,gwp_use_ratio,gwp_manufacturing_ratio,number_cpu
+Dell,Latitude 5400,Laptop,300,0.2000,0.7500,1
+Dell,Optiplex 7760,Desktop,500,0.5,,2.0
+HP,EliteBook 840,Laptop,200,,0.8,
+HP,ProDesk 400,Desktop,,,,
+'''
+
+
+class DeviceTableTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.table = table.DeviceTable.from_csv(io.StringIO(_CSV))
+
+    def test_columns(self) -> None:
+        self.assertEqual(4, len(self.table))
+        np.testing.assert_array_equal([300, 500, 200, np.nan], self.table.numeric('gwp_total'))
+        self.assertEqual(
+            ['Dell', 'Dell', 'HP', 'HP'],
+            [self.table.categories('manufacturer')[code]
+             for code in self.table.codes('manufacturer')])
+        np.testing.assert_array_equal([True] * 4, self.table.is_empty('comment'))
+        with self.assertRaises(ValueError):
+            self.table.numeric('name')
+
+    def test_group_by(self) -> None:
+        self.assertEqual(
+            {'Desktop': 500, 'Laptop': 250}, self.table.group_by('subcategory', 'gwp_total'))
+        self.assertEqual(
+            {'Desktop': 1, 'Laptop': 2},
+            self.table.group_by('subcategory', 'gwp_total', aggregate='count'))
+        self.assertEqual(
+            {'Dell': 300, 'HP': 200},
+            self.table.group_by('manufacturer', 'gwp_total', aggregate='min'))
+        cpus = self.table.group_by('manufacturer', 'number_cpu')
+        self.assertEqual(1.5, cpus['Dell'])
+        self.assertTrue(math.isnan(cpus['HP']))
+
+    def test_filter_and_row_sum(self) -> None:
+        laptops = self.table.filter(self.table.equals('subcategory', 'Laptop'))
+        self.assertEqual(['Latitude 5400', 'EliteBook 840'], [device.get('name') for device in laptops])
+        np.testing.assert_allclose(
+            [.95, .8], laptops.row_sum(['gwp_use_ratio', 'gwp_manufacturing_ratio']))
+        self.assertTrue(math.isnan(
+            self.table.row_sum(['gwp_use_ratio', 'gwp_manufacturing_ratio'])[3]))
+        self.assertEqual(0, len(self.table.filter(self.table.equals('manufacturer', 'Apple'))))
+
+    def test_csv_round_trip(self) -> None:
+        rows = [
+            data.DeviceCarbonFootprint.from_text(row) for row in csv.DictReader(io.StringIO(_CSV))]
+        for csv_format in ('us', 'fr'):
+            expected = data.DeviceCarbonFootprint.csv_headers(csv_format) + ''.join(
+                device.as_csv_row(csv_format) for device in rows)
+            content = self.table.to_csv(csv_format)
+            self.assertEqual(expected, content)
+            self.assertEqual(
+                expected,
+                table.DeviceTable.from_csv(io.StringIO(content), csv_format).to_csv(csv_format))
+
+    def test_conversion_error(self) -> None:
+        with self.assertRaises(ValueError) as error:
+            table.DeviceTable.from_csv(io.StringIO('name,number_cpu\nA,2.5\n'))
+        self.assertEqual(
+            'Value error for converting "number_cpu": "2.5" as"<class \'int\'>"\n'
+            "{'name': 'A', 'number_cpu': '2.5'}", str(error.exception))
+
+
+_NEWER_CSV = '''manufacturer,name,subcategory,gwp_total,gwp_use_ratio,gwp_manufacturing_ratio,number_cpu,comment
+HP,ELITEBOOK 840,Laptop  ,260,0.1,0.8,0,Updated
+Dell,Latitude 5400,laptop,301,,0,1,
+Apple,MacBook Air,Laptop,150,,,,
+Dell,Optiplex 7760,Desktop,0,0.51,0.4,2,
+'''
+
+
+class DeviceTableMergeTest(unittest.TestCase):
+
+    def test_join(self) -> None:
+        older = table.DeviceTable.from_csv(io.StringIO(_CSV))
+        newer = table.DeviceTable.from_csv(io.StringIO(_NEWER_CSV))
+        indices1, indices2 = older.join(newer)
+        self.assertEqual([0, 1, 2], indices1.tolist())
+        self.assertEqual([1, 3, 0], indices2.tolist())
+
+    def test_same_as_device_merge(self) -> None:
+        older = table.DeviceTable.from_csv(io.StringIO(_CSV))
+        newer = table.DeviceTable.from_csv(io.StringIO(_NEWER_CSV))
+        indices1, indices2 = older.join(newer)
+        older, newer = older.filter(indices1), newer.filter(indices2)
+        merged, from_first, conflicts = table.DeviceTable.merge(older, newer)
+        fields = list(data.DeviceCarbonFootprintData.__annotations__)
+        for index, (device1, device2, merged_device) in enumerate(zip(older, newer, merged)):
+            expected, report, expected_conflicts = data.DeviceCarbonFootprint.merge(
+                device1, device2)
+            self.assertEqual(expected.as_csv_row(), merged_device.as_csv_row())
+            self.assertEqual(
+                report[0], {fields[column] for column in np.flatnonzero(from_first[index])})
+            self.assertEqual(
+                expected_conflicts, [fields[column] for column in np.flatnonzero(conflicts[index])])
+        self.assertEqual(
+            ['gwp_total'],
+            [fields[column] for column in np.flatnonzero(conflicts.any(axis=0))])
+
+    def test_not_aligned(self) -> None:
+        with self.assertRaises(ValueError):
+            table.DeviceTable.merge(
+                table.DeviceTable.from_csv(io.StringIO(_CSV)),
+                table.DeviceTable.from_csv(io.StringIO(_NEWER_CSV)).filter(np.array([0])))
+
+
+if __name__ == '__main__':
+    unittest.main()
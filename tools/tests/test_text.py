@@ -0,0 +1,145 @@
+"""Tests for the text helpers used by parsers."""
+import re
+import types
+from typing import Iterator, List, Match, Optional
+import unittest
+from unittest import mock
+
+from tools.parsers.lib import text
+
+_PATTERNS = (
+    re.compile(r'Name:\s*(?P<name>\w+)'),
+    re.compile(r'Weight:\s*(?P<weight>[0-9.]+)\s*kg'),
+    re.compile(r'Lifetime:\s*(?P<lifetime>[0-9]+)'),
+)
+
+
+class SearchAllPatternsInPagesTest(unittest.TestCase):
+
+    def _pages(self, pages: List[str], read: List[int]) -> Iterator[str]:
+        for index, page in enumerate(pages):
+            read.append(index)
+            yield page
+
+    def test_stop_when_all_groups_found(self) -> None:
+        read: List[int] = []
+        pages = ['Name: Optiplex Weight: 4.2 kg\x0c', 'Lifetime: 4\x0c', 'Lifetime: 6\x0c']
+        extracted = text.search_all_patterns_in_pages(_PATTERNS, self._pages(pages, read))
+        self.assertEqual({'name': 'Optiplex', 'weight': '4.2', 'lifetime': '4'}, extracted)
+        self.assertEqual([0, 1], read)
+
+    def test_required_groups(self) -> None:
+        read: List[int] = []
+        pages = ['Name: Optiplex Weight: 4.2 kg\x0c', 'Lifetime: 4\x0c']
+        extracted = text.search_all_patterns_in_pages(
+            _PATTERNS, self._pages(pages, read), required=('name', 'weight'))
+        self.assertEqual({'name': 'Optiplex', 'weight': '4.2'}, extracted)
+        self.assertEqual([0], read)
+
+    def test_same_as_full_text(self) -> None:
+        pages = ['Name: Optiplex\x0c', 'Weight:\x0c', ' 4.2 kg\x0c']
+        self.assertEqual(
+            text.search_all_patterns(_PATTERNS, ''.join(pages)),
+            text.search_all_patterns_in_pages(_PATTERNS, pages))
+
+    def test_pages_searched_once(self) -> None:
+        pages = ['Name: Optiplex\x0c', 'Weight:\x0c', ' 4.2 kg\x0c', 'Lifetime: 4\x0c']
+        searched: List[str] = []
+        search = text._AnchoredPattern.search
+
+        def _search(pattern: text._AnchoredPattern, value: str) -> Optional[Match[str]]:
+            searched.append(value)
+            return search(pattern, value)
+
+        with mock.patch.object(text._AnchoredPattern, 'search', _search):
+            extracted = text.search_all_patterns_in_pages(_PATTERNS, pages)
+        self.assertEqual({'name': 'Optiplex', 'weight': '4.2', 'lifetime': '4'}, extracted)
+        # Each page is only searched with the previous one.
+        self.assertLessEqual(
+            max(len(value) for value in searched),
+            max(len(page + next_page) for page, next_page in zip(pages, pages[1:])))
+
+
+class PatternSetTest(unittest.TestCase):
+
+    def _assert_same_as_search(self, pattern: str, texts: List[str]) -> None:
+        compiled = re.compile(pattern)
+        anchored = text._AnchoredPattern(compiled)
+        for value in texts:
+            expected = compiled.search(value)
+            match = anchored.search(value)
+            self.assertEqual(
+                expected and (expected.span(), expected.groups()),
+                match and (match.span(), match.groups()), msg=f'{pattern!r} in {value!r}')
+
+    def test_anchor(self) -> None:
+        anchored = text._AnchoredPattern(re.compile(
+            r' Product Weight\s*(?P<weight>[0-9]*.[0-9]*)\s*kg'))
+        self.assertEqual(' Product Weight', anchored.anchor)
+        self.assertEqual(0, anchored.max_prefix_width)
+        self.assertEqual([' Product Weight', 'kg'], anchored.literals)
+
+    def test_no_anchor_with_unbounded_prefix(self) -> None:
+        anchored = text._AnchoredPattern(
+            re.compile(r'(?P<name>.*?)\s*From design to end-of-life'))
+        self.assertIsNone(anchored.anchor)
+        self.assertEqual(['From design to end-of-life'], anchored.literals)
+
+    def test_same_as_search(self) -> None:
+        texts = [
+            '', 'Weight 4 kg', 'Product Weight 4.2 kg Product Weight 5 kg',
+            'Use 12% Use 13.5% Use%', 'aaaa Product Weight', 'UseUse 3%',
+            'Estimated impact 250 kgCO2 eq. Estimated impact 300 kgCO2 eq.',
+            'x' * 200 + 'a page 1 Latitude 5400 From design to end-of-life',
+        ]
+        for pattern in (
+            r' Product Weight\s*(?P<weight>[0-9]*.[0-9]*)\s*kg',
+            r'Use\s*(?P<gwp_use_ratio>[0-9]*\.*[0-9]*)%',
+            r'(?P<w>[0-9]{1,3})\s?kg',
+            r'(?<=Use)\s*(?P<ratio>[0-9]+)%',
+            r'\bUse (?P<ratio>[0-9]+)',
+            r'^Use',
+            r'(?i)product weight (?P<weight>[0-9.]+)',
+            r'Estimated (i|I)mpact (?P<footprint>[0-9]*)\s*kgCO2 eq.',
+            r' page 1 (?P<name>.*?)\s*From design to end-of-life',
+            r'(?P<name>[^\s]{3}.*?)(?: \))?\s*From design to end-of-life',
+        ):
+            self._assert_same_as_search(pattern, texts)
+
+    def test_last_pattern_wins(self) -> None:
+        patterns = (
+            re.compile(r'Weight:\s*(?P<weight>[0-9.]+)\s*kg'),
+            re.compile(r'Net weight (?P<weight>[0-9.]+)'),
+            re.compile(r'Gross weight (?P<weight>[0-9.]*)'),
+        )
+        self.assertEqual(
+            {'weight': '3.1'},
+            text.PatternSet(patterns).search_all('Weight: 4.2 kg Net weight 3.1 Gross weight'))
+
+
+class CollectStatsTest(unittest.TestCase):
+
+    def test_collect_stats(self) -> None:
+        text.search_all_patterns(_PATTERNS, 'Name: Optiplex')
+        with text.collect_stats() as stats:
+            text.search_all_patterns(_PATTERNS, 'Name: Optiplex Weight: 4.2 kg')
+            text.search_all_patterns(_PATTERNS, 'Name: Latitude')
+        self.assertEqual(set(_PATTERNS), set(stats))
+        self.assertEqual(2, stats[_PATTERNS[0]].calls)
+        self.assertEqual(1., stats[_PATTERNS[0]].hit_rate)
+        self.assertEqual(.5, stats[_PATTERNS[1]].hit_rate)
+        self.assertEqual(0, stats[_PATTERNS[2]].hits)
+        self.assertLessEqual(stats[_PATTERNS[1]].worst_time, stats[_PATTERNS[1]].total_time)
+
+        text.search_all_patterns(_PATTERNS, 'Name: Optiplex')
+        self.assertEqual(2, stats[_PATTERNS[0]].calls)
+
+    def test_list_pattern_tables(self) -> None:
+        module = types.ModuleType('parser')
+        setattr(module, '_DESK_PATTERNS', _PATTERNS)
+        setattr(module, '_NAME_PATTERN', _PATTERNS[0])
+        self.assertEqual([('_DESK_PATTERNS', _PATTERNS)], list(text.list_pattern_tables(module)))
+
+
+if __name__ == '__main__':
+    unittest.main()